@@ -3,6 +3,7 @@ from tkinter import ttk
 from tkinter import filedialog
 import doc
 import threading
+from progress import Progress, ParseCancelled
 from dialog import ProgressBarDialog
 import datetime
 
@@ -38,10 +39,9 @@ class App(ttk.Frame):
         self.onevar = BooleanVar()
         self.twovar = BooleanVar()
         self.threevar = BooleanVar()
-        self.status_sync_var = SyncVariable()
-        self.progress_sync_var = SyncVariable()
-        self.status_sync_var.set('')
-        self.progress_sync_var.set(0)
+        self.progress_sync_var = SyncVariable() # latest ProgressEvent of the parsing thread
+        self.parse_thread = None
+        self.cancel_parse = threading.Event()
 
 
         # Initialize widgets
@@ -119,14 +119,20 @@ class App(ttk.Frame):
                 try: f.close()
                 except: pass
             f = open(filename, 'rb')
-            x = threading.Thread(target=self.parse_pdf, args=(f,))
-            x.start()
-            self.loading_dlg = ProgressBarDialog(self, 'Opening PDF...')
+            self.pdfdoc = None
+            self.progress_sync_var.set(None)
+            self.cancel_parse.clear()
+            self.parse_thread = threading.Thread(target=self.parse_pdf, args=(f,))
+            self.parse_thread.start()
+            self.loading_dlg = ProgressBarDialog(self, 'Opening PDF...', cancel_event=self.cancel_parse)
             self.poll_wait_parse_pdf()
             self.loading_dlg.show()
             # blocked until loading_dlg is destroyed
             # so pdfdoc is safe to read
             #print(self.pdfdoc)
+            if self.pdfdoc is None:
+                # cancelled or failed
+                return
             self.file_tree.delete(*self.file_tree.get_children())
             for offset in self.pdfdoc.offset_obj:
                 self.file_tree.insert('', 'end', text=repr(self.pdfdoc.offset_obj[offset]), values=(offset, ))
@@ -138,15 +144,20 @@ class App(ttk.Frame):
         root.destroy()
 
     def parse_pdf(self, f):
-        self.pdfdoc = doc.PdfDocument(f, progress_cb=lambda status, **kwargs: (self.status_sync_var.set(status), self.progress_sync_var.set(kwargs['read'] / kwargs['total'] * 100)))
+        # the dialog polls every 50 ms, so more frequent events would be dropped anyway
+        progress = Progress(self.progress_sync_var.set, interval=0.05)
+        try:
+            self.pdfdoc = doc.PdfDocument(f, progress_cb=progress, cancel=self.cancel_parse)
+        except ParseCancelled:
+            f.close()
 
     def poll_wait_parse_pdf(self):
-        status = self.status_sync_var.get()
-        progress = self.progress_sync_var.get()
+        event = self.progress_sync_var.get()
         if self.loading_dlg is not None:
-            self.loading_dlg.status_text.set(status)
-            self.loading_dlg.progress_value.set(progress)
-            if status == 'Done':
+            if event is not None and not self.cancel_parse.is_set():
+                self.loading_dlg.status_text.set(str(event))
+                self.loading_dlg.progress_value.set((event.fraction or 0) * 100)
+            if not self.parse_thread.is_alive():
                 self.loading_dlg.done = True
                 self.loading_dlg.cancel()
                 return
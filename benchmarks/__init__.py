@@ -0,0 +1 @@
+'''Benchmarks of the parse and decode paths. Run each module with python -m benchmarks.<module> from the repository root.'''
@@ -0,0 +1,131 @@
+'''Throughput of the LZWDecode, ASCII85Decode, ASCIIHexDecode and RunLengthDecode filters, in MB/s of decoded data.
+
+python -m benchmarks.bench_filters [--size MB]
+
+Each filter decodes synthetic data, encoded by the encoders below, both at once and incrementally in
+chunks of decode.CHUNK_SIZE bytes. Where the standard library has a decoder, it is measured for comparison.'''
+import sys
+import os
+import random
+import argparse
+import timeit
+import base64
+import binascii
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import decode
+
+def lzw_encode(data: bytes, early_change: int = 1) -> bytes:
+    '''LZW encoding as read by decode.LZWDecode, clearing the table whenever it is full'''
+    codes = [256]
+    lengths = [9]
+    table = {bytes([i]): i for i in range(256)}
+    next_code = 258
+    code_length = 9
+    word = b''
+    for byte in data:
+        extended = word + bytes([byte])
+        if extended in table:
+            word = extended
+            continue
+        codes.append(table[word])
+        lengths.append(code_length)
+        table[extended] = next_code
+        next_code += 1
+        # the decoder adds each code one code later than the encoder
+        if next_code - 1 + early_change >= 1 << code_length and code_length < 12:
+            code_length += 1
+        if next_code == 4095:
+            codes.append(256)
+            lengths.append(code_length)
+            table = {bytes([i]): i for i in range(256)}
+            next_code = 258
+            code_length = 9
+        word = bytes([byte])
+    if word:
+        codes.append(table[word])
+        lengths.append(code_length)
+        if next_code + early_change >= 1 << code_length and code_length < 12:
+            code_length += 1
+    codes.append(257)
+    lengths.append(code_length)
+    bits = 0
+    nbits = 0
+    output = bytearray()
+    for code, length in zip(codes, lengths):
+        bits = (bits << length) | code
+        nbits += length
+        while nbits >= 8:
+            nbits -= 8
+            output.append((bits >> nbits) & 0xff)
+        bits &= (1 << nbits) - 1
+    if nbits > 0:
+        output.append((bits << (8 - nbits)) & 0xff)
+    return bytes(output)
+
+def run_length_encode(data: bytes) -> bytes:
+    output = bytearray()
+    i = 0
+    while i < len(data):
+        run = i + 1
+        while run < len(data) and run - i < 128 and data[run] == data[i]:
+            run += 1
+        if run - i > 1:
+            output += bytes([257 - (run - i), data[i]])
+            i = run
+            continue
+        literal = i + 1
+        while literal < len(data) and literal - i < 128 and (literal + 1 >= len(data) or data[literal] != data[literal + 1]):
+            literal += 1
+        output += bytes([literal - i - 1]) + data[i:literal]
+        i = literal
+    return bytes(output + b'\x80')
+
+def make_data(size: int, rng: random.Random) -> bytes:
+    '''Text-like data with repetitions, compressible like content streams, and runs of equal bytes like scanned images'''
+    words = [bytes(rng.choice(b'abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(2, 8))) for _ in range(500)]
+    output = bytearray()
+    while len(output) < size:
+        if rng.random() < 0.05:
+            output += bytes([rng.randrange(256)]) * rng.randint(3, 200)
+        else:
+            output += rng.choice(words) + b' '
+    return bytes(output[:size])
+
+def throughput(func, size: int, repeat: int) -> float:
+    seconds = min(timeit.repeat(func, number=1, repeat=repeat))
+    return size / seconds / 1e6
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=float, default=4, help='size of the decoded data in MB')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+    rng = random.Random(0)
+    data = make_data(int(args.size * 1e6), rng)
+    size = len(data)
+    hex_data = binascii.hexlify(data)
+    encoded = {
+        'LZWDecode': lzw_encode(data),
+        'ASCII85Decode': base64.a85encode(data, wrapcol=75) + b'~>',
+        'ASCIIHexDecode': b'\n'.join(hex_data[i:i + 64] for i in range(0, len(hex_data), 64)) + b'>',
+        'RunLengthDecode': run_length_encode(data),
+    }
+    references = {
+        'ASCII85Decode': lambda: base64.a85decode(encoded['ASCII85Decode'], adobe=False, ignorechars=b' \t\n\r\v~>'),
+        'ASCIIHexDecode': lambda: bytes.fromhex(encoded['ASCIIHexDecode'][:-1].decode('ascii')),
+    }
+    print(f'{size / 1e6:.2f} MB decoded, NumPy {"available" if decode.numpy is not None else "not available"}')
+    print(f'{"filter":<18}{"encoded MB":>12}{"at once MB/s":>14}{"chunked MB/s":>14}{"stdlib MB/s":>14}')
+    for name, encoded_data in encoded.items():
+        func = decode.DECODERS[name]
+        if func(encoded_data, None) != data:
+            raise AssertionError(f'{name} does not give back the original data')
+        at_once = throughput(lambda: func(encoded_data, None), size, args.repeat)
+        chunks = [encoded_data[i:i + decode.CHUNK_SIZE] for i in range(0, len(encoded_data), decode.CHUNK_SIZE)]
+        chunked = throughput(lambda: b''.join(decode.iter_decode(name, chunks, None)), size, args.repeat)
+        reference = throughput(references[name], size, args.repeat) if name in references else float('nan')
+        print(f'{name:<18}{len(encoded_data) / 1e6:>12.2f}{at_once:>14.2f}{chunked:>14.2f}{reference:>14.2f}')
+
+if __name__ == '__main__':
+    main()
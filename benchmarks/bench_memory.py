@@ -0,0 +1,80 @@
+'''Memory used by the parsed object graph of a document, by object type.
+
+python -m benchmarks.bench_memory [PDF] [--pages N]
+
+Without a PDF, a synthetic document with N pages is generated. Each page dict carries
+arrays of numbers, booleans, nulls and names, like the /Widths and coordinate arrays of real files.'''
+import sys
+import os
+import gc
+import argparse
+import tempfile
+import tracemalloc
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from doc import PdfDocument
+from objects import PdfObject, PdfArrayObject, PdfDictionaryObject, PdfIndirectObject, PdfStreamObject
+from benchmarks.corpus import make_synthetic_pdf
+
+def shallow_size(obj) -> int:
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+def census(roots):
+    '''Count references to and distinct instances of each PdfObject type reachable from roots'''
+    references = Counter()
+    distinct = {}
+    stack = list(roots)
+    while stack:
+        obj = stack.pop()
+        name = type(obj).__name__
+        references[name] += 1
+        distinct.setdefault(name, {})[id(obj)] = obj
+        if isinstance(obj, PdfIndirectObject):
+            stack.append(obj.value)
+        elif isinstance(obj, PdfStreamObject):
+            stack.append(obj.dict)
+        elif isinstance(obj, PdfArrayObject):
+            stack.extend(obj.value)
+        elif isinstance(obj, PdfDictionaryObject):
+            stack.extend(obj.value.keys())
+            stack.extend(obj.value.values())
+    return references, distinct
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pdf', nargs='?', help='PDF file to measure, instead of a synthetic one')
+    parser.add_argument('--pages', type=int, default=2000, help='number of pages of the synthetic PDF')
+    args = parser.parse_args(argv)
+    path = args.pdf
+    if path is None:
+        with tempfile.NamedTemporaryFile('wb', suffix='.pdf', delete=False) as f:
+            f.write(make_synthetic_pdf(args.pages))
+            path = f.name
+    try:
+        gc.collect()
+        tracemalloc.start()
+        doc = PdfDocument(path, lazy=True)
+        doc.load_all()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        references, distinct = census(list(doc.offset_obj.values()) + list(doc.compressed_obj.values()))
+        print(f'{"type":<26}{"references":>12}{"instances":>12}{"bytes each":>12}{"total MB":>10}')
+        total = 0
+        for name in sorted(references, key=lambda n: -references[n]):
+            instances = distinct[name].values()
+            size = sum(shallow_size(obj) for obj in instances)
+            total += size
+            print(f'{name:<26}{references[name]:>12}{len(instances):>12}{size / len(instances):>12.1f}{size / 1e6:>10.2f}')
+        print(f'{"object headers":<26}{"":>12}{sum(len(d) for d in distinct.values()):>12}{"":>12}{total / 1e6:>10.2f}')
+        print(f'traced memory after load_all: {current / 1e6:.2f} MB, peak {peak / 1e6:.2f} MB')
+        doc.close()
+    finally:
+        if args.pdf is None:
+            os.remove(path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+'''Throughput of undoing PNG and TIFF predictors, in MB/s of decoded data.
+
+python -m benchmarks.bench_predictors [--size MB]'''
+import sys
+import os
+import math
+import random
+import argparse
+import timeit
+from decimal import Decimal
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import decode
+from objects import PdfDictionaryObject, PdfNameObject, PdfNumericObject
+
+def legacy_png_unfilter(data: bytes, columns: int) -> bytes:
+    '''The row loop of decode.FlateDecode before predictors were undone a whole row at a time, for comparison'''
+    def paethPredictor(left, up, up_left):
+        p = left + up - up_left
+        dist_left = abs(p - left)
+        dist_up = abs(p - up)
+        dist_up_left = abs(p - up_left)
+        if dist_left <= dist_up and dist_left <= dist_up_left:
+            return left
+        elif dist_up <= dist_up_left:
+            return up
+        else:
+            return up_left
+
+    output = bytearray()
+    rowlength = columns + 1
+    prev_rowdata = [0] * rowlength
+    for row in range(len(data) // rowlength):
+        rowdata: List[int] = [x for x in data[(row*rowlength):((row+1)*rowlength)]]
+        filterByte = rowdata[0]
+        if filterByte == 1:
+            for i in range(2, rowlength):
+                rowdata[i] = (rowdata[i] + rowdata[i-1]) % 256
+        elif filterByte == 2:
+            for i in range(1, rowlength):
+                rowdata[i] = (rowdata[i] + prev_rowdata[i]) % 256
+        elif filterByte == 3:
+            for i in range(1, rowlength):
+                left = rowdata[i-1] if i > 1 else 0
+                floor = math.floor(left + prev_rowdata[i])/2
+                rowdata[i] = (rowdata[i] + int(floor)) % 256
+        elif filterByte == 4:
+            for i in range(1, rowlength):
+                left = rowdata[i - 1] if i > 1 else 0
+                up = prev_rowdata[i]
+                up_left = prev_rowdata[i - 1] if i > 1 else 0
+                paeth = paethPredictor(left, up, up_left)
+                rowdata[i] = (rowdata[i] + paeth) % 256
+        prev_rowdata = rowdata
+        output += bytearray(rowdata[1:])
+    return bytes(output)
+
+def make_params(**entries) -> PdfDictionaryObject:
+    return PdfDictionaryObject({PdfNameObject(k): PdfNumericObject(Decimal(v)) for k, v in entries.items()})
+
+def make_png_data(columns: int, rows: int, filter_type: int, rng: random.Random) -> bytes:
+    '''Random predicted data, with every row using filter_type'''
+    return b''.join(bytes([filter_type]) + rng.randbytes(columns) for _ in range(rows))
+
+def throughput(func, size: int, repeat: int) -> float:
+    seconds = min(timeit.repeat(func, number=1, repeat=repeat))
+    return size / seconds / 1e6
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=float, default=1, help='size of each decoded image in MB')
+    parser.add_argument('--columns', type=int, default=1024, help='bytes per row')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+    rng = random.Random(0)
+    rows = max(1, int(args.size * 1e6) // args.columns)
+    size = rows * args.columns
+    numpy = decode.numpy
+    print(f'{size / 1e6:.2f} MB per image, {args.columns} bytes per row, NumPy {"available" if numpy is not None else "not available"}')
+    print(f'{"case":<16}{"legacy MB/s":>14}{"bytes MB/s":>14}{"NumPy MB/s":>14}')
+    for name, filter_type in [('PNG None', 0), ('PNG Sub', 1), ('PNG Up', 2), ('PNG Average', 3), ('PNG Paeth', 4)]:
+        data = make_png_data(args.columns, rows, filter_type, rng)
+        params = make_params(Predictor=15, Columns=args.columns)
+        legacy = throughput(lambda: legacy_png_unfilter(data, args.columns), size, 1)
+        decode.numpy = None
+        fast = throughput(lambda: decode.unpredict(data, params), size, args.repeat)
+        decode.numpy = numpy
+        vectorized = throughput(lambda: decode.unpredict(data, params), size, args.repeat) if numpy is not None else float('nan')
+        print(f'{name:<16}{legacy:>14.2f}{fast:>14.2f}{vectorized:>14.2f}')
+    data = rng.randbytes(rows * (args.columns // 3 * 3))
+    params = make_params(Predictor=2, Colors=3, Columns=args.columns // 3)
+    decode.numpy = None
+    fast = throughput(lambda: decode.unpredict(data, params), len(data), args.repeat)
+    decode.numpy = numpy
+    vectorized = throughput(lambda: decode.unpredict(data, params), len(data), args.repeat) if numpy is not None else float('nan')
+    print(f'{"TIFF 2, RGB":<16}{"unsupported":>14}{fast:>14.2f}{vectorized:>14.2f}')
+
+if __name__ == '__main__':
+    main()
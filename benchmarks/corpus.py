@@ -0,0 +1,323 @@
+'''Deterministic generator of synthetic PDF files, for benchmarks.
+
+python -m benchmarks.corpus OUTPUT [--pages N] [--xref stream] [--objstm-ratio 0.8] ...
+
+The same arguments and seed always give the same bytes.'''
+import random
+import zlib
+import argparse
+from typing import List, Optional
+
+_WORDS = [b'lorem', b'ipsum', b'dolor', b'sit', b'amet', b'consectetur', b'adipiscing', b'elit', b'sed', b'do',
+          b'eiusmod', b'tempor', b'incididunt', b'ut', b'labore', b'et', b'dolore', b'magna', b'aliqua']
+
+def predict(data: bytes, predictor: int, rowlength: int, bpp: int = 1) -> bytes:
+    '''Apply TIFF predictor 2 or PNG predictor 12 (Up) to 8-bit samples, in rows of rowlength bytes of pixels of bpp bytes'''
+    rows = [data[i:i + rowlength] for i in range(0, len(data), rowlength)]
+    if predictor == 2:
+        return b''.join(bytes((row[i] - (row[i - bpp] if i >= bpp else 0)) & 0xff for i in range(len(row))) for row in rows)
+    elif predictor == 12:
+        prev = bytes(rowlength)
+        output = bytearray()
+        for row in rows:
+            output.append(2)
+            output += bytes((b - p) & 0xff for b, p in zip(row, prev))
+            prev = row
+        return bytes(output)
+    raise ValueError(f'Unsupported predictor {predictor}')
+
+class _Builder():
+    '''Objects of a PDF being generated, as the bytes between obj and endobj, by object number'''
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.objs = [None] # [obj_no]: bytes, or None if free
+
+    def reserve(self) -> int:
+        self.objs.append(None)
+        return len(self.objs) - 1
+
+    def add(self, body: bytes, obj_no: int = None) -> int:
+        if obj_no is None:
+            obj_no = self.reserve()
+        self.objs[obj_no] = body
+        return obj_no
+
+    def add_stream(self, entries: bytes, data: bytes, obj_no: int = None) -> int:
+        return self.add(b'<< ' + entries + b' /Length %d >>\nstream\n' % len(data) + data + b'\nendstream', obj_no)
+
+    def text(self, words: int) -> bytes:
+        return b' '.join(self.rng.choice(_WORDS) for _ in range(words))
+
+    def content_stream(self, size: int) -> bytes:
+        '''Text showing operators, like a page of a text document'''
+        lines = []
+        length = 0
+        y = 800
+        while length < size:
+            line = b'BT /F1 12 Tf 72 %d Td (%s) Tj ET' % (y, self.text(8))
+            lines.append(line)
+            length += len(line) + 1
+            y = y - 14 if y > 60 else 800
+        return b'\n'.join(lines)[:size]
+
+    def image(self, size: int) -> (int, int, bytes):
+        '''Width, height and RGB samples of a smooth gradient image of about size bytes'''
+        width = max(1, int((size / 3) ** 0.5))
+        height = max(1, size // (3 * width))
+        rng = self.rng
+        offsets = [rng.randrange(256) for _ in range(3)]
+        samples = bytearray()
+        for y in range(height):
+            for x in range(width):
+                samples += bytes(((x + y + offsets[c]) & 0xff) for c in range(3))
+        return width, height, bytes(samples)
+
+def make_pdf(*, pages: int = 100, fanout: Optional[int] = None, objects: int = 0, objstm_ratio: float = 0.0,
+             xref: str = 'classic', increments: int = 0, stream_size: int = 2048, image_size: int = 0,
+             predictor: Optional[int] = None, compress: bool = True, seed: int = 0) -> bytes:
+    '''Generate a PDF file.
+
+    pages: number of pages, each with a content stream of about stream_size bytes, Flate encoded if compress,
+        and an image XObject of about image_size bytes if image_size > 0, Flate encoded with predictor if not None
+    fanout: maximum number of kids of each node of the page tree, whose depth follows. None for a flat tree
+    objects: number of extra dictionaries, like annotations, holding strings, names, numbers and arrays
+    objstm_ratio: fraction of the objects other than streams stored in object streams, which requires xref='stream'
+    xref: 'classic' for cross-reference tables, or 'stream' for cross-reference streams
+    increments: number of incremental updates appended, each changing about a tenth of the pages and extra objects'''
+    if xref not in ('classic', 'stream'):
+        raise ValueError(f'Unknown xref type {xref}')
+    if objstm_ratio > 0 and xref != 'stream':
+        raise ValueError('Object streams require cross-reference streams')
+    if fanout is not None and fanout < 2:
+        raise ValueError('A page tree node must be able to have at least 2 kids')
+    rng = random.Random(seed)
+    builder = _Builder(rng)
+    catalog = builder.reserve()
+    font = builder.add(b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>')
+
+    def page_dict(page_no: int, parent: int, contents: int, image: Optional[int]) -> bytes:
+        widths = b' '.join(b'%d' % rng.randint(250, 750) for _ in range(32))
+        xobjects = b' /XObject << /Im0 %d 0 R >>' % image if image is not None else b''
+        return (b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] /Rotate 0 /Contents %d 0 R' % (parent, contents)
+                + b' /Resources << /Font << /F1 %d 0 R >>%s >> /Widths [%s]' % (font, xobjects, widths)
+                + b' /Matrix [1 0 0 1 %d.5 -%d.25] /Flags [true false null /Name%d] >>' % (page_no, page_no, page_no % 16))
+
+    def stream_entries(compressed: bool, decode_parms: bytes = b'') -> bytes:
+        return (b'/Filter /FlateDecode' + decode_parms) if compressed else b''
+
+    # pages and their streams
+    page_objs = []
+    page_contents = []
+    for page_no in range(pages):
+        data = builder.content_stream(stream_size)
+        if compress:
+            data = zlib.compress(data)
+        contents = builder.add_stream(stream_entries(compress), data)
+        image = None
+        if image_size > 0:
+            width, height, samples = builder.image(image_size)
+            entries = b'/Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB /BitsPerComponent 8 ' % (width, height)
+            if predictor is not None:
+                samples = predict(samples, predictor, width * 3, 3)
+                parms = b' /DecodeParms << /Predictor %d /Colors 3 /Columns %d >>' % (predictor, width)
+                image = builder.add_stream(entries + stream_entries(True, parms), zlib.compress(samples))
+            else:
+                image = builder.add_stream(entries + stream_entries(compress), zlib.compress(samples) if compress else samples)
+        page_objs.append(builder.reserve())
+        page_contents.append((contents, image))
+
+    # page tree, from the leaves up
+    nodes = list(page_objs) # of the current level
+    counts = [1] * len(page_objs)
+    tree = [] # (obj_no, kids, count) of each intermediate node
+    parents = {}
+    if fanout is None or fanout >= len(nodes):
+        fanout = max(1, len(nodes))
+    while True:
+        groups = [(nodes[i:i + fanout], counts[i:i + fanout]) for i in range(0, len(nodes), fanout)] or [([], [])]
+        nodes = []
+        counts = []
+        for kids, kid_counts in groups:
+            node = builder.reserve()
+            tree.append((node, kids, sum(kid_counts)))
+            for kid in kids:
+                parents[kid] = node
+            nodes.append(node)
+            counts.append(sum(kid_counts))
+        if len(nodes) == 1:
+            break
+    root = nodes[0]
+    for node, kids, count in tree:
+        parent = b' /Parent %d 0 R' % parents[node] if node in parents else b''
+        builder.add(b'<< /Type /Pages%s /Count %d /Kids [%s] >>' % (parent, count, b' '.join(b'%d 0 R' % kid for kid in kids)), node)
+    for page_no, (obj_no, (contents, image)) in enumerate(zip(page_objs, page_contents)):
+        builder.add(page_dict(page_no, parents[obj_no], contents, image), obj_no)
+
+    # extra objects
+    extra_objs = []
+    for i in range(objects):
+        rect = b' '.join(b'%d.%d' % (rng.randint(0, 600), rng.randint(0, 99)) for _ in range(4))
+        extra_objs.append(builder.add(b'<< /Type /Annot /Subtype /Text /Rect [%s] /Contents (%s) /NM (annot-%d) /F 4 /C [1 0.5 0] /Open false >>'
+                                      % (rect, builder.text(12), i)))
+    builder.add(b'<< /Type /Catalog /Pages %d 0 R >>' % root, catalog)
+
+    writer = _Writer(xref)
+    header = b'%PDF-1.5\n%\xe2\xe3\xcf\xd3\n'
+    compressible = [obj_no for obj_no in range(1, len(builder.objs)) if b'stream\n' not in builder.objs[obj_no]]
+    compressed = set(rng.sample(compressible, int(len(compressible) * objstm_ratio)))
+    out = writer.write_section(bytearray(header), builder.objs, range(1, len(builder.objs)), compressed, catalog, None)
+
+    # incremental updates
+    changeable = page_objs + extra_objs
+    originals = {obj_no: builder.objs[obj_no] for obj_no in changeable}
+    for _ in range(increments):
+        changed = sorted(rng.sample(changeable, max(1, len(changeable) // 10))) if changeable else []
+        for obj_no in changed:
+            # a modification date, in place of the closing >>
+            builder.objs[obj_no] = originals[obj_no][:-2] + b'/M (D:2020%04d) >>' % rng.randrange(10000)
+        out = writer.write_section(out, builder.objs, changed, set(), catalog, writer.startxref)
+    return bytes(out)
+
+class _Writer():
+    def __init__(self, xref: str):
+        self.xref = xref
+        self.offsets = {} # [obj_no]: offset or (objstm obj_no, index), as of the last section written
+        self.size = 0 # 1 + the highest object number used
+        self.startxref = None
+
+    def write_section(self, out: bytearray, objs: List[bytes], obj_nos, compressed: set, catalog: int, prev: Optional[int]) -> bytearray:
+        '''Append the objects obj_nos, followed by their cross-reference section and trailer'''
+        written = []
+        for obj_no in obj_nos:
+            if obj_no in compressed:
+                continue
+            self.offsets[obj_no] = len(out)
+            out += b'%d 0 obj\n' % obj_no + objs[obj_no] + b'\nendobj\n'
+            written.append(obj_no)
+        self.size = max(self.size, len(objs))
+        # object streams of up to 100 objects each
+        compressed = sorted(compressed)
+        for start in range(0, len(compressed), 100):
+            members = compressed[start:start + 100]
+            objstm_no = self.size
+            self.size += 1
+            header = []
+            body = bytearray()
+            for index, obj_no in enumerate(members):
+                header.append(b'%d %d' % (obj_no, len(body)))
+                body += objs[obj_no] + b'\n'
+                self.offsets[obj_no] = (objstm_no, index)
+            header = b' '.join(header) + b'\n'
+            data = zlib.compress(header + body)
+            self.offsets[objstm_no] = len(out)
+            out += (b'%d 0 obj\n<< /Type /ObjStm /N %d /First %d /Filter /FlateDecode /Length %d >>\nstream\n'
+                    % (objstm_no, len(members), len(header), len(data)) + data + b'\nendstream\nendobj\n')
+            written.append(objstm_no)
+            written.extend(members)
+        if self.xref == 'stream':
+            # the cross-reference stream is a new object too
+            self.size += 1
+        size = self.size
+        trailer = b'/Size %d /Root %d 0 R' % (size, catalog) + (b' /Prev %d' % prev if prev is not None else b'')
+        startxref = len(out)
+        if self.xref == 'classic':
+            out += b'xref\n' + self._classic_table(written if prev is not None else range(0, size)) + b'trailer\n<< ' + trailer + b' >>\n'
+        else:
+            xref_no = size - 1
+            self.offsets[xref_no] = startxref
+            written.append(xref_no)
+            entries = written if prev is not None else range(0, size)
+            index, data = self._stream_rows(entries)
+            data = zlib.compress(predict(data, 12, 7))
+            out += (b'%d 0 obj\n<< /Type /XRef %s /Index [%s] /W [1 4 2] /Filter /FlateDecode /DecodeParms << /Predictor 12 /Columns 7 >> /Length %d >>\nstream\n'
+                    % (xref_no, trailer, index, len(data)) + data + b'\nendstream\nendobj\n')
+        out += b'startxref\n%d\n%%%%EOF\n' % startxref
+        self.startxref = startxref
+        return out
+
+    @staticmethod
+    def _runs(obj_nos) -> List[List[int]]:
+        runs = []
+        for obj_no in sorted(set(obj_nos)):
+            if runs and runs[-1][-1] == obj_no - 1:
+                runs[-1].append(obj_no)
+            else:
+                runs.append([obj_no])
+        return runs
+
+    def _classic_table(self, obj_nos) -> bytes:
+        out = bytearray()
+        for run in self._runs(obj_nos):
+            out += b'%d %d\n' % (run[0], len(run))
+            for obj_no in run:
+                offset = self.offsets.get(obj_no)
+                out += b'%010d %05d %s\r\n' % ((offset, 0, b'n') if offset is not None else (0, 65535, b'f'))
+        return bytes(out)
+
+    def _stream_rows(self, obj_nos) -> (bytes, bytes):
+        index = []
+        rows = bytearray()
+        for run in self._runs(obj_nos):
+            index.append(b'%d %d' % (run[0], len(run)))
+            for obj_no in run:
+                offset = self.offsets.get(obj_no)
+                if offset is None:
+                    rows += bytes([0]) + (0).to_bytes(4, 'big') + (65535 if obj_no == 0 else 0).to_bytes(2, 'big')
+                elif isinstance(offset, tuple):
+                    rows += bytes([2]) + offset[0].to_bytes(4, 'big') + offset[1].to_bytes(2, 'big')
+                else:
+                    rows += bytes([1]) + offset.to_bytes(4, 'big') + (0).to_bytes(2, 'big')
+        return b' '.join(index), bytes(rows)
+
+def make_synthetic_pdf(pages: int) -> bytes:
+    '''A classic-xref PDF with a flat page tree of pages pages, without streams'''
+    objs = [b'<< /Type /Catalog /Pages 2 0 R >>', None]
+    kids = []
+    for i in range(pages):
+        kids.append(b'%d 0 R' % (len(objs) + 1))
+        widths = b' '.join(b'%d' % (250 + (i * 7 + k * 13) % 500) for k in range(64))
+        objs.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Rotate 0 /Widths [' + widths
+                    + b'] /Matrix [1 0 0 1 %d.5 -%d.25] /Flags [true false null /Name%d] >>' % (i, i, i % 16))
+    objs[1] = b'<< /Type /Pages /Count %d /Kids [' % pages + b' '.join(kids) + b'] >>'
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for obj_no, obj in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n' % obj_no + obj + b'\nendobj\n'
+    startxref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objs) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objs) + 1, startxref)
+    return bytes(out)
+
+def add_arguments(parser: argparse.ArgumentParser):
+    '''Add the arguments of make_pdf to parser'''
+    parser.add_argument('--pages', type=int, default=100)
+    parser.add_argument('--fanout', type=int, default=None, help='maximum kids per page tree node, default a flat tree')
+    parser.add_argument('--objects', type=int, default=0, help='number of extra annotation dictionaries')
+    parser.add_argument('--objstm-ratio', type=float, default=0.0, help='fraction of non-stream objects in object streams')
+    parser.add_argument('--xref', choices=['classic', 'stream'], default='classic')
+    parser.add_argument('--increments', type=int, default=0, help='number of incremental updates')
+    parser.add_argument('--stream-size', type=int, default=2048, help='bytes of each content stream before compression')
+    parser.add_argument('--image-size', type=int, default=0, help='bytes of the image of each page, 0 for none')
+    parser.add_argument('--predictor', type=int, choices=[2, 12], default=None, help='predictor of the images')
+    parser.add_argument('--no-compress', dest='compress', action='store_false', help='do not compress content streams')
+    parser.add_argument('--seed', type=int, default=0)
+
+def options(args) -> dict:
+    '''The keyword arguments of make_pdf from parsed arguments'''
+    return {name: getattr(args, name) for name in ['pages', 'fanout', 'objects', 'objstm_ratio', 'xref', 'increments',
+                                                   'stream_size', 'image_size', 'predictor', 'compress', 'seed']}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output', help='path of the PDF file to write')
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    data = make_pdf(**options(args))
+    with open(args.output, 'wb') as f:
+        f.write(data)
+    print(f'{args.output}: {len(data)} bytes')
+
+if __name__ == '__main__':
+    main()
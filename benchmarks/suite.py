@@ -0,0 +1,210 @@
+'''Benchmark suite of the parse and decode paths, over a synthetic corpus from benchmarks.corpus.
+
+python -m benchmarks.suite [--output RESULTS.json] [--compare BASELINE.json] [--threshold 0.1] [-k NAME]
+python -m benchmarks.suite --results RESULTS.json --compare BASELINE.json
+
+Each benchmark is run --repeat times, and the best and median times are written to the JSON output.
+With --compare, the best time of each benchmark is compared to that in the baseline, and any benchmark
+slower by more than --threshold is flagged as a regression, making the exit status 1. With --results,
+an existing result file is compared instead of running the suite.'''
+import sys
+import os
+import io
+import json
+import time
+import platform
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import utils
+import syntax
+import decode
+from doc import PdfDocument
+from objects import PdfObject
+from xref import PdfXRefSubSection
+from benchmarks.corpus import make_pdf
+
+# name: keyword arguments of make_pdf, for pages and objects scaled by --scale
+CORPUS = {
+    'classic': dict(pages=400, objects=2000),
+    'xrefstm': dict(pages=400, objects=2000, xref='stream', objstm_ratio=0.8),
+    'incremental': dict(pages=400, objects=2000, increments=8),
+    'tree': dict(pages=2000, fanout=4, stream_size=256),
+    'images': dict(pages=20, image_size=256 * 1024, predictor=12),
+}
+
+def make_corpus(directory: str, scale: float) -> dict:
+    '''Write the files of CORPUS into directory. Return their paths by name'''
+    paths = {}
+    for name, options in CORPUS.items():
+        options = dict(options)
+        for key in ('pages', 'objects'):
+            if key in options:
+                options[key] = max(1, int(options[key] * scale))
+        paths[name] = os.path.join(directory, name + '.pdf')
+        with open(paths[name], 'wb') as f:
+            f.write(make_pdf(**options))
+    return paths
+
+def inuse_offsets(doc: PdfDocument) -> list:
+    return [offset for inc in doc.increments for subsec in inc['xref_section'].subsections
+            for kind, offset in zip(subsec.types, subsec.field2) if kind == PdfXRefSubSection.INUSE]
+
+def bench_read_until(paths):
+    def run(f):
+        f.seek(0, io.SEEK_SET)
+        while True:
+            _, eol = utils.read_until(f, syntax.EOL)
+            if eol is None:
+                break
+            f.seek(len(eol), io.SEEK_CUR)
+    return lambda: open(paths['classic'], 'rb'), run, lambda f: f.close()
+
+def bench_seek_until(paths):
+    def run(f):
+        f.seek(0, io.SEEK_SET)
+        while utils.seek_until(f, [b'endobj']) >= 0 and len(f.peek(1)) > 0:
+            f.seek(6, io.SEEK_CUR)
+    return lambda: open(paths['classic'], 'rb'), run, lambda f: f.close()
+
+def bench_create_from_file(paths, backend):
+    def setup():
+        doc = PdfDocument(paths['classic'], lazy=True, backend=backend)
+        return doc, inuse_offsets(doc)
+    def run(state):
+        doc, offsets = state
+        with doc.open_reader() as f:
+            for offset in offsets:
+                f.seek(offset, io.SEEK_SET)
+                PdfObject.create_from_file(f, doc)
+    return setup, run, lambda state: state[0].close()
+
+def bench_parse_normal(paths, name, **kwargs):
+    return lambda: None, lambda _: PdfDocument(paths[name], **kwargs).close(), lambda _: None
+
+def bench_flate_decode(paths):
+    def setup():
+        doc = PdfDocument(paths['images'])
+        images = []
+        for page in doc.get_all_page_dicts():
+            image = page['Resources']['XObject']['Im0'].deref()
+            images.append((bytes(image.raw_stream), image.dict['DecodeParms']))
+        doc.close()
+        return images
+    def run(images):
+        for data, params in images:
+            decode.FlateDecode(data, params)
+    return setup, run, lambda _: None
+
+def bench_get_obj(paths, name):
+    def setup():
+        doc = PdfDocument(paths[name], lazy=True)
+        return doc, len(doc.obj_index)
+    def run(state):
+        doc, size = state
+        for obj_no in range(1, size):
+            doc.get_obj(obj_no, 0)
+    return setup, run, lambda state: state[0].close()
+
+def bench_get_all_page_dicts(paths):
+    def setup():
+        doc = PdfDocument(paths['tree'])
+        return doc
+    return setup, lambda doc: doc.get_all_page_dicts(), lambda doc: doc.close()
+
+BENCHMARKS = {
+    'utils.read_until': bench_read_until,
+    'utils.seek_until': bench_seek_until,
+    'create_from_file[file]': lambda paths: bench_create_from_file(paths, 'file'),
+    'create_from_file[mmap]': lambda paths: bench_create_from_file(paths, 'mmap'),
+    'parse_normal[classic]': lambda paths: bench_parse_normal(paths, 'classic'),
+    'parse_normal[xrefstm]': lambda paths: bench_parse_normal(paths, 'xrefstm'),
+    'parse_normal[incremental]': lambda paths: bench_parse_normal(paths, 'incremental'),
+    'parse_normal[classic,lazy]': lambda paths: bench_parse_normal(paths, 'classic', lazy=True),
+    'parse_linear[classic]': lambda paths: bench_parse_normal(paths, 'classic', linear=True),
+    'parse_linear[incremental]': lambda paths: bench_parse_normal(paths, 'incremental', linear=True),
+    'decode.FlateDecode[predictor]': bench_flate_decode,
+    'get_obj[classic]': lambda paths: bench_get_obj(paths, 'classic'),
+    'get_obj[xrefstm]': lambda paths: bench_get_obj(paths, 'xrefstm'),
+    'get_all_page_dicts': bench_get_all_page_dicts,
+}
+
+def run_suite(paths: dict, repeat: int, selected=None) -> dict:
+    results = {}
+    for name, bench in BENCHMARKS.items():
+        if selected and not any(s in name for s in selected):
+            continue
+        setup, run, teardown = bench(paths)
+        times = []
+        for _ in range(repeat):
+            state = setup()
+            start = time.perf_counter()
+            run(state)
+            times.append(time.perf_counter() - start)
+            teardown(state)
+        results[name] = {'best': min(times), 'median': statistics.median(times), 'times': times}
+        print(f'{name:<32}{min(times) * 1000:>10.2f} ms{statistics.median(times) * 1000:>10.2f} ms', flush=True)
+    return results
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    '''Print the ratio of the best time of each benchmark to that in baseline. Return whether any is a regression'''
+    regressed = False
+    print(f'{"benchmark":<32}{"baseline ms":>12}{"current ms":>12}{"ratio":>8}')
+    for name, result in results['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f'{name:<32}{"":>12}{result["best"] * 1000:>12.2f}{"new":>8}')
+            continue
+        ratio = result['best'] / base['best']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressed = True
+        elif ratio < 1 - threshold:
+            flag = '  improved'
+        print(f'{name:<32}{base["best"] * 1000:>12.2f}{result["best"] * 1000:>12.2f}{ratio:>8.2f}{flag}')
+    for name in baseline['results']:
+        if name not in results['results']:
+            print(f'{name:<32}{baseline["results"][name]["best"] * 1000:>12.2f}{"":>12}{"missing":>8}')
+    return regressed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', metavar='BASELINE', help='compare the results to this JSON file of earlier results')
+    parser.add_argument('--results', help='compare this JSON file of results instead of running the suite')
+    parser.add_argument('--threshold', type=float, default=0.1, help='slowdown ratio above which a benchmark is a regression')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--scale', type=float, default=1.0, help='factor of the number of pages and objects in the corpus')
+    parser.add_argument('-k', dest='selected', action='append', help='run only the benchmarks whose name contains this')
+    args = parser.parse_args(argv)
+    if args.results is not None:
+        if args.compare is None:
+            parser.error('--results requires --compare')
+        with open(args.results) as f:
+            results = json.load(f)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            paths = make_corpus(directory, args.scale)
+            results = {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'numpy': decode.numpy is not None,
+                'scale': args.scale,
+                'repeat': args.repeat,
+                'corpus': {name: os.path.getsize(path) for name, path in paths.items()},
+                'results': run_suite(paths, args.repeat, args.selected),
+            }
+        if args.output is not None:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2)
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
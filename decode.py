@@ -1,9 +1,13 @@
+import sys
 import zlib
+import binascii
+import syntax
+from array import array
 from enum import IntEnum
-from typing import Union, List
+from itertools import accumulate, repeat
+from operator import and_
+from typing import Union, List, Iterable, Iterator
 from objects import PdfDictionaryObject, PdfNumericObject
-from decimal import Decimal
-import math
 
 class Predictor(IntEnum):
     NoPrediction = 1
@@ -15,75 +19,241 @@ class Predictor(IntEnum):
     PNGPaeth = 14
     PNGOptimum = 15
 
+# Optional: predictors are undone a whole image at a time if NumPy is available
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def _int_param(params: PdfDictionaryObject, name: str, default: int) -> int:
+    value = params.get(name) if params else None
+    if value is None:
+        return default
+    if not isinstance(value, PdfNumericObject) or not isinstance(value.value, int):
+        raise ValueError(f"The optional parameter for the filter '{name}' is not an integer")
+    return value.value
+
+# masks for adding bytes of two rows packed in an int, without carry between bytes
+_swar_masks = {}
+
+def _png_up(row: bytearray, prev: bytes) -> bytearray:
+    n = len(row)
+    masks = _swar_masks.get(n)
+    if masks is None:
+        masks = _swar_masks[n] = (int.from_bytes(b'\x7f' * n, 'big'), int.from_bytes(b'\x80' * n, 'big'))
+    low, high = masks
+    a = int.from_bytes(row, 'big')
+    b = int.from_bytes(prev, 'big')
+    return bytearray((((a & low) + (b & low)) ^ ((a ^ b) & high)).to_bytes(n, 'big'))
+
+def _cumulate(row: bytearray, stride: int) -> bytearray:
+    '''Undo horizontal differencing of bytes, modulo 256, with stride bytes between a byte and its left neighbour'''
+    if stride == 1:
+        return bytearray(map(and_, accumulate(row), repeat(0xff)))
+    for c in range(stride):
+        row[c::stride] = bytes(map(and_, accumulate(row[c::stride]), repeat(0xff)))
+    return row
+
+def _png_unfilter_row(filter_type: int, row: bytearray, prev: bytes, bpp: int) -> bytearray:
+    '''Undo the PNG filter of one row, without the filter type byte. bpp is the number of bytes per complete pixel, rounded up to 1'''
+    if filter_type == 0: # None
+        return row
+    elif filter_type == 1: # Sub
+        return _cumulate(row, bpp)
+    elif filter_type == 2: # Up
+        return _png_up(row, prev)
+    elif filter_type == 3: # Average
+        for i in range(min(bpp, len(row))):
+            row[i] = (row[i] + (prev[i] >> 1)) & 0xff
+        for i in range(bpp, len(row)):
+            row[i] = (row[i] + ((row[i - bpp] + prev[i]) >> 1)) & 0xff
+        return row
+    elif filter_type == 4: # Paeth
+        # left and upper left of the first pixel are 0, so the predictor is always up
+        for i in range(min(bpp, len(row))):
+            row[i] = (row[i] + prev[i]) & 0xff
+        for i in range(bpp, len(row)):
+            left = row[i - bpp]
+            up = prev[i]
+            up_left = prev[i - bpp]
+            # distances of the initial estimate left + up - up_left to left, up and up_left
+            dist_left = up - up_left
+            dist_up = left - up_left
+            dist_up_left = dist_left + dist_up
+            if dist_left < 0: dist_left = -dist_left
+            if dist_up < 0: dist_up = -dist_up
+            if dist_up_left < 0: dist_up_left = -dist_up_left
+            if dist_left <= dist_up and dist_left <= dist_up_left:
+                row[i] = (row[i] + left) & 0xff
+            elif dist_up <= dist_up_left:
+                row[i] = (row[i] + up) & 0xff
+            else:
+                row[i] = (row[i] + up_left) & 0xff
+        return row
+    else:
+        raise ValueError(f"Unsupported PNG filter {filter_type}")
+
+def _png_unfilter(data: bytes, rowlength: int, bpp: int, prev: bytes = None) -> bytes:
+    '''Undo the PNG filters of complete rows. prev is the decoded row above the first one, if any'''
+    stride = rowlength + 1
+    if len(data) % stride != 0:
+        raise ValueError(f'PNG predicted data of length {len(data)} is not a multiple of the row length {stride}')
+    rows = len(data) // stride
+    if numpy is not None and rows > 0:
+        image = numpy.frombuffer(data, dtype=numpy.uint8).reshape(rows, stride)
+        filter_types = image[:, 0]
+        image = image[:, 1:]
+        prev = numpy.zeros(rowlength, dtype=numpy.uint8) if prev is None else numpy.frombuffer(prev, dtype=numpy.uint8)
+        if (filter_types == 2).all():
+            # Up only: each row is the sum of all rows above, modulo 256
+            output = numpy.cumsum(image, axis=0, dtype=numpy.uint8)
+            output += prev
+            return output.tobytes()
+        output = numpy.empty_like(image)
+        for r in range(rows):
+            filter_type = filter_types[r]
+            if filter_type == 0:
+                output[r] = image[r]
+            elif filter_type == 1 and rowlength % bpp == 0:
+                output[r] = numpy.cumsum(image[r].reshape(-1, bpp), axis=0, dtype=numpy.uint8).reshape(-1)
+            elif filter_type == 2:
+                output[r] = image[r] + prev
+            else:
+                output[r] = numpy.frombuffer(_png_unfilter_row(filter_type, bytearray(image[r].tobytes()), prev.tobytes(), bpp), dtype=numpy.uint8)
+            prev = output[r]
+        return output.tobytes()
+
+    output = bytearray()
+    prev = bytes(rowlength) if prev is None else prev
+    view = memoryview(data)
+    for r in range(rows):
+        row = _png_unfilter_row(data[r * stride], bytearray(view[r * stride + 1:(r + 1) * stride]), prev, bpp)
+        output += row
+        prev = row
+    return bytes(output)
+
+def _tiff_unpredict(data: bytes, columns: int, colors: int, bits: int) -> bytes:
+    '''Undo TIFF Predictor 2, i.e. horizontal differencing of each color component'''
+    rowlength = (columns * colors * bits + 7) // 8
+    if rowlength == 0 or len(data) % rowlength != 0:
+        raise ValueError(f'TIFF predicted data of length {len(data)} is not a multiple of the row length {rowlength}')
+    rows = len(data) // rowlength
+    if bits == 8:
+        if numpy is not None:
+            image = numpy.frombuffer(data, dtype=numpy.uint8).reshape(rows, columns, colors)
+            return numpy.cumsum(image, axis=1, dtype=numpy.uint8).tobytes()
+        output = bytearray()
+        for r in range(rows):
+            output += _cumulate(bytearray(data[r * rowlength:(r + 1) * rowlength]), colors)
+        return bytes(output)
+    elif bits == 16:
+        if numpy is not None:
+            image = numpy.frombuffer(data, dtype='>u2').reshape(rows, columns, colors)
+            return numpy.cumsum(image, axis=1, dtype=numpy.uint16).astype('>u2').tobytes()
+        samples = array('H', data)
+        if sys.byteorder == 'little':
+            samples.byteswap()
+        for r in range(rows):
+            for c in range(colors):
+                start = r * columns * colors + c
+                end = (r + 1) * columns * colors
+                samples[start:end:colors] = array('H', map(and_, accumulate(samples[start:end:colors]), repeat(0xffff)))
+        if sys.byteorder == 'little':
+            samples.byteswap()
+        return samples.tobytes()
+    elif bits in (1, 2, 4):
+        mask = (1 << bits) - 1
+        per_byte = 8 // bits
+        output = bytearray()
+        for r in range(rows):
+            row = data[r * rowlength:(r + 1) * rowlength]
+            # unpack the samples of the row, most significant bits first
+            samples = [(byte >> (8 - bits * (i + 1))) & mask for byte in row for i in range(per_byte)][:columns * colors]
+            for i in range(colors, len(samples)):
+                samples[i] = (samples[i] + samples[i - colors]) & mask
+            samples += [0] * (-len(samples) % per_byte)
+            for i in range(0, len(samples), per_byte):
+                byte = 0
+                for sample in samples[i:i + per_byte]:
+                    byte = (byte << bits) | sample
+                output.append(byte)
+        return bytes(output)
+    else:
+        raise ValueError(f'Unsupported BitsPerComponent {bits} for TIFF predictor')
+
+def _predictor_params(params: PdfDictionaryObject):
+    '''Get Predictor, Columns, Colors and BitsPerComponent from params'''
+    try:
+        predictor = Predictor(_int_param(params, 'Predictor', Predictor.NoPrediction))
+    except ValueError as ex:
+        raise ValueError(f"Unsupported predictor {params.get('Predictor')}") from ex
+    colors = _int_param(params, 'Colors', 1)
+    bits = _int_param(params, 'BitsPerComponent', 8)
+    columns = _int_param(params, 'Columns', 1)
+    if colors < 1 or columns < 1 or bits not in (1, 2, 4, 8, 16):
+        raise ValueError(f'Invalid predictor parameters Colors {colors}, BitsPerComponent {bits}, Columns {columns}')
+    return predictor, columns, colors, bits
+
+def unpredict(data: bytes, params: PdfDictionaryObject) -> bytes:
+    '''Undo the predictor specified by the Predictor, Colors, BitsPerComponent and Columns entries of params, as used by FlateDecode and LZWDecode'''
+    predictor, columns, colors, bits = _predictor_params(params)
+    if predictor == Predictor.NoPrediction:
+        return data
+    if predictor == Predictor.TIFFPredictor2:
+        return _tiff_unpredict(data, columns, colors, bits)
+    # PNG Predictors: the actual filter is specified by the first byte of each row
+    rowlength = (columns * colors * bits + 7) // 8
+    bpp = (colors * bits + 7) // 8
+    return _png_unfilter(data, rowlength, bpp)
+
+def iter_unpredict(chunks: Iterable[bytes], params: PdfDictionaryObject) -> Iterator[bytes]:
+    '''Incremental version of unpredict, undoing the predictor on every complete row received so far'''
+    predictor, columns, colors, bits = _predictor_params(params)
+    if predictor == Predictor.NoPrediction:
+        yield from chunks
+        return
+    rowlength = (columns * colors * bits + 7) // 8
+    bpp = (colors * bits + 7) // 8
+    stride = rowlength if predictor == Predictor.TIFFPredictor2 else rowlength + 1
+    pending = bytearray()
+    prev = None
+    for chunk in chunks:
+        pending += chunk
+        complete = len(pending) - len(pending) % stride
+        if complete == 0:
+            continue
+        rows = bytes(pending[:complete])
+        del pending[:complete]
+        if predictor == Predictor.TIFFPredictor2:
+            yield _tiff_unpredict(rows, columns, colors, bits)
+        else:
+            output = _png_unfilter(rows, rowlength, bpp, prev)
+            prev = output[-rowlength:]
+            yield output
+    if len(pending) > 0:
+        raise ValueError(f'Predicted data does not end at a row boundary of row length {stride}')
+
 def FlateDecode(dataBytes: Union[bytes, bytearray], params: PdfDictionaryObject) -> bytes:
     '''Flate method is based on the public-domain zlib/deflate compression method.'''
-    def paethPredictor(left, up, up_left):
-        p = left + up - up_left
-        dist_left = abs(p - left)
-        dist_up = abs(p - up)
-        dist_up_left = abs(p - up_left)
-
-        if dist_left <= dist_up and dist_left <= dist_up_left:
-            return left
-        elif dist_up <= dist_up_left:
-            return up
-        else:
-            return up_left
-
-    data = zlib.decompress(dataBytes)
-    predictor = Predictor.NoPrediction
-
-    if params:
-        try:
-            predictor = Predictor(params.get('Predictor', Predictor.NoPrediction).value)
-        except AttributeError: # get not exist
-            pass
-
-    if predictor != Predictor.NoPrediction:
-        columns = params.get('Columns', PdfNumericObject(Decimal(1)))
-        if not isinstance(columns, PdfNumericObject) or columns.value.as_integer_ratio()[1] != 1:
-            raise ValueError("The optional parameter for FlateDecode filter 'Columns' is not an integer")
-        columns = columns.value.as_integer_ratio()[0]
-
-        # PNG Predictors:
-        if predictor >= 10 and predictor <= 15:
-            output = bytearray()
-            rowlength = columns + 1
-            assert len(data) % rowlength == 0
-            prev_rowdata = [0] * rowlength
-            for row in range(len(data) // rowlength):
-                rowdata: List[int] = [x for x in data[(row*rowlength):((row+1)*rowlength)]]
-                filterByte = rowdata[0]
-                if filterByte == 0:
-                    pass
-                elif filterByte == 1:
-                    for i in range(2, rowlength):
-                        rowdata[i] = (rowdata[i] + rowdata[i-1]) % 256
-                elif filterByte == 2:
-                    for i in range(1, rowlength):
-                        rowdata[i] = (rowdata[i] + prev_rowdata[i]) % 256
-                elif filterByte == 3:
-                    for i in range(1, rowlength):
-                        left = rowdata[i-1] if i > 1 else 0
-                        floor = math.floor(left + prev_rowdata[i])/2
-                        rowdata[i] = (rowdata[i] + int(floor)) % 256
-                elif filterByte == 4:
-                    for i in range(1, rowlength):
-                        left = rowdata[i - 1] if i > 1 else 0
-                        up = prev_rowdata[i]
-                        up_left = prev_rowdata[i - 1] if i > 1 else 0
-                        paeth = paethPredictor(left, up, up_left)
-                        rowdata[i] = (rowdata[i] + paeth) % 256
-                else:
-                    # unsupported PNG filter
-                    raise ValueError(f"Unsupported PNG filter {filterByte}")
-                prev_rowdata = rowdata
-                output += bytearray(rowdata[1:])
-            data = bytes(output)
-        else:
-            # unsupported predictor
-            raise ValueError(f"Unsupported flatedecode predictor {predictor}")
-    return data
+    return unpredict(zlib.decompress(dataBytes), params)
+
+def iter_flate_decode(chunks: Iterable[bytes], params: PdfDictionaryObject) -> Iterator[bytes]:
+    '''Incremental version of FlateDecode. Each chunk yielded is at most CHUNK_SIZE bytes before undoing any predictor'''
+    def inflate():
+        decompressor = zlib.decompressobj()
+        for chunk in chunks:
+            while len(chunk) > 0 and not decompressor.eof:
+                output = decompressor.decompress(chunk, CHUNK_SIZE)
+                chunk = decompressor.unconsumed_tail
+                if len(output) > 0:
+                    yield output
+        # bounded, as at most CHUNK_SIZE bytes are buffered in the decompressor
+        output = decompressor.flush()
+        if len(output) > 0:
+            yield output
+        if not decompressor.eof:
+            raise zlib.error('Error -5 while decompressing data: incomplete or truncated stream')
+    return iter_unpredict(inflate(), params)
 
 # DCTDecode filter decodes grayscale or color image data that has been encoded in the JPEG baseline format
 # All except one parameter are stored in the encoded data
@@ -92,4 +262,225 @@ def DCTDecode(dataBytes: Union[bytes, bytearray], params: PdfDictionaryObject) -
     '''DCTDecode filter decodes grayscale or color image data that has been encoded in the JPEG baseline format.
 All except one parameter are stored in the encoded data.
 Thus the raw data needs no filtering and is simply handed over to any image readers.'''
-    return bytearray(dataBytes)
\ No newline at end of file
+    return bytearray(dataBytes)
+
+_WHITESPACES = b''.join(syntax.WHITESPACES)
+
+def iter_ascii_hex_decode(chunks: Iterable[bytes], params: PdfDictionaryObject) -> Iterator[bytes]:
+    '''Incremental version of ASCIIHexDecode'''
+    pending = b''
+    for chunk in chunks:
+        # white-space characters are ignored
+        data = pending + bytes(chunk).translate(None, _WHITESPACES)
+        eod = data.find(b'>')
+        if eod >= 0:
+            pending = data[:eod]
+            break
+        even = len(data) & ~1
+        if even > 0:
+            yield binascii.a2b_hex(data[:even])
+        pending = data[even:]
+    # if there is an odd number of digits, the final digit is assumed to be 0
+    if len(pending) % 2 != 0:
+        pending += b'0'
+    if len(pending) > 0:
+        yield binascii.a2b_hex(pending)
+
+def ASCIIHexDecode(dataBytes: Union[bytes, bytearray], params: PdfDictionaryObject) -> bytes:
+    '''ASCIIHexDecode filter decodes data encoded as pairs of hexadecimal digits, up to the EOD marker >'''
+    return b''.join(iter_ascii_hex_decode([dataBytes], params))
+
+# powers of 85 for the 5 digits of a group of ASCII base-85 data
+_A85_POWERS = [85 ** 4, 85 ** 3, 85 ** 2, 85, 1]
+# value of each ASCII base-85 digit, from ! to u
+_A85_DIGITS = bytes((b - 0x21) & 0xff for b in range(256))
+
+def _a85_groups(data: bytes) -> bytes:
+    '''Decode complete 5-digit groups of ASCII base-85 data, without z or white-space characters'''
+    if len(data) == 0:
+        return b''
+    if min(data) < 0x21 or max(data) > 0x75:
+        raise ValueError('Invalid character in ASCII85 data')
+    if numpy is not None:
+        digits = numpy.frombuffer(data, dtype=numpy.uint8).reshape(-1, 5).astype(numpy.int64) - 0x21
+        values = digits @ numpy.array(_A85_POWERS, dtype=numpy.int64)
+        if len(values) > 0 and values.max() > 0xffffffff:
+            raise ValueError('ASCII85 group out of range')
+        return values.astype('>u4').tobytes()
+    digits = data.translate(_A85_DIGITS)
+    values = array('I')
+    try:
+        values.fromlist([(((a * 85 + b) * 85 + c) * 85 + d) * 85 + e
+                         for a, b, c, d, e in zip(digits[0::5], digits[1::5], digits[2::5], digits[3::5], digits[4::5])])
+    except OverflowError:
+        raise ValueError('ASCII85 group out of range') from None
+    if sys.byteorder == 'little':
+        values.byteswap()
+    return values.tobytes()
+
+
+def iter_ascii85_decode(chunks: Iterable[bytes], params: PdfDictionaryObject) -> Iterator[bytes]:
+    '''Incremental version of ASCII85Decode'''
+    pending = b''
+    for chunk in chunks:
+        data = pending + bytes(chunk).translate(None, _WHITESPACES)
+        eod = data.find(b'~')
+        if eod >= 0:
+            data = data[:eod]
+        # z stands for a group of 4 zero bytes
+        data = data.replace(b'z', b'!!!!!')
+        complete = len(data) - len(data) % 5
+        yield _a85_groups(data[:complete])
+        pending = data[complete:]
+        if eod >= 0:
+            break
+    # a final partial group of n digits is padded with u, and gives n - 1 bytes
+    if len(pending) == 1:
+        raise ValueError('ASCII85 data ends with a single digit')
+    if len(pending) > 0:
+        yield _a85_groups(pending + b'u' * (5 - len(pending)))[:len(pending) - 1]
+
+def ASCII85Decode(dataBytes: Union[bytes, bytearray], params: PdfDictionaryObject) -> bytes:
+    '''ASCII85Decode filter decodes data encoded in the ASCII base-85 encoding, up to the EOD marker ~>'''
+    return b''.join(iter_ascii85_decode([dataBytes], params))
+
+def iter_lzw_decode(chunks: Iterable[bytes], params: PdfDictionaryObject) -> Iterator[bytes]:
+    '''Incremental version of LZWDecode'''
+    early_change = _int_param(params, 'EarlyChange', 1)
+    def decompress():
+        # preallocated code table: 256 single bytes, then 256 clear-table and 257 EOD, then the codes added,
+        # and a last slot written to once the table is full
+        table = [bytes([i]) for i in range(256)] + [b'', b''] + [None] * (4097 - 258)
+        next_code = 258
+        code_length = 9
+        grow_at = (1 << code_length) - early_change # next_code from which codes are longer
+        prev = None
+        pending = b''
+        bit_pos = 0 # of the next code, in the first byte of pending
+        for chunk in chunks:
+            data = pending + bytes(chunk)
+            # a code of at most 12 bits spans at most 3 bytes, so that it can be read from the 24-bit window at its first byte
+            windows = [(a << 16) | (b << 8) | c for a, b, c in zip(data, data[1:] + b'\0', data[2:] + b'\0\0')]
+            end = len(data) * 8
+            output = []
+            append = output.append
+            shift = 24 - code_length
+            mask = (1 << code_length) - 1
+            while bit_pos <= end - code_length:
+                code = (windows[bit_pos >> 3] >> (shift - (bit_pos & 7))) & mask
+                bit_pos += code_length
+                if code < 256 or 257 < code < next_code:
+                    entry = table[code]
+                    if prev is not None:
+                        table[next_code] = prev + entry[:1]
+                        next_code += 1
+                elif code == next_code and prev is not None:
+                    entry = prev + prev[:1]
+                    table[next_code] = entry
+                    next_code += 1
+                elif code == 256:
+                    next_code = 258
+                    code_length = 9
+                    grow_at = (1 << code_length) - early_change
+                    shift = 24 - code_length
+                    mask = (1 << code_length) - 1
+                    prev = None
+                    continue
+                elif code == 257:
+                    if output: yield b''.join(output)
+                    return
+                else:
+                    raise ValueError(f'Invalid LZW code {code}')
+                if next_code >= grow_at:
+                    if code_length < 12:
+                        code_length += 1
+                        grow_at = (1 << code_length) - early_change
+                        shift = 24 - code_length
+                        mask = (1 << code_length) - 1
+                    elif next_code > 4096:
+                        # the table is full until the next clear-table code
+                        next_code = 4096
+                append(entry)
+                prev = entry
+            pending = data[bit_pos >> 3:]
+            bit_pos &= 7
+            if output: yield b''.join(output)
+    return iter_unpredict(decompress(), params)
+
+def LZWDecode(dataBytes: Union[bytes, bytearray], params: PdfDictionaryObject) -> bytes:
+    '''LZWDecode filter decodes data encoded with the adaptive LZW compression method, with variable-length codes of 9 to 12 bits'''
+    return b''.join(iter_lzw_decode([dataBytes], params))
+
+def iter_run_length_decode(chunks: Iterable[bytes], params: PdfDictionaryObject) -> Iterator[bytes]:
+    '''Incremental version of RunLengthDecode'''
+    pending = b''
+    for chunk in chunks:
+        data = pending + bytes(chunk)
+        output = bytearray()
+        i = 0
+        end = len(data)
+        while i < end:
+            length = data[i]
+            if length < 128: # copy the next length + 1 bytes
+                if i + 2 + length > end:
+                    break
+                output += data[i + 1:i + 2 + length]
+                i += 2 + length
+            elif length > 128: # repeat the next byte 257 - length times
+                if i + 2 > end:
+                    break
+                output += data[i + 1:i + 2] * (257 - length)
+                i += 2
+            else: # EOD
+                yield bytes(output)
+                return
+        pending = data[i:]
+        yield bytes(output)
+    if len(pending) > 0:
+        raise ValueError('RunLengthDecode data ends in the middle of a run')
+
+def RunLengthDecode(dataBytes: Union[bytes, bytearray], params: PdfDictionaryObject) -> bytes:
+    '''RunLengthDecode filter decodes data encoded in a byte-oriented run-length format, up to the EOD byte 128'''
+    return b''.join(iter_run_length_decode([dataBytes], params))
+
+# Size of chunks produced by incremental decoders
+CHUNK_SIZE = 64 * 1024
+
+# Decoders of the whole input at once, by filter name. Only filters registered here or in STREAMING_DECODERS are decoded
+DECODERS = {
+    'FlateDecode': FlateDecode,
+    'DCTDecode': DCTDecode,
+    'ASCIIHexDecode': ASCIIHexDecode,
+    'ASCII85Decode': ASCII85Decode,
+    'LZWDecode': LZWDecode,
+    'RunLengthDecode': RunLengthDecode,
+}
+
+# Incremental decoders, by filter name. Other filters of DECODERS are run on the whole input at once.
+STREAMING_DECODERS = {
+    'FlateDecode': iter_flate_decode,
+    'DCTDecode': lambda chunks, params: chunks,
+    'ASCIIHexDecode': iter_ascii_hex_decode,
+    'ASCII85Decode': iter_ascii85_decode,
+    'LZWDecode': iter_lzw_decode,
+    'RunLengthDecode': iter_run_length_decode,
+}
+
+def iter_decode(name: str, chunks: Iterable[bytes], params: PdfDictionaryObject) -> Iterator[bytes]:
+    '''Decode chunks with the filter name, incrementally if possible'''
+    decoder = STREAMING_DECODERS.get(name)
+    if decoder is not None:
+        return decoder(chunks, params)
+    decoder = DECODERS.get(name)
+    if decoder is None:
+        raise Exception(f'Unrecognized decoder {name}')
+    return iter([decoder(b''.join(chunks), params)])
+
+def iter_limit(chunks: Iterable[bytes], max_size: int) -> Iterator[bytes]:
+    '''Pass chunks through, raising ValueError as soon as more than max_size bytes in total are produced'''
+    size = 0
+    for chunk in chunks:
+        size += len(chunk)
+        if size > max_size:
+            raise ValueError(f'Decoded stream is larger than the limit of {max_size} bytes')
+        yield chunk
\ No newline at end of file
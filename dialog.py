@@ -13,11 +13,12 @@ class ClampedDoubleVar(DoubleVar):
         super().set(value)
 
 class ProgressBarDialog(Toplevel):
-    def __init__(self, parent, title = None, maxvalue = None):
+    def __init__(self, parent, title = None, maxvalue = None, cancel_event = None):
         '''Initialize a dialog with a progress bar.
         Arguments:
             parent -- a parent window (the application window)
             title -- the dialog title
+            cancel_event -- a threading.Event set when the dialog is closed before it is done
         '''
         if not parent:
             parent = tkinter._default_root
@@ -27,6 +28,7 @@ class ProgressBarDialog(Toplevel):
         if maxvalue is None: maxvalue = 100
         self.progress_value = ClampedDoubleVar(0, maxvalue, None, 0)
         self.done = False
+        self.cancel_event = cancel_event
 
         Toplevel.__init__(self, parent)
 
@@ -83,3 +85,6 @@ class ProgressBarDialog(Toplevel):
             if self.parent is not None:
                 self.parent.focus_set()
             self.destroy()
+        elif self.cancel_event is not None:
+            self.cancel_event.set()
+            self.status_text.set('Cancelling...')
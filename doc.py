@@ -1,12 +1,21 @@
 import io
 import os
+import mmap
+import threading
+import warnings
+import itertools
+from contextlib import contextmanager, nullcontext
 import utils
 import syntax
 from decimal import Decimal
 import re
-from objects import PdfObject, PdfDictionaryObject, PdfReferenceObject, PdfStreamObject, PdfIndirectObject, val
-from xref import PdfXRefSection
+from objects import PdfObject, PdfDictionaryObject, PdfNumericObject, PdfReferenceObject, PdfStreamObject, PdfIndirectObject, val
+from xref import PdfXRefSection, PdfXRefSubSection, PdfObjectIndex
+from objstm import ObjectStream, detach_objstm, inflate_objstm
 from collections import OrderedDict
+from stats import ParseStats, CountingReader
+from progress import make_progress
+from pages import PageIndex
 
 class PdfDocument:
     @property
@@ -35,33 +44,99 @@ class PdfDocument:
         else:
             self.__version__ = value
 
-    def get_obj(self, obj_num, gen_num):
+    def get_obj(self, obj_num, gen_num, increment=None):
+        '''Get the indirect object obj_num, as of the latest increment, or as of the given increment for inspecting history.
+
+        Return None if the object is free.'''
         if not self.ready:
             raise Exception('get_obj can only be called after the document is scanned completely.')
-        startxref_found = False
-        startxref = -1
-        for increment in range(len(self.increments)):
-            increment = -(increment + 1) # increment from -1 to -len
-            xref_section = self.increments[increment]['xref_section']
+        if increment is None:
+            offset = self.obj_index.get_obj_offset(obj_num)
+        else:
+            offset = self.get_obj_offset(obj_num, gen_num, increment)
+        if offset is None:
+            # offset is None <=> obj_num not found
+            raise Exception('Object not found')
+        elif isinstance(offset, tuple):
+            obj = self.compressed_obj.get(offset)
+            if self.stats is not None:
+                self.stats.count_lookup('compressed_obj', obj is not None)
+            if obj is None:
+                obj = self.load_compressed_obj(*offset)
+            return obj
+        elif offset > 0:
+            obj = self.offset_obj.get(offset)
+            if self.stats is not None:
+                self.stats.count_lookup('offset_obj', obj is not None)
+            if obj is None:
+                with self.open_reader() as temp_f:
+                    obj = self.__parse_obj_at(temp_f, offset)
+            return obj
+        else:
+            # offset = 0 <=> obj_num is free at gen_num
+            return None
 
-            offset = xref_section.get_obj_offset(obj_num, gen_num)
-            if offset is None:
-                # offset is None <=> obj_num not found
+    def __parse_obj_at(self, f, offset):
+        '''Parse the object at offset through f, and cache it in offset_obj'''
+        f.seek(offset, io.SEEK_SET)
+        obj = PdfObject.create_from_file(f, self)
+        if self.stats is not None:
+            self.stats.count_object(obj)
+        with self.__cache_lock:
+            # another thread may have parsed the same object in the meantime
+            return self.offset_obj.setdefault(offset, obj)
+
+    def get_objs(self, refs) -> list:
+        '''[ref.value for ref in refs], for references into this document, resolved together.
+
+        Objects not parsed yet are parsed first, in order of offset through a single reader for uncompressed
+        objects, and grouped by object stream for compressed objects, so that each object stream is decoded once'''
+        if not self.ready:
+            raise Exception('get_objs can only be called after the document is scanned completely.')
+        offsets = set()
+        locations = set()
+        for ref in refs:
+            if ref.resolved:
                 continue
-            elif isinstance(offset, tuple):
-                # TODO: handle the case where obj is not already cached
-                return self.compressed_obj[offset]
-            elif offset > 0:
-                if self.offset_obj.get(offset) is None:
-                    temp_f = open(self.__f.name, 'rb')
-                    temp_f.seek(offset, io.SEEK_SET)
-                    self.offset_obj[offset] = PdfObject.create_from_file(temp_f, self)
-                return self.offset_obj[offset]
-            elif offset == 0:
-                # offset = 0 <=> obj_num is free at gen_num
-                return None
-
-        raise Exception('Object not found')
+            offset = self.obj_index.get_obj_offset(ref.obj_no)
+            if isinstance(offset, tuple):
+                if offset not in self.compressed_obj:
+                    locations.add(offset)
+            elif offset is not None and offset > 0 and offset not in self.offset_obj:
+                offsets.add(offset)
+        if offsets:
+            with self.open_reader() as f:
+                for offset in sorted(offsets):
+                    if offset not in self.offset_obj:
+                        self.__parse_obj_at(f, offset)
+        for location in sorted(locations):
+            if location not in self.compressed_obj:
+                self.load_compressed_obj(*location)
+        return [ref.value for ref in refs]
+
+    def deref_all(self, refs) -> list:
+        '''[ref.deref() for ref in refs], resolved together as by get_objs()'''
+        return [obj.value for obj in self.get_objs(refs)]
+
+    def mark_edited(self):
+        '''Advance epoch, so that references resolve their objects again, and discard the page indices.
+
+        Must be called whenever objects, xref sections or increments of the document are changed'''
+        self.epoch += 1
+        self.invalidate_page_index()
+
+    def get_obj_offset(self, obj_num, gen_num, increment=-1):
+        '''Find obj_num by walking the xref sections from the given increment back to the first one.
+
+        Return value is the same as PdfXRefSection.get_obj_offset'''
+        for i in range(increment % len(self.increments), -1, -1):
+            xref_section = self.increments[i]['xref_section']
+            if xref_section is None:
+                continue
+            offset = xref_section.get_obj_offset(obj_num, gen_num)
+            if offset is not None:
+                return offset
+        return None
 
     def get_trailer_dict(self, increment=-1):
         if not self.ready:
@@ -88,55 +163,72 @@ class PdfDocument:
             raise Exception('get_catalog can only be called after the document is scanned completely.')
         return self.get_trailer_dict(increment)['Root'].deref() # Root value must be indirect ref
 
-    def get_page_dict(self, pageIndex, increment=-1):
-        if not self.ready:
-            raise Exception('get_page_dict can only be called after the document is scanned completely.')
-        current_page = 0
-        cat = self.get_catalog(increment)
-        queue = []
-        queue.append(cat['Pages'].deref())
-        while len(queue) > 0:
-            visit = queue.pop()
-            if visit['Type'] == 'Pages':
-                if current_page + visit['Count'] > pageIndex:
-                    for x in reversed(visit['Kids'].value):
-                        # Kids is array of indrect ref
-                        queue.append(x.deref() if isinstance(x, PdfReferenceObject) else x)
-                    continue
-                else:
-                    current_page += visit['Count']
-                    continue
-            elif visit['Type'] == 'Page':
-                if current_page == pageIndex:
-                    return visit
-                current_page += 1
-                continue
-            else:
-                raise Exception('invalid Pages dictionary')
-        return None
-
-    def get_all_page_dicts(self):
+    def get_page_index(self, increment=-1) -> PageIndex:
+        '''The flattened page tree as of the given increment, built on first use and kept until invalidate_page_index() is called'''
         if not self.ready:
-            raise Exception('get_all_page_dict can only be called after the document is scanned completely.')
-        current_page = 0
-        cat = self.get_catalog().value
-        pages = []
-        queue = []
-        queue.append(cat['Pages'].deref()) # category_dict.Pages must be indirect ref
-        while len(queue) > 0:
-            visit = queue.pop()
-            if visit['Type'] == 'Pages':
-                for x in reversed(visit['Kids'].value): # Kids value is an array of indirect ref => x is indirect ref
-                    queue.append(x.deref() if isinstance(x, PdfReferenceObject) else x)
-            elif visit['Type'] == 'Page':
-                pages.append(visit)
-                current_page += 1
-                continue
-            else:
-                raise Exception('invalid Pages dictionary')
-        return pages
+            raise Exception('get_page_index can only be called after the document is scanned completely.')
+        increment %= len(self.increments)
+        page_index = self.__page_indices.get(increment)
+        if page_index is None:
+            # resolve references as of the increment, so that earlier increments give their own page tree
+            latest = increment == len(self.increments) - 1
+            def resolve(ref):
+                obj = self.get_obj(ref.obj_no, ref.gen_no, None if latest else increment)
+                if obj is None:
+                    raise Exception(f'Page tree refers to free object {ref.obj_no} {ref.gen_no}')
+                return obj.value
+            catalog = resolve(self.get_trailer_dict(increment)['Root'])
+            page_index = self.__page_indices.setdefault(increment, PageIndex(catalog['Pages'], resolve))
+        return page_index
+
+    def invalidate_page_index(self):
+        '''Discard the page indices built by get_page_index(). Must be called whenever the page tree is changed, e.g. by mark_edited()'''
+        self.__page_indices = {}
+
+    def get_page_count(self, increment=-1) -> int:
+        return len(self.get_page_index(increment))
 
-    def __init__(self, f, progress_cb):
+    def get_page_dict(self, pageIndex, increment=-1):
+        '''The page dictionary of the pageIndex-th page, or None if there is no such page'''
+        page_index = self.get_page_index(increment)
+        if not 0 <= pageIndex < len(page_index):
+            return None
+        return page_index[pageIndex]
+
+    def get_all_page_dicts(self, increment=-1):
+        return list(self.get_page_index(increment).pages)
+
+    def get_page_attributes(self, pageIndex, increment=-1) -> dict:
+        '''[name]: value of the inheritable page attributes Resources, MediaBox, CropBox and Rotate of the pageIndex-th page, either its own or inherited from the page tree'''
+        return self.get_page_index(increment).get_attributes(pageIndex)
+
+    def __init__(self, f, progress_cb=None, *, backend='file', lazy=False, linear=False, objstm_cache_size=64 * 1024 * 1024, decoded_cache_size=64 * 1024 * 1024, objstm_executor=None, stats=False, cancel=None):
+        '''Open a PDF document from f, either a path or a file object opened in binary mode.
+
+        backend can be 'file', to parse through the buffered file object, or 'mmap', to parse
+        against a read-only memory mapping of the whole file. The data of stream objects is not read
+        while parsing, but by read_bytes() when raw_stream is first accessed. In 'mmap' mode, raw_stream
+        of stream objects are memoryview slices of the mapping instead of copies.
+
+        If lazy is True, only the cross-reference sections and trailers are read here. Objects
+        are parsed when they are first accessed through get_obj(), or all at once by load_all().
+        If linear is True, the file is instead read from the beginning to the end by parse_linear(),
+        which parses every object along the way.
+
+        Compressed objects are parsed on demand. Decoded object streams are kept in an LRU
+        cache of at most objstm_cache_size bytes. Stream data read on demand and the results of
+        PdfStreamObject.decode() are kept in decoded_cache, an LRU cache of at most decoded_cache_size
+        bytes. If objstm_executor, a concurrent.futures.Executor, is given, compressed objects are instead
+        all parsed here unless lazy, and by load_all(), with the object streams not in the cache inflated
+        and their headers parsed in parallel by the executor.
+
+        If stats is True, or a ParseStats, timings and counters of parsing are collected in stats, which is
+        otherwise None.
+
+        progress_cb is either a callable, called with a progress.ProgressEvent at most every 0.1 seconds,
+        or a progress.Progress with its own limits. Nothing is printed unless progress.print_progress is
+        used as the callback. If cancel, a threading.Event, is set while parsing, parsing stops and
+        progress.ParseCancelled is raised, after the file is closed as by close().'''
         self.increments = [{ 'body': [], 'xref_section': None, 'trailer': None, 'startxref': None, 'eof': False }]
         self.offset_obj = {} # [offset]: obj
         self.compressed_obj = {} # [objstmobj_no, idx]: decompressed_obj
@@ -145,8 +237,97 @@ class PdfDocument:
         self.offset_xref = {}
         self.ready = False
         self.offset_xref_trailer = {} # [offset]: (PdfXRefSection, trailer_dict)
+        self.obj_index = None # merged view of all xref sections, newest wins
+        self.__page_indices = {} # [increment]: PageIndex
+        self.epoch = 0 # advanced by mark_edited()
+        self.objstm_executor = objstm_executor
+        self.objstm_cache = utils.LRUCache(objstm_cache_size, sizeof=lambda objstm: objstm.nbytes) # [objstmobj_no]: ObjectStream
+        self.decoded_cache = PdfStreamObject.make_cache(decoded_cache_size) # [stream, filters]: data
+        if backend not in ('file', 'mmap'):
+            raise ValueError(f'Unknown backend {backend}')
+        self.backend = backend
+        self.__closed = False
+        self.__owns_f = isinstance(f, (str, bytes, os.PathLike))
+        if self.__owns_f:
+            f = open(f, 'rb')
         self.__f = f
-        self.parse_normal(f, progress_cb)
+        self.__mmap = None
+        if backend == 'mmap':
+            self.__mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            f = utils.BufferReader(self.__mmap, getattr(self.__f, 'name', None))
+        self.__readers = utils.ReaderPool(self.__f)
+        self.stats = (stats if isinstance(stats, ParseStats) else ParseStats()) if stats else None
+        if self.stats is not None and self.__mmap is None:
+            f = CountingReader(f, self.stats)
+        self.__cache_lock = threading.Lock()
+        progress = make_progress(progress_cb, cancel)
+        try:
+            try:
+                if linear:
+                    with self._phase('linear'):
+                        self.parse_linear(f, progress)
+                else:
+                    self.parse_normal(f, progress, lazy=lazy)
+            finally:
+                if self.__mmap is not None:
+                    f.close() # release the view of the mapping used for parsing, so that close() can unmap it
+        except BaseException:
+            self.close()
+            raise
+
+    @contextmanager
+    def open_reader(self):
+        '''Get a file-like object for reading the underlying file, with its own position, so that it can be used concurrently with other readers'''
+        if self.__closed:
+            raise ValueError('document is closed')
+        if self.__mmap is not None:
+            reader = utils.BufferReader(self.__mmap, getattr(self.__f, 'name', None))
+            try:
+                yield reader
+            finally:
+                reader.close()
+        else:
+            with self.__readers.reader() as f:
+                yield f if self.stats is None else CountingReader(f, self.stats)
+
+    def _phase(self, name: str):
+        '''Context manager timing a phase of parsing in stats, if enabled'''
+        return self.stats.phase(name) if self.stats is not None else nullcontext()
+
+    def read_bytes(self, offset: int, size: int):
+        '''Read size bytes of the underlying file at offset, e.g. the data of a stream. A memoryview of the mapping in 'mmap' mode'''
+        if self.__closed:
+            raise ValueError('document is closed')
+        if self.__mmap is not None:
+            return memoryview(self.__mmap)[offset:offset + size]
+        with self.open_reader() as f:
+            f.seek(offset, io.SEEK_SET)
+            return f.read(size)
+
+    def close(self):
+        '''Close the underlying file if it is opened by this PdfDocument, and the mapping in 'mmap' mode. Reading the document afterwards raises ValueError.
+
+        The mapping cannot be closed while memoryviews of it, e.g. raw_stream of stream objects, are still referenced.
+        It is then left to be unmapped once they are released, with a ResourceWarning.'''
+        if self.__closed:
+            return
+        self.__closed = True
+        still_mapped = False
+        if self.__mmap is not None:
+            try:
+                self.__mmap.close()
+            except BufferError:
+                still_mapped = True
+            self.__mmap = None
+        self.__readers.close()
+        if self.__owns_f:
+            self.__f.close()
+        if still_mapped:
+            warnings.warn('memoryviews of the mapped document are still referenced, so that it is unmapped only once they are released', ResourceWarning, stacklevel=2)
+
+    @property
+    def closed(self) -> bool:
+        return self.__closed
 
     def get_xref_trailer_at_offset(self, f, offset):
         # read xref, trailer should directly follow, and MUST be read TOGETHER with xref
@@ -162,14 +343,14 @@ class PdfDocument:
         # TODO: catch exception for parsing PdfXRefSection
         if temp == b'xref':
             # uncompressed xref section
-            utils.seek_until(f, syntax.NON_WHITESPACES, ignore_comment=True)
+            utils.skip_whitespace(f)
             xref_section = PdfXRefSection(f)
             # find trailer dict and Prev
             # trailer dict CAN contain references
-            utils.seek_until(f, syntax.NON_WHITESPACES, ignore_comment=True)
+            utils.skip_whitespace(f)
             temp, _ = utils.read_until(f, syntax.EOL)
             if temp == b'trailer':
-                utils.seek_until(f, syntax.NON_WHITESPACES, ignore_comment=True)
+                utils.skip_whitespace(f)
                 trailer_dict = PdfDictionaryObject.create_from_file(f, self)
                 self.offset_xref_trailer[offset] = (xref_section, trailer_dict)
             else:
@@ -187,10 +368,14 @@ class PdfDocument:
 
         return self.offset_xref_trailer[offset]
 
-    def parse_normal(self, f, progress_cb=None):
-        '''Initialize a PdfDocument from a opened PDF file f by reading xref and trailers. After this is called, offset_obj, offset_obj_streams, compressed_obj, offset_xref_trailer, all xref sections are ready'''
+    def parse_normal(self, f, progress_cb=None, *, lazy=False):
+        '''Initialize a PdfDocument from a opened PDF file f by reading xref and trailers. After this is called, offset_xref_trailer and all xref sections are ready.
+
+        Unless lazy, all uncompressed objects are also loaded by load_all(), after which offset_obj and offset_obj_streams are ready,
+        and so are all compressed objects if objstm_executor is set.
+        progress_cb is as in __init__. To cancel parsing, pass a progress.Progress with a cancel event'''
+        progress = make_progress(progress_cb)
         f.seek(0, io.SEEK_SET)
-        filesize = os.fstat(f.fileno()).st_size
         # First line is header
         s, eol_marker = utils.read_until(f, syntax.EOL)
         header = re.match(rb'%PDF-(\d+\.\d+)', s)
@@ -202,7 +387,6 @@ class PdfDocument:
 
         # read from end of file, find xref
         eof_found = -1
-        startxref_found = -1
         temp_line = b''
         temp_count = 2
         temp_offset = 0
@@ -212,7 +396,6 @@ class PdfDocument:
                 eof_found = temp_offset
             if eof_found != -1 and temp_count == 0:
                 if line.rstrip() == b'startxref':
-                    startxref_found = temp_offset
                     break
                 else:
                     raise Exception('startxref not found at 2 lines before EOF marker')
@@ -225,67 +408,160 @@ class PdfDocument:
         self.increments[-1]['startxref'] = xref_offset
         self.increments[-1]['eof'] = True
 
-        inuse_count = 0
+        progress.start('xref')
         while True:
             f.seek(xref_offset, io.SEEK_SET)
-            xref_section, trailer = self.get_xref_trailer_at_offset(f, xref_offset)
+            with self._phase('xref'):
+                xref_section, trailer = self.get_xref_trailer_at_offset(f, xref_offset)
             self.offset_xref_trailer[xref_offset] = (xref_section, trailer)
-            for subsec in xref_section.subsections:
-                inuse_count += len(subsec.inuse_entry)
+            progress.update(len(self.offset_xref_trailer))
             self.increments[0]['xref_section'] = xref_section
             self.increments[0]['trailer'] = trailer
             if trailer.get('Prev') is None:
                 break
-            if trailer['Prev'].value - int(trailer['Prev'].value) != 0:
+            if not isinstance(trailer['Prev'].value, int):
                 raise Exception(f'Prev must be an integer, in trailer dict at offset {xref_offset}')
-            xref_offset = int(trailer['Prev'].value) # must not be indirect
+            xref_offset = trailer['Prev'].value # must not be indirect
             self.increments = [{ 'body': [], 'xref_section': None, 'trailer': None, 'startxref': None, 'eof': False }] + self.increments
             self.increments[0]['startxref'] = xref_offset
+        progress.finish()
+        self.build_obj_index()
         self.ready = True
 
+        if not lazy:
+            # with an executor, object streams are inflated in parallel here rather than one by one on demand
+            self.load_all(progress, decode_objstms=self.objstm_executor is not None)
+
+    def build_obj_index(self):
+        '''(Re)build obj_index from the xref sections of all increments. Must be called whenever increments are changed'''
+        sizes = [inc['trailer'].get('Size') for inc in self.increments if inc['trailer'] is not None]
+        sizes = [size.value for size in sizes if isinstance(size, PdfNumericObject) and isinstance(size.value, int)]
+        self.obj_index = PdfObjectIndex([inc['xref_section'] for inc in self.increments], max(sizes, default=None))
+        self.mark_edited()
+
+    def load_all(self, progress_cb=None, *, decode_objstms=True):
+        '''Parse every in-use object of every increment, if not already done.
+
+        If decode_objstms, also parse every compressed object of the latest increment. progress_cb is as in parse_normal'''
+        if not self.ready:
+            raise Exception('load_all can only be called after the document is scanned completely.')
+        with self.open_reader() as f, self._phase('objects'):
+            self.__load_all(f, make_progress(progress_cb), decode_objstms)
+
+    def __load_all(self, f, progress, decode_objstms):
+        inuse_count = sum(len(subsec) - subsec.count(PdfXRefSubSection.FREE) for inc in self.increments for subsec in inc['xref_section'].subsections)
         inuse_parsed_count = 0
+        progress.start('objects', inuse_count)
         # parse each in use obj num
         for inc in self.increments:
             for subsec in inc['xref_section'].subsections:
-                for entry in subsec.inuse_entry:
-                    if entry.get('compressed'):
+                for obj_no, kind, offset, gen_no in zip(itertools.count(subsec.first_objno), subsec.types, subsec.field2, subsec.field3):
+                    if kind == PdfXRefSubSection.FREE:
+                        continue
+                    if kind != PdfXRefSubSection.INUSE:
                         inuse_parsed_count += 1
                         continue
-                    offset = entry['offset']
-                    f.seek(offset, io.SEEK_SET)
-                    new_obj = PdfObject.create_from_file(f, self)
-                    if not isinstance(new_obj, PdfIndirectObject) or new_obj.obj_no != entry['obj_no'] or new_obj.gen_no != entry['gen_no']:
-                        raise Exception(f'Invalid obj referenced by xref at offset {offset}')
-                    self.offset_obj[offset] = new_obj
+                    new_obj = self.offset_obj.get(offset)
+                    if self.stats is not None:
+                        self.stats.count_lookup('offset_obj', new_obj is not None)
+                    if new_obj is None:
+                        f.seek(offset, io.SEEK_SET)
+                        new_obj = PdfObject.create_from_file(f, self)
+                        if not isinstance(new_obj, PdfIndirectObject) or new_obj.obj_no != obj_no or new_obj.gen_no != gen_no:
+                            raise Exception(f'Invalid obj referenced by xref at offset {offset}')
+                        if self.stats is not None:
+                            self.stats.count_object(new_obj)
+                        with self.__cache_lock:
+                            new_obj = self.offset_obj.setdefault(offset, new_obj)
                     if isinstance(new_obj.value, PdfStreamObject) and new_obj.value.dict.get('Type') == 'ObjStm':
                         self.offset_obj_streams[offset] = new_obj
                     inuse_parsed_count += 1
-                    print('', end="\r")
-                    print(f'{inuse_parsed_count / inuse_count * 100:5.2f}% processed', end='', flush=True)
-                    if progress_cb is not None: progress_cb(f'{inuse_parsed_count / inuse_count * 100:5.2f}% processed', read=inuse_parsed_count, total=inuse_count)
-
-        print('Decoding object streams...')
-        if progress_cb is not None: progress_cb('Decoding object streams...', read=inuse_parsed_count, total=inuse_count)
-        for k in self.offset_obj_streams:
-            from objstm import decode_objstm
-            self.compressed_obj = { **(self.compressed_obj), **(decode_objstm(self.offset_obj_streams[k], self)) }
-        print('', end="\r")
-        print('100% processed    ')
-        if progress_cb is not None: progress_cb('100% processed', read=inuse_parsed_count, total=inuse_count)
-        print('Done')
-        if progress_cb is not None: progress_cb('Done', read=inuse_parsed_count, total=inuse_count)
+                    progress.update(inuse_parsed_count)
+        progress.finish()
+
+        if decode_objstms:
+            # in order of object streams, so that each is decoded only once
+            locations = sorted(self.obj_index.get_obj_offset(obj_num) for obj_num in self.obj_index.get_obj_nums(PdfObjectIndex.COMPRESSED))
+            progress.start('objstm', len(locations))
+            if self.objstm_executor is None:
+                for done, location in enumerate(locations, 1):
+                    if location not in self.compressed_obj:
+                        self.load_compressed_obj(*location)
+                    progress.update(done)
+            else:
+                self.__load_compressed_parallel(locations, progress)
+            progress.finish()
+
+    def get_objstm(self, stream_obj_no):
+        '''Get the decoded object stream with object number stream_obj_no, through objstm_cache'''
+        objstm = self.objstm_cache.get(stream_obj_no)
+        if objstm is None:
+            stream_obj = self.get_obj(stream_obj_no, 0)
+            if stream_obj is None:
+                raise Exception(f'Object stream {stream_obj_no} not found')
+            with self._phase('objstm'):
+                objstm = ObjectStream(stream_obj)
+            self.objstm_cache.put(stream_obj_no, objstm)
+        return objstm
+
+    def load_compressed_obj(self, stream_obj_no, index):
+        '''Parse the index-th object in the object stream stream_obj_no, and cache it in compressed_obj'''
+        obj = self.get_objstm(stream_obj_no).get_obj(index, self)
+        if self.stats is not None:
+            self.stats.count_object(obj)
+        with self.__cache_lock:
+            return self.compressed_obj.setdefault((stream_obj_no, index), obj)
+
+    def __load_compressed_parallel(self, locations, progress):
+        # group indices by object stream, keeping only those not already parsed
+        indices = OrderedDict()
+        for stream_obj_no, index in locations:
+            if (stream_obj_no, index) not in self.compressed_obj:
+                indices.setdefault(stream_obj_no, []).append(index)
+        done = len(locations) - sum(len(stream_indices) for stream_indices in indices.values())
+        # object streams still in objstm_cache are parsed from it, only the others are inflated by the executor
+        pending = []
+        for stream_obj_no in indices:
+            objstm = self.objstm_cache.get(stream_obj_no)
+            if objstm is None:
+                pending.append(stream_obj_no)
+            else:
+                done = self.__load_from_objstm(objstm, indices[stream_obj_no], done, progress)
+        # in batches, so that at most a few decoded streams per worker are held at once
+        batch_size = 4 * (os.cpu_count() or 1)
+        for batch in utils.chunks(pending, batch_size):
+            stream_objs = [detach_objstm(self.get_obj(stream_obj_no, 0).value) for stream_obj_no in batch]
+            # map() yields in submission order, so that the result does not depend on scheduling
+            with self._phase('objstm'):
+                objstms = list(self.objstm_executor.map(inflate_objstm, batch, stream_objs))
+            for objstm in objstms:
+                self.objstm_cache.put(objstm.obj_no, objstm)
+                done = self.__load_from_objstm(objstm, indices[objstm.obj_no], done, progress)
+
+    def __load_from_objstm(self, objstm, indices, done, progress):
+        for index in indices:
+            obj = objstm.get_obj(index, self)
+            if self.stats is not None:
+                self.stats.count_object(obj)
+            with self.__cache_lock:
+                self.compressed_obj.setdefault((objstm.obj_no, index), obj)
+        done += len(indices)
+        progress.update(done)
+        return done
+
+    def load_objstm(self, stream_obj_no):
+        '''Parse all objects in the object stream stream_obj_no and cache them in compressed_obj'''
+        objstm = self.get_objstm(stream_obj_no)
+        for index in range(len(objstm)):
+            if (stream_obj_no, index) not in self.compressed_obj:
+                self.load_compressed_obj(stream_obj_no, index)
 
     def parse_linear(self, f, progress_cb=None):
-        '''Initialize a PdfDocument from a opened PDF file f from the beginning'''
-        def print_progress():
-            print('', end="\r")
-            print(f'{f.tell() / filesize * 100:5.2f}% processed', end='', flush=True)
-            if progress_cb is not None: progress_cb(f'{f.tell() / filesize * 100:5.2f}% processed', read=f.tell(), total=filesize)
-
+        '''Initialize a PdfDocument from a opened PDF file f from the beginning. progress_cb is as in parse_normal'''
+        progress = make_progress(progress_cb)
         f.seek(0, io.SEEK_SET)
-        filesize = os.fstat(f.fileno()).st_size
-
-        print_progress()
+        filesize = utils.file_size(f)
+        progress.start('linear', filesize)
 
         # First line is header
         s, eol_marker = utils.read_until(f, syntax.EOL)
@@ -297,13 +573,13 @@ class PdfDocument:
             raise Exception('Not a PDF file')
 
         while True:
-            utils.seek_until(f, syntax.NON_WHITESPACES, ignore_comment=False)
+            utils.skip_whitespace(f, ignore_comment=False)
             if f.tell() >= filesize:
                 break
             org_pos = f.tell()
             s, eol_marker = utils.read_until(f, syntax.EOL)
             if s == b'startxref': # the last startxref always override the ones before
-                utils.seek_until(f, syntax.NON_WHITESPACES, ignore_comment=True)
+                utils.skip_whitespace(f)
                 t, _ = utils.read_until(f, syntax.EOL)
                 self.startxref = int(t)
                 self.increments[-1]['startxref'] = self.startxref
@@ -314,7 +590,7 @@ class PdfDocument:
                 self.offset_xref[org_pos] = self.increments[-1]['xref_section']
                 continue
             elif s == b'trailer':
-                utils.seek_until(f, syntax.NON_WHITESPACES, ignore_comment=True)
+                utils.skip_whitespace(f)
                 self.increments[-1]['trailer'] = PdfDictionaryObject.create_from_file(f, self)
                 continue
             elif s == b'%%EOF':
@@ -323,7 +599,8 @@ class PdfDocument:
                 # does not appear by itself it when it is preceded by some
                 # whitespaces, which should be ignored
                 self.increments[-1]['eof'] = True
-                f.seek(5 + len(eol_marker), io.SEEK_CUR)
+                # read_until consumed %%EOF, but not the EOL marker after it
+                f.seek(len(eol_marker), io.SEEK_CUR)
                 continue
             elif s[0:1] == b'%':
                 # otherwise, it is a comment, ignore the whole remaining line
@@ -337,28 +614,18 @@ class PdfDocument:
 
             # TODO: how to handle object parse error?
             new_obj = PdfObject.create_from_file(f, self)
+            if self.stats is not None:
+                self.stats.count_object(new_obj)
             self.increments[-1]['body'] += [new_obj]
             self.offset_obj[org_pos] = new_obj
             if isinstance(new_obj.value, PdfStreamObject) and new_obj.value.dict.get('Type') == 'ObjStm':
                 self.offset_obj_streams[org_pos] = new_obj
-            print_progress()
+            progress.update(f.tell())
 
-        print('', end="\r")
-        print('100% processed    ')
-        if progress_cb is not None: progress_cb('100% processed', read=f.tell(), total=filesize)
+        progress.finish()
+        self.build_obj_index()
         self.ready = True
 
-        print('Decoding object streams...')
-        if progress_cb is not None: progress_cb('Decoding object streams...', read=f.tell(), total=filesize)
-        for k in self.offset_obj_streams:
-            from objstm import decode_objstm
-            self.compressed_obj = { **(self.compressed_obj), **(decode_objstm(self.offset_obj_streams[k], self)) }
-        print('Done')
-        if progress_cb is not None: progress_cb('Done', read=f.tell(), total=filesize)
-
-
-
-
     def __repr__(self):
         version_str = f'version={self.version}'
         startxref_str = f'startxref={self.startxref}'
@@ -379,6 +646,3 @@ class PdfDocument:
             for obj in increment['body']:
                 body_repr += str(obj) + '\n'
         return f'{version_str}\n{body_repr}'
-
-
-
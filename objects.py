@@ -1,4 +1,5 @@
 import utils
+import scan
 from utils import b_
 import io
 import re
@@ -14,6 +15,9 @@ from typing import List, Dict
 
 # adapted from PyPDF2
 class PdfObject(ABC):
+    """Subclasses define __slots__, so that instances have no __dict__"""
+    __slots__ = ()
+
     @abstractmethod
     def write_to_file(self, f: io.BufferedReader):
         """Should not include any delimiters. Handled externally and manually"""
@@ -24,56 +28,32 @@ class PdfObject(ABC):
     @classmethod
     @abstractmethod
     def create_from_file(cls, f: io.BufferedReader, doc):
-        char = f.peek(1)[0:1]
-        # TODO:
-        if char == b't' or char == b'f':
-            return PdfBooleanObject.create_from_file(f)
-        elif char in [b'0', b'1', b'2', b'3', b'4', b'5', b'6', b'7', b'8', b'9', b'+', b'-', b'.']:
-            o = f.tell()
-            n = PdfNumericObject.create_from_file(f)
-            if n.value < 0 or n.value - int(n.value) != 0: # a decimal or a negative number, never a indirect obj
-                return n
-            o2 = f.tell()
-
-            utils.seek_until(f, syntax.NON_WHITESPACES, ignore_comment=True)
-            n2, _ = utils.read_until(f, syntax.DELIMS + syntax.WHITESPACES)
-            if re.match(rb'\d+$', n2) is None: # next token not a number, never an indirect obj
-                f.seek(o2, io.SEEK_SET)
-                return n
-            else:
-                utils.seek_until(f, syntax.NON_WHITESPACES, ignore_comment=True)
-                s, _ = utils.read_until(f, syntax.DELIMS + syntax.WHITESPACES)
-                if s == b'obj': # all 3 tokens are correct, an indirect obj
-                    f.seek(o, io.SEEK_SET)
-                    return PdfIndirectObject.create_from_file(f, doc)
-                elif s == b'R': # all 3 tokens are correct, an indirect reference
-                    f.seek(o, io.SEEK_SET)
-                    return PdfReferenceObject.create_from_file(f, doc)
-                else:
-                    f.seek(o2, io.SEEK_SET)
-                    return n
-        elif char == b'(':
-            return PdfLiteralStringObject.create_from_file(f)
-        elif char == b'<':
-            char = utils.peek_at_least(f, 2)[0:2]
-            if char == b'<<':
-                dictobj = PdfDictionaryObject.create_from_file(f, doc)
-                return dictobj
-            else:
-                return PdfHexStringObject.create_from_file(f)
-        elif char == b'/':
-            return PdfNameObject.create_from_file(f)
-        elif char == b'[':
-            return PdfArrayObject.create_from_file(f, doc)
-        elif char == b'n':
-            return PdfNullObject.create_from_file(f)
-        else:
-            raise Exception(f'Unknown token at {f.tell()}')
-
+        """Parse any object, including an indirect object, at the current position of f. See parse.parse_object()"""
+        import parse
+        return parse.parse_object(f, doc)
 
 class PdfBooleanObject(PdfObject):
-    def __init__(self, value):
-        self.value = value
+    """Immutable. There are only 2 instances, for true and false, so that setting value raises AttributeError"""
+    __slots__ = ['value']
+    _instances = {}
+
+    def __new__(cls, value):
+        value = bool(value)
+        self = cls._instances.get(value)
+        if self is None:
+            self = super().__new__(cls)
+            object.__setattr__(self, 'value', value)
+            cls._instances[value] = self
+        return self
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{self!r} is shared and immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{self!r} is shared and immutable')
+
+    def __reduce__(self):
+        return (PdfBooleanObject, (self.value,))
 
     def write_to_file(self, f: io.BufferedReader):
         if self.value:
@@ -89,41 +69,94 @@ class PdfBooleanObject(PdfObject):
 
     @classmethod
     def create_from_file(cls, f: io.BufferedReader):
-        org_pos = f.tell()
-        token, _ = utils.read_until(f, syntax.DELIMS + syntax.WHITESPACES)
-        if token == b'true':
-            return PdfBooleanObject(True)
-        elif token == b'false':
-            return PdfBooleanObject(False)
-        else:
-            f.seek(org_pos, io.SEEK_SET)
-            raise Exception(f'Parse Error: Not a valid Boolean object at offset {org_pos}.')
+        import parse
+        return parse.parse_object(f, None, PdfBooleanObject, 'Boolean object')
 
-# TODO: may be also inherit from Decimal?
 class PdfNumericObject(PdfObject):
+    """value is an int for integers and a float for reals, or a Decimal for a real which a float cannot keep exactly,
+    e.g. one with more significant digits than a float holds. The decimal property gives the value as written, as a Decimal.
+
+    A Decimal given to the constructor is converted likewise, as a real if it is written with a fraction, e.g.
+    Decimal('1.0'), and otherwise as an integer, e.g. Decimal(1).
+    Instances of small non-negative integers returned by create_from_file and shared_number are shared, so that
+    setting their value raises AttributeError. Other instances can be modified"""
+    __slots__ = ['value']
+
     def __init__(self, value):
-        self.value: Decimal = value
+        if isinstance(value, Decimal):
+            exponent = value.as_tuple().exponent
+            value = int(value) if isinstance(exponent, int) and exponent >= 0 else scan.exact_real(value)
+        object.__setattr__(self, 'value', value)
+
+    def __setattr__(self, name, value):
+        if self._is_shared():
+            raise AttributeError(f'{self!r} is shared and immutable, use a new PdfNumericObject instead')
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name):
+        if self._is_shared():
+            raise AttributeError(f'{self!r} is shared and immutable, use a new PdfNumericObject instead')
+        object.__delattr__(self, name)
+
+    def _is_shared(self) -> bool:
+        value = getattr(self, 'value', None)
+        return type(value) is int and 0 <= value < len(_SMALL_INTEGERS) and _SMALL_INTEGERS[value] is self
+
+    def __reduce__(self):
+        # only shared instances are copied and unpickled as the shared instance, others stay private and mutable
+        return (shared_number if self._is_shared() else type(self), (self.value,))
+
+    @property
+    def decimal(self) -> Decimal:
+        '''The value as a Decimal, numerically equal to the number as written in the file, though not necessarily
+        with the same digits, e.g. trailing zeros of the fraction'''
+        if isinstance(self.value, float):
+            return Decimal(repr(self.value))
+        return Decimal(self.value)
+
+    def as_int(self) -> int:
+        '''The value as an int, raising ValueError if it is not integral'''
+        if isinstance(self.value, int):
+            return self.value
+        integral = self.value.is_integer() if isinstance(self.value, float) else self.value == self.value.to_integral_value()
+        if not integral:
+            raise ValueError(f'{self} is not an integer')
+        return int(self.value)
 
     def write_to_file(self, f: io.BufferedReader):
-        f.write(b_(self.value))
+        f.write(b_(self))
 
     def __repr__(self):
-        return f'PdfNumericObject({str(self.value)})'
+        return f'PdfNumericObject({str(self)})'
 
     def __str__(self):
-        return str(self.value)
+        if isinstance(self.value, int):
+            return str(self.value)
+        # PDF does not allow exponents
+        s = format(self.value, 'f') if isinstance(self.value, Decimal) else repr(self.value)
+        if 'e' in s:
+            s = format(Decimal(s), 'f')
+        # keep a period, so that the real is not read back as an integer
+        return s if '.' in s else s + '.0'
 
     @classmethod
     def create_from_file(cls, f: io.BufferedReader):
-        org_pos = f.tell()
-        token, _ = utils.read_until(f, syntax.DELIMS + syntax.WHITESPACES)
-        if re.match(br'^[+-]?\d+(?:\.\d*)?|[+-]?\.\d+$', token) is None:
-            f.seek(org_pos, io.SEEK_SET)
-            raise Exception(f'Parse Error: Not a valid Numeric object at offset {org_pos}.')
-        return PdfNumericObject(Decimal(token.decode('iso-8859-1')))
+        import parse
+        return parse.parse_object(f, None, PdfNumericObject, 'Numeric object')
+
+# shared instances of the most common numbers, e.g. generation numbers, flags and small coordinates
+_SMALL_INTEGERS = [PdfNumericObject(i) for i in range(1024)]
+
+def shared_number(value) -> PdfNumericObject:
+    '''PdfNumericObject of value, shared if value is a small non-negative integer'''
+    if type(value) is int and 0 <= value < 1024:
+        return _SMALL_INTEGERS[value]
+    return PdfNumericObject(value)
 
 class PdfLiteralStringObject(PdfObject):
     """internal value must be a normal Python string"""
+    __slots__ = ['value']
+
     def __init__(self, value):
         if not isinstance(value, str): raise ValueError('internal value must be a normal Python string')
         self.value = value
@@ -140,83 +173,26 @@ class PdfLiteralStringObject(PdfObject):
 
     def write_to_file(self, f: io.BufferedReader):
         if not isinstance(self.value, str): raise ValueError('internal value must be a normal Python string')
-        # https://stackoverflow.com/questions/3411771/best-way-to-replace-multiple-characters-in-a-string
-        # conclusion: optimum is to use a char list, and do prelim check for presence
-        for ch in ['\\', '(', ')', '\n', '\r', '\t', '\b', '\f'] + [chr(x) for x in range(128, 256)]:
-            if ch in text:
-                code = ord(ch)
-                if ch in ['\\', '(', ')']:
-                    text = text.replace(ch, '\\' + ch)
-                elif code >= 128 and code < 256:
-                    text = text.replace(ch, '\\' + oct(code)[2:])
-                else:
-                    text.translate(str.maketrans({'\n': '\\n', '\r': '\\r', '\t': '\\t', '\b': '\\b', '\f': '\\f'}))
+        try:
+            f.write(b'(' + self.value.translate(_LITERAL_STRING_ESCAPES).encode('iso-8859-1') + b')')
+        except UnicodeEncodeError as e:
+            raise ValueError(f'Character {e.object[e.start]!r} cannot be written in a literal string') from None
 
     @classmethod
     def create_from_file(cls, f: io.BufferedReader):
-        org_pos = f.tell()
-        token: bytes = f.read(1)
-        if token != b'(':
-            f.seek(org_pos, io.SEEK_SET)
-            raise Exception(f'Parse Error: Not a valid string at offset {org_pos}.')
-        result = bytearray(b'')
-        stack = 1 # 1 for initial (
-        while True:
-            # Balanced pairs of parentheses within a string require no special treatment.
-            # backslash ( \ ) is used as an escape character for various purposes,
-            # such as to include ... unbalanced parentheses ...
-            token, endtoken = utils.read_until(f, [b'(', b')', b'\\(', b'\\)'])
-            result.extend(token)
-            if endtoken in [b'\\(', b'\\)']: # escaped, read it for now
-                f.seek(2, io.SEEK_CUR)
-                result.extend(endtoken)
-                continue
-            elif endtoken == b'(': # open bracket, stack += 1, read it for now
-                stack += 1
-                f.seek(1, io.SEEK_CUR)
-                result.extend(endtoken)
-                continue
-            elif endtoken == b')': # close bracket, stack -= 1, read it for now if string not done
-                stack -= 1
-                f.seek(1, io.SEEK_CUR)
-                if stack == 0: # string is done
-                    break
-                else:
-                    result.extend(endtoken)
-                    continue
-            elif endtoken == b'' and stack > 0:
-                f.seek(org_pos, io.SEEK_SET)
-                raise Exception(f'Parse Error: Not a valid string at offset {org_pos}.')
-
-        # If a string is too long to be conveniently placed on a single line, it may be split
-        # across multiple lines by using the backslash character at the end of a line to
-        # indicate that the string continues on the following line. The backslash and the
-        # end-of-line marker following it are not considered part of the string.
-        result = result.replace(b'\\\r\n', b'')
-        result = result.replace(b'\\\r', b'')
-        result = result.replace(b'\\\n', b'')
-
-        # If an end-of-line marker appears within a literal string without a preceding
-        # backslash, the result is equivalent to \n (regardless of whether the end-of-line
-        # marker was a carriage return, a line feed, or both).
-        result = result.replace(b'\r\n', b'\n')
-        result = result.replace(b'\r', b'\n')
-
-        # TABLE 3.2 Escape sequences in literal strings
-        result = result.replace(b'\\n', b'\n')
-        result = result.replace(b'\\r', b'\r')
-        result = result.replace(b'\\t', b'\t')
-        result = result.replace(b'\\b', b'\b')
-        result = result.replace(b'\\f', b'\f')
-        result = result.replace(b'\\(', b'(')
-        result = result.replace(b'\\)', b')')
-        result = result.replace(b'\\\\', b'\\')
-        result = re.sub(rb'\\([0-7]{1,3})', lambda m: chr(int(m.group(1), 8)).encode('iso-8859-1') if int(m.group(1), 8) < 256 else b'\\' + m.group(1), result)
-
-        return PdfLiteralStringObject(result.decode('iso-8859-1'))
+        import parse
+        return parse.parse_object(f, None, PdfLiteralStringObject, 'string')
+
+# str.translate table escaping a literal string in one pass: delimiters and backslashes,
+# control characters with a short escape, and bytes outside of 7-bit ASCII as 3-digit octal codes
+_LITERAL_STRING_ESCAPES = {ord(ch): '\\' + ch for ch in '\\()'}
+_LITERAL_STRING_ESCAPES.update({ord(ch): esc for ch, esc in zip('\n\r\t\b\f', ['\\n', '\\r', '\\t', '\\b', '\\f'])})
+_LITERAL_STRING_ESCAPES.update({code: f'\\{code:03o}' for code in range(128, 256)})
 
 class PdfHexStringObject(PdfObject):
     """internal value can be either bytes or bytearray"""
+    __slots__ = ['value']
+
     def __init__(self, value):
         self.value = value
 
@@ -225,78 +201,132 @@ class PdfHexStringObject(PdfObject):
 
     @classmethod
     def create_from_file(cls, f: io.BufferedReader):
-        org_pos = f.tell()
-        token: bytes = f.read(1)
-        if token != b'<':
-            f.seek(org_pos, io.SEEK_SET)
-            raise Exception(f'Parse Error: Not a valid hexadecimal string at offset {org_pos}.')
-        token, endtoken = utils.read_until(f, [b'>'])
-        if re.match(br'^[0-9A-Fa-f]*$', token) is None or endtoken != b'>':
-            f.seek(org_pos, io.SEEK_SET)
-            raise Exception(f'Parse Error: Not a valid hexadecimal string at offset {org_pos}.')
-        if len(token) == 0:
-            return PdfHexStringObject(b'')
-        else:
-            f.read(1) # read '>'
-            token = token.decode('iso-8859-1') # bytes.fromhex only accepts str. Moreover, we need to cater for odd length
-            if len(token) % 2 != 0: # PDF Reference 3.2.3, Hexadecimal Strings: if there is an odd number of digits, the final digit is assumed to be 0
-                token += '0'
-            return PdfHexStringObject(bytes.fromhex(token))
+        import parse
+        return parse.parse_object(f, None, PdfHexStringObject, 'hexadecimal string')
 
-PdfNameObjectBase = collections.namedtuple('_C_{:.0f}'.format(time.time()), ['value'])
+PdfNameObjectBase = collections.namedtuple('_C_{:.0f}'.format(time.time()), ['value', 'name', 'name_hash'])
 class PdfNameObject(PdfNameObjectBase, PdfObject):
-    """Immutable.
+    """Immutable and interned: instances are shared for each byte sequence, and compare equal by value in any case.
 
     The byte sequence of a name object should be interpreted as a UTF-8 sequence, after expanding # sequences (# followed by 2-digit hex)
 
-    This object stores the raw bytes as the primary value, as it is needed for equality checking. The interpreted string can be obtained by calling the get_name() method"""
+    This object stores the raw bytes as the primary value, as it is needed for equality checking. The interpreted string is
+    computed once, and can be obtained from name or by calling the get_name() method. The hash is that of the interpreted string,
+    so that a dict keyed by PdfNameObject can be looked up by str"""
     __slots__ = []
+    # process-wide intern tables, by raw bytes and by interpreted string. They are bounded, so that the arbitrary names
+    # of the documents opened by a long-running process are not all kept: once INTERN_LIMIT names are interned,
+    # the tables are emptied down to the standard names of _PINNED_NAMES, which are always interned
+    INTERN_LIMIT = 65536
+    _interned = {}
+    _interned_by_name = {}
+    _pinned = {}
+    _pinned_by_name = {}
+
     def __new__(cls, s):
-        b = bytes()
-        if isinstance(s, bytes) or isinstance(s, bytearray):
-            b = s
+        if isinstance(s, PdfNameObject):
+            return s
         elif isinstance(s, str):
-            b = bytearray(s, 'utf_8')
-            from itertools import chain
-            for c in chain(range(33), range(127, 256)):
-                if c in b:
-                    b = b.replace(bytes([c]), b_(('#' + hex(c)[2:]).upper()))
+            self = cls._interned_by_name.get(s)
+            if self is None:
+                b = bytearray(s, 'utf_8')
+                from itertools import chain
+                for c in chain(range(33), range(127, 256)):
+                    if c in b:
+                        b = b.replace(bytes([c]), b_(('#' + hex(c)[2:]).upper()))
+                self = cls._intern(bytes(b))
+                cls._interned_by_name.setdefault(s, self)
+            return self
+        elif isinstance(s, bytes) or isinstance(s, bytearray):
+            return cls._intern(bytes(s))
         else:
             raise ValueError()
-        return PdfNameObjectBase.__new__(cls, b)
+
+    @classmethod
+    def _intern(cls, b: bytes):
+        self = cls._interned.get(b)
+        if self is None:
+            if len(cls._interned) >= cls.INTERN_LIMIT:
+                cls._unintern()
+            name = cls._expand(b)
+            self = cls._interned.setdefault(b, PdfNameObjectBase.__new__(cls, b, name, hash(name)))
+        return self
+
+    @classmethod
+    def _unintern(cls):
+        '''Empty the intern tables, except for the pinned names. Names already handed out stay valid'''
+        cls._interned = dict(cls._pinned)
+        cls._interned_by_name = dict(cls._pinned_by_name)
+
+    @classmethod
+    def _pin(cls, names):
+        '''Intern names permanently'''
+        for s in names:
+            self = cls(s)
+            cls._pinned[self.value] = self
+            cls._pinned_by_name[self.name] = self
+
+    @staticmethod
+    def _expand(b: bytes, encoding='utf_8') -> str:
+        # expand all #-hex first
+        # TODO: char code 0 is not banned here, which is not allowed by spec
+        if b'#' in b:
+            b = re.sub(rb'#([0-9A-F]{2})', lambda m: bytes.fromhex(m.group(1).decode('ascii')), b, flags=re.IGNORECASE)
+        return b.decode(encoding, 'ignore')
+
+    def __getnewargs__(self):
+        return (self.value,)
 
     def __hash__(self):
-        return hash(self.get_name())
+        return self.name_hash
 
     def __eq__(self, other):
-        return (isinstance(other, PdfNameObject) and other.value == self.value) or ((isinstance(other, bytes) or isinstance(other, bytearray)) and self.value == other) or (isinstance(other, str) and self.get_name() == other)
+        if self is other:
+            return True
+        elif isinstance(other, str):
+            return self.name == other
+        elif isinstance(other, PdfNameObject) or isinstance(other, bytes) or isinstance(other, bytearray):
+            return self.value == (other.value if isinstance(other, PdfNameObject) else other)
+        return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
 
     def __repr__(self):
-        return f'PdfNameObject("{self.get_name()}")'
+        return f'PdfNameObject("{self.name}")'
 
     def __str__(self):
         return f'/{self.value.decode("iso-8859-1")}'
 
     def get_name(self, encoding='utf_8') -> str:
         '''Get the interpreted string from the raw bytes, i.e. #nn characters are interpreted'''
-        # expand all #-hex first
-        # TODO: char code 0 is not banned here, which is not allowed by spec
-        s = re.sub(rb'#([0-9A-Z]{2})', lambda m: bytes(int(m.group(1), 16)), self.value, flags=re.IGNORECASE)
-        return s.decode(encoding, 'ignore')
+        if encoding == 'utf_8':
+            return self.name
+        return self._expand(self.value, encoding)
 
     def write_to_file(self, f: io.BufferedReader):
         f.write(b'/' + self.value)
 
     @classmethod
     def create_from_file(cls, f: io.BufferedReader):
-        org_pos = f.tell()
-        token: bytes = f.read(1)
-        if token != b'/':
-            raise Exception(f'Parse Error: Not a valid name object at offset {org_pos}.')
-        result, _ = utils.read_until(f, syntax.DELIMS + syntax.WHITESPACES)
-        return PdfNameObject(result)
+        import parse
+        return parse.parse_object(f, None, PdfNameObject, 'name object')
+
+# keys and values of the dictionaries of the document structure, kept interned whatever the documents opened
+_PINNED_NAMES = (
+    'Type', 'Subtype', 'Length', 'Filter', 'DecodeParms', 'Predictor', 'Colors', 'BitsPerComponent', 'Columns', 'EarlyChange',
+    'FlateDecode', 'LZWDecode', 'ASCII85Decode', 'ASCIIHexDecode', 'RunLengthDecode', 'DCTDecode', 'JPXDecode', 'CCITTFaxDecode',
+    'Catalog', 'Root', 'Info', 'ID', 'Size', 'Prev', 'Encrypt', 'XRefStm', 'XRef', 'W', 'Index', 'ObjStm', 'N', 'First', 'Extends',
+    'Pages', 'Page', 'Kids', 'Count', 'Parent', 'Resources', 'MediaBox', 'CropBox', 'BleedBox', 'TrimBox', 'ArtBox', 'Rotate',
+    'Contents', 'Annots', 'Font', 'XObject', 'ExtGState', 'ColorSpace', 'Pattern', 'Shading', 'ProcSet', 'Properties',
+    'Image', 'Form', 'Width', 'Height', 'BBox', 'Matrix', 'BaseFont', 'Encoding', 'FirstChar', 'LastChar', 'Widths',
+    'FontDescriptor', 'ToUnicode', 'DeviceRGB', 'DeviceGray', 'DeviceCMYK', 'Outlines', 'Names', 'Dests', 'Metadata',
+)
+PdfNameObject._pin(_PINNED_NAMES)
 
 class PdfArrayObject(PdfObject):
+    __slots__ = ['value']
+
     def __init__(self, value: List[PdfObject]):
         self.value = value
 
@@ -315,26 +345,12 @@ class PdfArrayObject(PdfObject):
 
     @classmethod
     def create_from_file(cls, f: io.BufferedReader, doc):
-        org_pos = f.tell()
-        token: bytes = f.read(1)
-        if token != b'[':
-            f.seek(org_pos, io.SEEK_SET)
-            raise Exception(f'Parse Error: Not a valid array object at offset {org_pos}.')
-        result = []
-        while True:
-            utils.seek_until(f, syntax.NON_WHITESPACES, ignore_comment=True)
-            if f.peek(1)[0:1] != b']':
-                try:
-                    result += [PdfObject.create_from_file(f, doc)]
-                except Exception as ex:
-                    raise Exception(f'Parse Error: Not a valid array object at offset {org_pos}.') from ex
-            else:
-                f.read(1)
-                break
-        return PdfArrayObject(result)
+        import parse
+        return parse.parse_object(f, doc, PdfArrayObject, 'array object')
 
 class PdfDictionaryObject(PdfObject):
     """Specifying the null object as the value of a dictionary entry (Section 3.2.6, “Dictionary Objects”) is equivalent to omitting the entry entirely."""
+    __slots__ = ['value']
 
     def __init__(self, value: Dict[PdfNameObject, PdfObject]):
         self.value = value
@@ -355,7 +371,7 @@ class PdfDictionaryObject(PdfObject):
         return self.value.get(key, default)
 
     def keys(self) -> List[str]:
-        return [kn.get_name() for kn in self.value.keys()]
+        return [kn.name for kn in self.value.keys()]
 
     def __repr__(self):
         return f'PdfDictionaryObject({"{" + ", ".join([f"{k}: {repr(self[k])}" for k in self.keys()]) + "}"})'
@@ -374,35 +390,12 @@ class PdfDictionaryObject(PdfObject):
 
     @classmethod
     def create_from_file(cls, f: io.BufferedReader, doc):
-        org_pos = f.tell()
-        token: bytes = f.read(2)
-        if token != b'<<':
-            f.seek(org_pos, io.SEEK_SET)
-            raise Exception(f'Parse Error: Not a valid dictionary object at offset {org_pos}.')
-        result = {}
-        while True:
-            utils.seek_until(f, syntax.NON_WHITESPACES, ignore_comment=True)
-            if f.peek(1)[0:1] == b'/':
-                try:
-                    # key, must be a name
-                    k = PdfNameObject.create_from_file(f)
-                    # value
-                    utils.seek_until(f, syntax.NON_WHITESPACES, ignore_comment=True)
-                    v = PdfObject.create_from_file(f, doc)
-                    # TODO: check if dict use __eq__ for key equality and existence check
-                    result[k] = v
-                except Exception as ex:
-                    raise Exception(f'Parse Error: Not a valid dictionary object at offset {org_pos}.') from ex
-                continue
-            elif utils.peek_at_least(f, 2)[0:2] == b'>>':
-                f.read(2)
-                break
-            else:
-                f.seek(org_pos, io.SEEK_SET)
-                raise Exception(f'Parse Error: Not a valid dictionary object at offset {org_pos}.')
-        return PdfDictionaryObject(result)
+        import parse
+        return parse.parse_object(f, doc, PdfDictionaryObject, 'dictionary object')
 
 class PdfIndirectObject(PdfObject):
+    __slots__ = ['value', 'obj_no', 'gen_no']
+
     def __init__(self, value, obj_no: int, gen_no: int):
         self.value = value
         self.obj_no = obj_no
@@ -427,76 +420,76 @@ class PdfIndirectObject(PdfObject):
 
     @classmethod
     def create_from_file(cls, f: io.BufferedReader, doc):
-        org_pos = f.tell()
-        num, _ = utils.read_until(f, syntax.WHITESPACES)
-        if re.match(rb'\d+$', num) is None:
-            f.seek(org_pos, io.SEEK_SET)
-            raise Exception(f'Parse Error: Not a valid indirect object at offset {org_pos}.')
-        obj_no = int(num)
-        utils.seek_until(f, syntax.NON_WHITESPACES, ignore_comment=True)
-        num, _ = utils.read_until(f, syntax.WHITESPACES)
-        if re.match(rb'\d+$', num) is None:
-            f.seek(org_pos, io.SEEK_SET)
-            raise Exception(f'Parse Error: Not a valid indirect object at offset {org_pos}.')
-        gen_no = int(num)
-        utils.seek_until(f, syntax.NON_WHITESPACES, ignore_comment=True)
-        tok, _ = utils.read_until(f, syntax.DELIMS + syntax.WHITESPACES)
-        if tok != b'obj':
-            f.seek(org_pos, io.SEEK_SET)
-            raise Exception(f'Parse Error: Not a valid indirect object at offset {org_pos}.')
-
-        utils.seek_until(f, syntax.NON_WHITESPACES, ignore_comment=True)
-        inner_content_pos = f.tell()
-
-        # parse inner object
-        def inner2():
-            f.seek(inner_content_pos, io.SEEK_SET)
-            obj = PdfObject.create_from_file(f, doc)
-            utils.seek_until(f, syntax.NON_WHITESPACES, ignore_comment=True)
-            return obj
-        inner_obj = inner2()
-
-        # if inner object is a dict, and is followed by a stream extent, then the object should be stream object
-        # otherwise, if there is no endobj token, it is an error
-        temp = f.tell()
-        utils.seek_until(f, syntax.NON_WHITESPACES, ignore_comment=True)
-        token, endtoken = utils.read_until(f, syntax.DELIMS + syntax.WHITESPACES, maxsize=7)
-        f.seek(temp, io.SEEK_SET)
-        if not (token == b'endobj' and (endtoken != b'' or endtoken is None)):  # endtoken None to indicate EOF
-            if utils.peek_at_least(f, 7)[0:7] == b'stream\n' or utils.peek_at_least(f, 8)[0:8] == b'stream\r\n':
-                f.seek(inner_content_pos, io.SEEK_SET)
-                streamObj = PdfStreamObject.create_from_file(f, doc)
-                utils.seek_until(f, syntax.NON_WHITESPACES, ignore_comment=True)
-                token, endtoken = utils.read_until(f, syntax.DELIMS + syntax.WHITESPACES, maxsize=7)
-                if not (token == b'endobj' and (endtoken != b'' or endtoken is None)):
-                    f.seek(org_pos, io.SEEK_SET)
-                    raise Exception(f'Parse Error: Not a valid indirect object at offset {org_pos}.')
-                inner_obj = streamObj
-                #if streamObj.dict.get('Type') == 'ObjStm': # Object Stream, decode and parse the content
-
-            else:
-                f.seek(org_pos, io.SEEK_SET)
-                raise Exception(f'Parse Error: Not a valid indirect object at offset {org_pos}.')
-        else:
-            f.seek(6, io.SEEK_CUR)
-
-        return PdfIndirectObject(inner_obj, obj_no, gen_no)
+        import parse
+        return parse.parse_object(f, doc, PdfIndirectObject, 'indirect object')
 
 class PdfStreamObject(PdfObject):
-    def __init__(self, stream_dict: PdfDictionaryObject, raw_stream: bytes):
+    """raw_stream is either bytes, or a memoryview into the mapped file if the document is opened with the 'mmap' backend.
+
+    A stream parsed from a document only records where its data is, at offset and of length bytes. The data
+    is read from the document when raw_stream is accessed, and kept in the decoded_cache of the document
+    rather than on the object, like the result of decode(). Streams not from a document use the process-wide
+    PdfStreamObject.decoded_cache."""
+    __slots__ = ['dict', '_raw_stream', 'doc', 'offset', 'length']
+
+    def __init__(self, stream_dict: PdfDictionaryObject, raw_stream: bytes = None, *, doc=None, offset: int = None, length: int = None):
+        if raw_stream is None and doc is None:
+            raise ValueError('either raw_stream or the document holding the data must be given')
         self.dict = stream_dict
-        self.raw_stream = raw_stream
-        self.decoded_stream = None
+        self._raw_stream = raw_stream
+        self.doc = doc
+        self.offset = offset
+        self.length = len(raw_stream) if raw_stream is not None else length
 
-    def decode(self) -> bytes:
-        import decode
-        if self.decoded_stream is not None:
-            return self.decoded_stream
+    @staticmethod
+    def make_cache(max_size: int) -> utils.LRUCache:
+        """Cache of raw and decoded stream data, of at most max_size bytes. Keys are (stream, filters) pairs,
+        where filters is None for raw data, so that a change to /Filter or /DecodeParms misses the cache"""
+        return utils.LRUCache(max_size, sizeof=len)
 
-        if self.dict.get('Filter') is None:
-            self.decoded_stream = self.raw_stream
-            return self.decoded_stream
+    def get_cache(self) -> utils.LRUCache:
+        """The cache of decoded data of this stream, that of its document if any"""
+        return self.doc.decoded_cache if self.doc is not None else PdfStreamObject.decoded_cache
+
+    @property
+    def raw_stream(self):
+        return self._get_raw(keep=True)
+
+    def _get_raw(self, keep: bool):
+        '''The raw data, from the cache or else read from the document and, if keep, put in the cache'''
+        if self._raw_stream is not None:
+            return self._raw_stream
+        if self.doc.backend == 'mmap':
+            # a view of the mapping costs nothing to get again
+            return self.doc.read_bytes(self.offset, self.length)
+        cache = self.doc.decoded_cache
+        data = cache.get((self, None))
+        if data is None:
+            data = self.doc.read_bytes(self.offset, self.length)
+            if keep:
+                cache.put((self, None), data)
+        return data
+
+    @raw_stream.setter
+    def raw_stream(self, value):
+        cache = self.get_cache()
+        cache.pop((self, None))
+        cache.pop((self, self._filters_key()))
+        self._raw_stream = value
+        self.length = len(value)
+
+    @property
+    def loaded(self) -> bool:
+        """Whether the raw data is in memory, either given or in the cache"""
+        return self._raw_stream is not None or (self, None) in self.doc.decoded_cache
+
+    # Default limit on the size of decoded data, in bytes, or None for no limit
+    max_decoded_size = None
 
+    def get_filters(self) -> List[tuple]:
+        """List of (filter name, PdfDictionaryObject or None) in the order to be used for decoding"""
+        if self.dict.get('Filter') is None:
+            return []
         # /Filter array is just like matrix multiplication to ENCODE
         # 1st filter is the last to be applied, and therefore 1st to be used for DECODE
         # TODO: Remove the assumption that Filter value is always a direct obj
@@ -511,92 +504,94 @@ class PdfStreamObject(PdfObject):
         if isinstance(filters_params, PdfDictionaryObject):
             filters_params = [filters_params]
         if isinstance(filters_params, PdfArrayObject):
-            filters_params = filters_params.values
+            filters_params = filters_params.value
+        if not filters_params:
+            filters_params = []
+        return [(filt.get_name(), filters_params[i] if i < len(filters_params) and isinstance(filters_params[i], PdfDictionaryObject) else None)
+                for i, filt in enumerate(filters)]
 
-        self.decoded_stream = self.raw_stream
-        for i, filt in enumerate(filters): # filters is now list of PdfNameObject
-            decoder = getattr(decode, filt.get_name(), None)
-            if decoder is None:
-                raise Exception(f'Unrecognized decoder {filt.get_name()}')
-            self.decoded_stream = decoder(self.decoded_stream, filters_params[i] if filters_params else None)
+    def iter_decoded(self, max_output_size: int = None, chunk_size: int = 64 * 1024):
+        """Decode the stream incrementally, yielding chunks of decoded data.
 
-        return self.decoded_stream
+        Raise ValueError as soon as any filter produces more than max_output_size bytes,
+        which defaults to max_decoded_size"""
+        import decode
+        if max_output_size is None:
+            max_output_size = self.max_decoded_size
+        # only the decoded data is worth keeping in the cache
+        view = memoryview(self._get_raw(keep=False))
+        chunks = (view[i:i + chunk_size] for i in range(0, len(view), chunk_size))
+        stats = self.doc.stats if self.doc is not None else None
+        for name, params in self.get_filters():
+            chunks = decode.iter_decode(name, chunks, params)
+            if stats is not None:
+                chunks = stats.count_decoded(name, chunks)
+            if max_output_size is not None:
+                chunks = decode.iter_limit(chunks, max_output_size)
+        return chunks
+
+    def open_decoded(self, max_output_size: int = None, chunk_size: int = 64 * 1024) -> io.BufferedReader:
+        """Readable binary file object of the decoded data. See iter_decoded()"""
+        return io.BufferedReader(utils.IterReader(self.iter_decoded(max_output_size, chunk_size)), chunk_size)
+
+    def _filters_key(self) -> str:
+        return f'{self.dict.get("Filter")} {self.dict.get("DecodeParms")}'
+
+    def decode(self, use_cache: bool = True) -> bytes:
+        """Decode the whole stream at once. Unless use_cache is False, the result is looked up in and kept in get_cache()"""
+        if self.dict.get('Filter') is None:
+            return self.raw_stream
+        if not use_cache:
+            return b''.join(self.iter_decoded())
+        cache = self.get_cache()
+        key = (self, self._filters_key())
+        data = cache.get(key)
+        if data is None:
+            data = b''.join(self.iter_decoded())
+            cache.put(key, data)
+        return data
 
     def write_to_file(self, f: io.BufferedReader):
         pass
 
     @classmethod
     def create_from_file(cls, f: io.BufferedReader, doc):
-        org_pos = f.tell()
-
-        stream_dict = PdfObject.create_from_file(f, doc)
-        utils.seek_until(f, syntax.NON_WHITESPACES, ignore_comment=True)
-
-        if not (utils.peek_at_least(f, 7)[0:7] == b'stream\n' or utils.peek_at_least(f, 8)[0:8] == b'stream\r\n'):
-            f.seek(org_pos, io.SEEK_SET)
-            raise Exception(f'Parse Error: Not a valid stream object at offset {org_pos}.')
-        token, _ = utils.read_until(f, syntax.DELIMS + syntax.WHITESPACES)
-        utils.seek_until(f, syntax.NON_WHITESPACES, ignore_comment=True)
-
-        # check if dict has the required key /Length with valid values
-        if not isinstance(stream_dict, PdfDictionaryObject):
-            f.seek(org_pos, io.SEEK_SET)
-            raise Exception(f'Parse Error: Not a valid stream object at offset {org_pos}.')
-        if stream_dict.get('Length') is None:
-            raise Exception(f'Parse Error: Not a valid stream object at offset {org_pos}.')
-
-        if isinstance(stream_dict['Length'], PdfReferenceObject):
-            size = stream_dict['Length'].deref().value
-        elif isinstance(stream_dict['Length'], PdfNumericObject):
-            size = stream_dict['Length'].value
-        else:
-            raise Exception(f'Parse Error: Not a valid stream object at offset {org_pos}.')
-        if size.as_integer_ratio()[0] <= 0 or size.as_integer_ratio()[1] != 1:
-            raise Exception(f'Parse Error: Not a valid stream object at offset {org_pos}.')
-        size = size.as_integer_ratio()[0]
-
-        # check for filters
-        filt = None
-        if stream_dict.get('Filter') is not None:
-            # TODO: Remove the assumption that Filter value is always a direct obj
-            filt = stream_dict['Filter']
-            if isinstance(filt, PdfArrayObject):
-                if any(not isinstance(x, PdfNameObject) for x in filt.value):
-                    raise Exception(f'Parse Error: Not a valid stream object at offset {org_pos}.')
-                filt = filt.value[0]
-            # /Filter (or first element of the array) must specify a Name
-            if not isinstance(filt, PdfNameObject):
-                raise Exception(f'Parse Error: Not a valid stream object at offset {org_pos}.')
-
-        # read only /Length bytes
-        # filter implementation is reponsible for checking if the data length is correct
-        # e.g. if any needed end-of-data marker is present at only the end
-        raw = f.read(size)
-
-
-        # check if stream ends with b'endstream', optionally preceeded by b'\r', 'b'\n' or b'\r\n'
-        if utils.peek_at_least(f, 2)[0:2] == b'\r\n':
-            f.seek(2, io.SEEK_CUR)
-        elif utils.peek_at_least(f, 1)[0:1] == b'\r' or utils.peek_at_least(f, 1)[0:1] == b'\n':
-            f.seek(1, io.SEEK_CUR)
-        token, _ = utils.read_until(f, syntax.DELIMS + syntax.WHITESPACES)
-        if token != b'endstream':
-            raise Exception(f'Parse Error: Not a valid stream object at offset {org_pos}.')
-
-        # actual decoding is done in constructor
-        return PdfStreamObject(stream_dict, raw)
+        import parse
+        return parse.parse_object(f, doc, PdfStreamObject, 'stream object')
+
+# process-wide cache of decoded data, for streams not from a document
+PdfStreamObject.decoded_cache = PdfStreamObject.make_cache(64 * 1024 * 1024)
 
 class PdfReferenceObject(PdfObject):
+    """value is the indirect object referred to, as of the latest increment of doc. It is resolved once, and then
+    kept until the epoch of doc changes, i.e. until doc.mark_edited() is called"""
+    __slots__ = ['doc', 'obj_no', 'gen_no', '_target', '_epoch']
+
     def __init__(self, doc, obj_no: int, gen_no: int):
         if obj_no - int(obj_no) != 0 or gen_no - int(gen_no) != 0:
             raise ValueError('obj number and generation number must be integer')
         self.doc = doc
         self.obj_no = obj_no
         self.gen_no = gen_no
+        self._target = None
+        self._epoch = -1 # epoch of doc when _target was resolved
 
     @property
     def value(self):
-        return self.doc.get_obj(self.obj_no, self.gen_no)
+        doc = self.doc
+        if self._epoch == doc.epoch:
+            return self._target
+        # the epoch is read before resolving, so that an edit in the meantime is not masked
+        epoch = doc.epoch
+        target = doc.get_obj(self.obj_no, self.gen_no)
+        self._target = target
+        self._epoch = epoch
+        return target
+
+    @property
+    def resolved(self) -> bool:
+        '''Whether value is already resolved as of the current epoch of doc'''
+        return self._epoch == self.doc.epoch
 
     def deref(self):
         return self.value.value # Ref -> Indirect -> actual obj
@@ -615,27 +610,18 @@ class PdfReferenceObject(PdfObject):
 
     @classmethod
     def create_from_file(cls, f: io.BufferedReader, doc):
-        org_pos = f.tell()
-        num, _ = utils.read_until(f, syntax.WHITESPACES)
-        if re.match(rb'\d+$', num) is None:
-            f.seek(org_pos, io.SEEK_SET)
-            raise Exception(f'Parse Error: Not a valid reference at offset {org_pos}.')
-        obj_no = int(num)
-        utils.seek_until(f, syntax.NON_WHITESPACES, ignore_comment=True)
-        num, _ = utils.read_until(f, syntax.WHITESPACES)
-        if re.match(rb'\d+$', num) is None:
-            f.seek(org_pos, io.SEEK_SET)
-            raise Exception(f'Parse Error: Not a valid reference at offset {org_pos}.')
-        gen_no = int(num)
-        utils.seek_until(f, syntax.NON_WHITESPACES, ignore_comment=True)
-        tok, _ = utils.read_until(f, syntax.DELIMS + syntax.WHITESPACES)
-        if tok != b'R':
-            f.seek(org_pos, io.SEEK_SET)
-            raise Exception(f'Parse Error: Not a valid reference at offset {org_pos}.')
-        return PdfReferenceObject(doc, obj_no, gen_no)
+        import parse
+        return parse.parse_object(f, doc, PdfReferenceObject, 'reference')
 
 class PdfNullObject(PdfObject):
     """The null object has a type and value that are unequal to those of any other object. There is only one object of type null, denoted by the keyword null."""
+    __slots__ = ()
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
 
     def write_to_file(self, f: io.BufferedReader):
         f.write(b'null')
@@ -651,13 +637,8 @@ class PdfNullObject(PdfObject):
 
     @classmethod
     def create_from_file(cls, f: io.BufferedReader):
-        org_pos = f.tell()
-        token: bytes = f.read(4)
-        if token != b'null':
-            f.seek(org_pos, io.SEEK_SET)
-            raise Exception(f'Parse Error: Not a valid null object at offset {org_pos}.')
-        return PdfNullObject()
-
+        import parse
+        return parse.parse_object(f, None, PdfNullObject, 'null object')
 
 def val(pdfObj: PdfObject):
     if isinstance(pdfObj, PdfBooleanObject) or isinstance(pdfObj, PdfNumericObject) or isinstance(pdfObj, PdfLiteralStringObject)or isinstance(pdfObj, PdfHexStringObject):
@@ -1,46 +1,80 @@
-from objects import PdfStreamObject, PdfNumericObject, PdfIndirectObject, PdfObject
+from objects import PdfStreamObject, PdfNumericObject, PdfIndirectObject, PdfObject, PdfReferenceObject, PdfNameObject, PdfDictionaryObject
 import io
 import utils
+import parse
 import syntax
 
-def decode_objstm(objstmobj, doc):
-    result = {}
-    streamObj = objstmobj.value
-    objstmobj_no = objstmobj.obj_no
-    if not isinstance(streamObj, PdfStreamObject):
-        raise ValueError('objstmobj is not a PdfIndirectObject containing a PdfStreamObject')
-
-    objbytestream = io.BufferedReader(io.BytesIO(streamObj.decode()))
-    # N pairs of integers
-    # 1st int is obj no of the compressed object
-    # 2nd int is byte offset of that object, relative to the first obj
-    objbytestream.seek(0, io.SEEK_SET)
-    utils.seek_until(objbytestream, syntax.NON_WHITESPACES, ignore_comment=True)
-    numbers = []
-    N = 0
-    First = 0
-    try:
-        # TODO: assuming both N and First have direct obj values
-        N = int(str(streamObj.dict['N'].value))
-        First = int(str(streamObj.dict['First'].value))
-        if N < 0 or First < 0:
-            raise Exception(f'Invalid N or First field in ObjStm at offset {org_pos}.')
-    except Exception as ex:
-        raise Exception(f'Invalid N or First field in ObjStm at offset {org_pos}.') from ex
-    for _ in range(2 * N):
-        utils.seek_until(objbytestream, syntax.NON_WHITESPACES, ignore_comment=True)
-        numobj = PdfNumericObject.create_from_file(objbytestream)
+class ObjectStream():
+    '''Decoded content of an object stream: the decoded data, and the object number and offset of each compressed object in it.
+
+    Objects are parsed from the data only when asked for by get_obj()'''
+    __slots__ = ['obj_no', 'data', 'first', 'obj_nos', 'offsets']
+
+    def __init__(self, objstmobj):
+        streamObj = objstmobj.value
+        self.obj_no = objstmobj.obj_no
+        if not isinstance(streamObj, PdfStreamObject):
+            raise ValueError('objstmobj is not a PdfIndirectObject containing a PdfStreamObject')
+
+        self.data = streamObj.decode(use_cache=False) # kept by the objstm_cache of the document instead
+        # N pairs of integers
+        # 1st int is obj no of the compressed object
+        # 2nd int is byte offset of that object, relative to the first obj
+        N = 0
+        First = 0
         try:
-            temp = int(str(numobj.value))
-            if temp < 0:
-                raise Exception(f'Invalid obj no./offset in ObjStm at offset {org_pos}.')
-            numbers += [temp]
+            # TODO: assuming both N and First have direct obj values
+            N = streamObj.dict['N'].as_int()
+            First = streamObj.dict['First'].as_int()
+            if N < 0 or First < 0:
+                raise Exception(f'Invalid N or First field in ObjStm {self.obj_no}.')
         except Exception as ex:
-            raise Exception(f'Invalid ObjStm at offset {org_pos}.') from ex
-    for idx, p in enumerate(utils.chunks(numbers, 2)):
+            raise Exception(f'Invalid N or First field in ObjStm {self.obj_no}.') from ex
+        tokens = parse.Tokenizer(utils.BufferReader(self.data))
+        numbers = []
+        for _ in range(2 * N):
+            kind, value, start, end = tokens.next()
+            if kind != parse.NUMBER or type(value) is not int or value < 0:
+                raise Exception(f'Invalid ObjStm {self.obj_no}.')
+            numbers += [value]
+        self.first = First
+        self.obj_nos = numbers[0::2]
+        self.offsets = numbers[1::2]
+
+    def __len__(self):
+        return len(self.obj_nos)
+
+    @property
+    def nbytes(self) -> int:
+        '''Approximate memory used, for bounding caches of ObjectStream'''
+        return len(self.data) + 16 * len(self.obj_nos)
+
+    def get_obj(self, idx: int, doc) -> PdfIndirectObject:
+        '''Parse the idx-th compressed object'''
+        objbytestream = utils.BufferReader(self.data)
+        objbytestream.seek(self.first + self.offsets[idx], io.SEEK_SET)
         # gen no, of object stream and of any compressed object is implicitly 0
-        objbytestream.seek(First + p[1], io.SEEK_SET)
-        result[objstmobj_no,idx] = PdfIndirectObject(PdfObject.create_from_file(objbytestream, doc) , p[0], 0)
+        # objects are parsed from the decoded data, not the file of doc, so that any stream in it must be read at once
+        return PdfIndirectObject(parse.parse_object(objbytestream, doc, lazy_streams=False), self.obj_nos[idx], 0)
         # TODO: check for orphaned bytes between compressed objectes?
 
-    return result
\ No newline at end of file
+def decode_objstm(objstmobj, doc):
+    '''Parse all objects in an object stream, as a dict of [objstmobj_no, idx]: PdfIndirectObject'''
+    objstm = ObjectStream(objstmobj)
+    return {(objstm.obj_no, idx): objstm.get_obj(idx, doc) for idx in range(len(objstm))}
+
+def detach_objstm(stream_obj: PdfStreamObject) -> PdfStreamObject:
+    '''Copy an object stream with only the entries needed by ObjectStream, resolved and without references,
+    and the raw data as bytes, so that it can be sent to a worker thread or process'''
+    entries = {}
+    for key in ['Type', 'N', 'First', 'Filter', 'DecodeParms']:
+        value = stream_obj.dict.get(key)
+        if isinstance(value, PdfReferenceObject):
+            value = value.deref()
+        if value is not None:
+            entries[PdfNameObject(key)] = value
+    return PdfStreamObject(PdfDictionaryObject(entries), bytes(stream_obj.raw_stream))
+
+def inflate_objstm(obj_no: int, stream_obj: PdfStreamObject) -> ObjectStream:
+    '''Decode an object stream detached by detach_objstm, and parse its header. Can be run in a worker thread or process'''
+    return ObjectStream(PdfIndirectObject(stream_obj, obj_no, 0))
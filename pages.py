@@ -0,0 +1,75 @@
+from objects import PdfDictionaryObject, PdfReferenceObject
+
+# page attributes which a page inherits from its ancestors in the page tree, if it does not define them itself
+INHERITABLE_ATTRIBUTES = ('Resources', 'MediaBox', 'CropBox', 'Rotate')
+
+class PageIndex():
+    '''The page tree of a document, flattened by a single traversal, for looking up pages by index in O(1).
+
+    pages: [page index]: page dictionary
+    refs: [page index]: (obj_no, gen_no) of the page object, or None if it is a direct object
+    inherited: [page index]: inheritable attributes defined by the ancestors of the page, nearest first. Pages
+        with the same parent share the same dict, and a Pages node defining none of the attributes shares
+        the dict of its parent, so that these dicts must not be modified
+
+    resolve is called with a PdfReferenceObject and returns the object it refers to, e.g. as of an increment.
+    Raise an Exception if the tree is invalid, including when a node is reached twice, e.g. by a cycle.'''
+    def __init__(self, root, resolve):
+        self.pages = []
+        self.refs = []
+        self.inherited = []
+        visited = set() # (obj_no, gen_no) of referenced nodes, id() of direct nodes
+        stack = [(root, None, {})]
+        while len(stack) > 0:
+            node, ref, inherited = stack.pop()
+            if isinstance(node, PdfReferenceObject):
+                ref = (node.obj_no, node.gen_no)
+                node = resolve(node)
+            key = ref if ref is not None else id(node)
+            if key in visited:
+                where = f'object {ref[0]} {ref[1]}' if ref is not None else 'a direct node'
+                raise Exception(f'Page tree reaches {where} more than once')
+            visited.add(key)
+            if not isinstance(node, PdfDictionaryObject):
+                raise Exception('invalid Pages dictionary')
+            kind = node.get('Type')
+            if kind == 'Pages':
+                own = {name: node.get(name) for name in INHERITABLE_ATTRIBUTES if node.get(name) is not None}
+                if own:
+                    inherited = {**inherited, **own}
+                kids = node.get('Kids')
+                if isinstance(kids, PdfReferenceObject):
+                    kids = resolve(kids)
+                if kids is None:
+                    raise Exception('Pages dictionary without Kids')
+                for kid in reversed(kids.value):
+                    stack.append((kid, None, inherited))
+            elif kind == 'Page':
+                self.pages.append(node)
+                self.refs.append(ref)
+                self.inherited.append(inherited)
+            else:
+                raise Exception('invalid Pages dictionary')
+
+    def __len__(self):
+        return len(self.pages)
+
+    def __getitem__(self, index: int) -> PdfDictionaryObject:
+        return self.pages[index]
+
+    def get_attribute(self, index: int, name: str, default=None):
+        '''The value of the attribute name of the page index, either its own or inherited'''
+        value = self.pages[index].get(name)
+        if value is None and name in INHERITABLE_ATTRIBUTES:
+            value = self.inherited[index].get(name)
+        return default if value is None else value
+
+    def get_attributes(self, index: int) -> dict:
+        '''[name]: value of each of INHERITABLE_ATTRIBUTES in effect for the page index, either its own or inherited'''
+        page = self.pages[index]
+        attributes = dict(self.inherited[index])
+        for name in INHERITABLE_ATTRIBUTES:
+            value = page.get(name)
+            if value is not None:
+                attributes[name] = value
+        return attributes
@@ -0,0 +1,510 @@
+import io
+import re
+import scan
+import syntax
+import utils
+from objects import (PdfObject, PdfBooleanObject, PdfNumericObject, PdfLiteralStringObject, PdfHexStringObject, PdfNameObject,
+                     PdfArrayObject, PdfDictionaryObject, PdfIndirectObject, PdfStreamObject, PdfReferenceObject, PdfNullObject,
+                     shared_number)
+
+# Token kinds
+NUMBER = 0
+NAME = 1
+STRING = 2
+HEX_STRING = 3
+KEYWORD = 4
+ARRAY_BEGIN = 5
+ARRAY_END = 6
+DICT_BEGIN = 7
+DICT_END = 8
+EOF = 9
+
+_STRING_SPECIALS = re.compile(rb'[()\\\r]')
+# the byte each escape sequence in a literal string stands for, e.g. _ESCAPES[ord('n')] == ord('\\n')
+_ESCAPES = bytes(range(256)).translate(bytes.maketrans(b'nrtbf', b'\n\r\t\b\f'))
+_HEX_STRING_END = re.compile(rb'>')
+_WHITESPACES = re.compile(b'[' + b''.join(re.escape(ws) for ws in syntax.WHITESPACES) + b']')
+_NOT_HEX = re.compile(rb'[^0-9A-Fa-f]')
+
+class Tokenizer():
+    '''Splits the content of a file object into tokens, from its current position.
+
+    Tokens are tuples (kind, value, start, end), where start and end are offsets in the file. value is
+    a number for NUMBER, the decoded bytes for STRING, and the raw bytes for NAME (without the /),
+    HEX_STRING (without the angle brackets) and KEYWORD, i.e. any other run of regular characters.
+    Tokens given back with push_back() are returned again before reading further.
+
+    A BufferReader is scanned in place. Other file objects are read ahead in blocks, so call sync()
+    to move the file position to the end of the last token consumed. The first block is small, as most
+    objects are, and each further block is twice as large, up to MAX_BLOCK_SIZE. Once more than
+    TRIM_SIZE bytes are consumed, they are dropped from the buffer.'''
+    INITIAL_BLOCK_SIZE = 512
+    MAX_BLOCK_SIZE = 65536
+    TRIM_SIZE = 65536
+    __slots__ = ['f', 'buf', 'base', 'pos', 'eof', 'pending', 'block_size']
+
+    def __init__(self, f):
+        self.f = f
+        self.pending = []
+        if isinstance(f, utils.BufferReader):
+            self.buf = f.buffer
+            self.base = 0
+            self.pos = f.tell()
+            self.eof = True
+            self.block_size = None # scanned in place, never filled nor trimmed
+        else:
+            self.buf = bytearray()
+            self.base = f.tell()
+            self.pos = 0
+            self.eof = False
+            self.block_size = self.INITIAL_BLOCK_SIZE
+
+    def tell(self) -> int:
+        '''File offset of the end of the last token consumed'''
+        return self.base + self.pos
+
+    def sync(self):
+        '''Move the file position to the end of the last token consumed'''
+        self.f.seek(self.base + self.pos, io.SEEK_SET)
+
+    def _fill(self) -> bool:
+        '''Read another block. Return False at EOF'''
+        if self.eof:
+            return False
+        self.f.seek(self.base + len(self.buf), io.SEEK_SET)
+        block = self.f.read(self.block_size)
+        if not block:
+            self.eof = True
+            return False
+        self.buf += block
+        self.block_size = min(self.block_size * 2, self.MAX_BLOCK_SIZE)
+        return True
+
+    def _trim(self):
+        '''Drop the consumed part of the buffer. Only called between tokens, when no position into the buffer is held'''
+        del self.buf[:self.pos]
+        self.base += self.pos
+        self.pos = 0
+
+    def push_back(self, *tokens):
+        '''Return tokens, in order, before any other token. They must be the last tokens returned by next()'''
+        self.pending[0:0] = tokens
+        self.pos = tokens[0][2] - self.base
+
+    def error(self, what: str, offset: int):
+        return Exception(f'Parse Error: Not a valid {what} at offset {offset}.')
+
+    def next(self):
+        '''Return the next token, or (EOF, None, offset, offset) at the end of data'''
+        if self.pending:
+            token = self.pending.pop(0)
+            self.pos = token[3] - self.base
+            return token
+        if self.pos >= self.TRIM_SIZE and self.block_size is not None:
+            self._trim()
+        pos = self.pos
+        while True:
+            pos = scan.skip_whitespace(self.buf, pos, final=self.eof)
+            # more data is needed at the end of the buffer, or at the % of a comment not terminated within it
+            if self.eof or (pos < len(self.buf) and self.buf[pos] != 0x25):
+                break
+            self._fill()
+        buf = self.buf
+        if pos >= len(buf):
+            self.pos = pos
+            return (EOF, None, self.base + pos, self.base + pos)
+        c = buf[pos]
+        start = pos
+        if c == 0x2F: # /
+            end = self._regular_end(pos + 1)
+            kind, value = NAME, bytes(self.buf[pos + 1:end])
+        elif c == 0x28: # (
+            end, value = self._literal_string(pos)
+            kind = STRING
+        elif c == 0x3C: # <
+            if self._byte_at(pos + 1) == 0x3C:
+                kind, value, end = DICT_BEGIN, None, pos + 2
+            else:
+                end = self._hex_string_end(pos)
+                kind, value = HEX_STRING, bytes(self.buf[pos + 1:end - 1])
+        elif c == 0x3E: # >
+            if self._byte_at(pos + 1) != 0x3E:
+                raise self.error('dictionary object', self.base + pos)
+            kind, value, end = DICT_END, None, pos + 2
+        elif c == 0x5B: # [
+            kind, value, end = ARRAY_BEGIN, None, pos + 1
+        elif c == 0x5D: # ]
+            kind, value, end = ARRAY_END, None, pos + 1
+        elif scan.CLASS_TABLE[c] == scan.REGULAR:
+            end = self._regular_end(pos)
+            token = bytes(self.buf[pos:end])
+            if c in b'0123456789+-.':
+                value = scan.parse_number(token)
+                if value is None:
+                    raise self.error('Numeric object', self.base + pos)
+                kind = NUMBER
+            else:
+                kind, value = KEYWORD, token
+        else:
+            raise Exception(f'Unknown token at {self.base + pos}')
+        self.pos = end
+        return (kind, value, self.base + start, self.base + end)
+
+    def _byte_at(self, pos: int):
+        while pos >= len(self.buf):
+            if not self._fill():
+                return None
+        return self.buf[pos]
+
+    def _regular_end(self, pos: int) -> int:
+        end = scan.token_end(self.buf, pos)
+        while end == len(self.buf) and self._fill():
+            end = scan.token_end(self.buf, end)
+        return end
+
+    def _hex_string_end(self, pos: int) -> int:
+        '''Position right after the > closing the hexadecimal string starting at pos'''
+        m = _HEX_STRING_END.search(self.buf, pos)
+        while m is None:
+            searched = len(self.buf)
+            if not self._fill():
+                raise self.error('hexadecimal string', self.base + pos)
+            m = _HEX_STRING_END.search(self.buf, searched)
+        return m.end()
+
+    def _literal_string(self, pos: int):
+        '''Scan the literal string starting at pos in a single pass.
+
+        Return the position right after its closing parenthesis, and its bytes with balanced parentheses kept,
+        escape sequences and line continuations resolved, and end-of-line markers normalized to \\n.'''
+        buf = self.buf # a bytearray grows in place when filled
+        search = _STRING_SPECIALS.search
+        depth = 1
+        start = pos = pos + 1
+        out = None # only built once the string turns out to need any translation
+        while True:
+            m = search(buf, pos)
+            if m is None:
+                if not self._fill():
+                    raise self.error('string', self.base + start - 1)
+                continue
+            special = m.start()
+            c = buf[special]
+            pos = special + 1
+            if c == 0x28: # (
+                depth += 1
+                continue
+            if c == 0x29: # )
+                depth -= 1
+                if depth:
+                    continue
+                if out is None:
+                    return pos, bytes(buf[start:special])
+                out += buf[start:special]
+                return pos, bytes(out)
+            if out is None: out = bytearray()
+            out += buf[start:special]
+            while len(buf) - pos < 3 and self._fill():
+                pass # the escape sequence or end-of-line marker may run into the next block
+            if c == 0x0D: # \r, alone or followed by \n, is read as \n
+                out.append(0x0A)
+                if pos < len(buf) and buf[pos] == 0x0A:
+                    pos += 1
+                start = pos
+                continue
+            # \, the escape sequences of PDF Reference Table 3.2
+            if pos >= len(buf):
+                raise self.error('string', self.base + start - 1)
+            e = buf[pos]
+            pos += 1
+            if 0x30 <= e <= 0x37: # up to 3 octal digits, high-order overflow ignored
+                code = e - 0x30
+                for _ in range(2):
+                    if pos >= len(buf) or not 0x30 <= buf[pos] <= 0x37: break
+                    code = code * 8 + buf[pos] - 0x30
+                    pos += 1
+                out.append(code & 0xFF)
+            elif e == 0x0D: # line continuation, \r or \r\n
+                if pos < len(buf) and buf[pos] == 0x0A:
+                    pos += 1
+            elif e != 0x0A: # line continuation, \n
+                # a backslash not followed by one of the listed characters is ignored
+                out.append(_ESCAPES[e])
+            start = pos
+
+    def read_raw(self, start: int, size: int):
+        '''Read size bytes at file offset start, and continue after them. Zero-copy on a BufferReader'''
+        if isinstance(self.f, utils.BufferReader):
+            self.seek(start + size)
+            return self.buf[start:start + size]
+        if self.base <= start and start + size <= self.base + len(self.buf):
+            self.pos = start + size - self.base
+            self.pending.clear()
+            return bytes(self.buf[start - self.base:start + size - self.base])
+        self.f.seek(start, io.SEEK_SET)
+        data = self.f.read(size)
+        self.seek(start + len(data))
+        return data
+
+    def seek(self, offset: int):
+        '''Continue from file offset offset, dropping any token given back'''
+        self.pending.clear()
+        if self.base <= offset <= self.base + len(self.buf):
+            self.pos = offset - self.base
+        else:
+            self.buf = bytearray()
+            self.base = offset
+            self.pos = 0
+            self.eof = False
+            self.block_size = self.INITIAL_BLOCK_SIZE
+
+    def byte_at(self, offset: int):
+        '''The byte at file offset offset, or None at EOF'''
+        return self._byte_at(offset - self.base)
+
+class Parser():
+    '''Recursive-descent parser of PDF objects, over the tokens of a Tokenizer.
+
+    Arrays and dictionaries are built with an explicit stack, so nesting depth is not limited by recursion.
+    Indirect references and objects are told apart from numbers by looking ahead 2 tokens.
+
+    If lazy_streams and doc is given, f must be a reader of the file of doc, and the data of streams is not
+    read but only located, to be read from doc when first needed.'''
+    __slots__ = ['tokens', 'doc', 'lazy_streams']
+
+    def __init__(self, f, doc=None, lazy_streams: bool = True):
+        self.tokens = Tokenizer(f)
+        self.doc = doc
+        self.lazy_streams = lazy_streams and doc is not None
+
+    def parse_object(self, allow_indirect: bool = True) -> PdfObject:
+        '''Parse the next object. If allow_indirect, it can also be an indirect object'''
+        tokens = self.tokens
+        next_token = tokens.next
+        # each item is [container token kind, start offset, items]
+        stack = []
+        while True:
+            kind, value, start, end = token = next_token()
+            if stack and stack[-1][0] == DICT_BEGIN and len(stack[-1][2]) % 2 == 0 and kind != NAME and kind != DICT_END:
+                raise tokens.error('dictionary object', stack[-1][1])
+            if kind == ARRAY_BEGIN or kind == DICT_BEGIN:
+                stack.append((kind, start, []))
+                continue
+            elif kind == ARRAY_END:
+                if not stack or stack[-1][0] != ARRAY_BEGIN:
+                    raise Exception(f'Unknown token at {start}')
+                obj = PdfArrayObject(stack.pop()[2])
+            elif kind == DICT_END:
+                if not stack or stack[-1][0] != DICT_BEGIN or len(stack[-1][2]) % 2 != 0:
+                    raise tokens.error('dictionary object', stack[-1][1] if stack else start)
+                items = stack.pop()[2]
+                obj = PdfDictionaryObject(dict(zip(items[0::2], items[1::2])))
+            elif kind == EOF:
+                raise tokens.error('object' if not stack else 'array object' if stack[-1][0] == ARRAY_BEGIN else 'dictionary object',
+                                   stack[-1][1] if stack else start)
+            else:
+                obj = None
+                if kind == NUMBER and type(value) is int and value >= 0:
+                    obj = self._reference_or_indirect(token, allow_indirect and not stack)
+                if obj is None:
+                    obj = self._simple_object(token)
+            if not stack:
+                return obj
+            stack[-1][2].append(obj)
+
+    def _simple_object(self, token) -> PdfObject:
+        '''Object made of the single token'''
+        kind, value, start, end = token
+        if kind == NUMBER:
+            return shared_number(value)
+        elif kind == NAME:
+            return PdfNameObject(value)
+        elif kind == KEYWORD:
+            if value == b'true':
+                return PdfBooleanObject(True)
+            elif value == b'false':
+                return PdfBooleanObject(False)
+            elif value == b'null':
+                return PdfNullObject()
+        elif kind == STRING:
+            return PdfLiteralStringObject(value.decode('iso-8859-1'))
+        elif kind == HEX_STRING:
+            return PdfHexStringObject(self._hex_value(value, start))
+        elif kind == EOF:
+            raise self.tokens.error('object', start)
+        raise Exception(f'Unknown token at {start}')
+
+    def parse_simple_object(self) -> PdfObject:
+        '''Parse the next object, which must be made of a single token, e.g. a number but never a reference'''
+        return self._simple_object(self.tokens.next())
+
+    def _reference_or_indirect(self, first, allow_indirect: bool):
+        '''Having read a non-negative integer, parse a reference or an indirect object if the next 2 tokens are an integer and R or obj.
+        Otherwise, give the tokens back and return None'''
+        tokens = self.tokens
+        second = tokens.next()
+        if second[0] != NUMBER or type(second[1]) is not int or second[1] < 0:
+            tokens.push_back(second)
+            return None
+        third = tokens.next()
+        if third[0] == KEYWORD:
+            if third[1] == b'R':
+                return PdfReferenceObject(self.doc, first[1], second[1])
+            elif third[1] == b'obj' and allow_indirect:
+                return self._indirect_object_body(first[1], second[1], first[2])
+        tokens.push_back(second, third)
+        return None
+
+    def _indirect_object_body(self, obj_no: int, gen_no: int, org_pos: int) -> PdfIndirectObject:
+        '''Parse the rest of an indirect object, after the obj keyword'''
+        tokens = self.tokens
+        inner_obj = self.parse_object(allow_indirect=False)
+        token = tokens.next()
+        if token[0] == KEYWORD and token[1] == b'stream' and isinstance(inner_obj, PdfDictionaryObject):
+            inner_obj = self._stream_body(inner_obj, token, org_pos)
+            token = tokens.next()
+        if token[0] != KEYWORD or token[1] != b'endobj':
+            raise tokens.error('indirect object', org_pos)
+        return PdfIndirectObject(inner_obj, obj_no, gen_no)
+
+    def _stream_body(self, stream_dict: PdfDictionaryObject, stream_token, org_pos: int) -> PdfStreamObject:
+        '''Read the data and the endstream keyword of a stream, after the stream keyword'''
+        tokens = self.tokens
+        # stream keyword must be followed by CRLF or LF
+        data_start = stream_token[3]
+        eol = tokens.byte_at(data_start)
+        if eol == 0x0D:
+            data_start += 1
+            eol = tokens.byte_at(data_start)
+        if eol != 0x0A:
+            raise tokens.error('stream object', org_pos)
+        data_start += 1
+
+        # check if dict has the required key /Length with valid values
+        length = stream_dict.get('Length')
+        if isinstance(length, PdfReferenceObject):
+            length = self._indirect_length(length, org_pos)
+        if not isinstance(length, PdfNumericObject) or type(length.value) is not int or length.value <= 0:
+            raise tokens.error('stream object', org_pos)
+
+        # check for filters
+        if stream_dict.get('Filter') is not None:
+            # TODO: Remove the assumption that Filter value is always a direct obj
+            filt = stream_dict['Filter']
+            if isinstance(filt, PdfArrayObject):
+                if any(not isinstance(x, PdfNameObject) for x in filt.value):
+                    raise tokens.error('stream object', org_pos)
+                filt = filt.value[0] if filt.value else None
+            # /Filter (or first element of the array) must specify a Name
+            if not isinstance(filt, PdfNameObject):
+                raise tokens.error('stream object', org_pos)
+
+        # read only /Length bytes
+        # filter implementation is reponsible for checking if the data length is correct
+        # e.g. if any needed end-of-data marker is present at only the end
+        if self.lazy_streams:
+            tokens.seek(data_start + length.value)
+            stream = PdfStreamObject(stream_dict, doc=self.doc, offset=data_start, length=length.value)
+        else:
+            stream = PdfStreamObject(stream_dict, tokens.read_raw(data_start, length.value))
+        # stream must end with endstream, optionally preceeded by an EOL marker
+        token = tokens.next()
+        if token[0] != KEYWORD or token[1] != b'endstream':
+            raise tokens.error('stream object', org_pos)
+        return stream
+
+    def _indirect_length(self, ref: PdfReferenceObject, org_pos: int) -> PdfObject:
+        '''Value of an indirect /Length, found through the object index of the document and parsed with this
+        tokenizer, instead of going through get_obj() with another reader. Leave the tokenizer anywhere'''
+        doc = ref.doc
+        index = getattr(doc, 'obj_index', None)
+        if not self.lazy_streams or doc is not self.doc or index is None:
+            return ref.deref()
+        offset = index.get_obj_offset(ref.obj_no)
+        if isinstance(offset, tuple):
+            # in an object stream, which cannot contain streams, so that no recursion is possible
+            return ref.deref()
+        if not offset:
+            raise self.tokens.error('stream object', org_pos)
+        obj = doc.offset_obj.get(offset)
+        if obj is None:
+            self.tokens.seek(offset)
+            obj = self.parse_indirect_object()
+        if obj.obj_no != ref.obj_no or isinstance(obj.value, PdfStreamObject):
+            raise self.tokens.error('stream object', org_pos)
+        return obj.value
+
+    def _hex_value(self, digits: bytes, start: int) -> bytes:
+        # white-space characters are ignored
+        if _WHITESPACES.search(digits) is not None:
+            digits = _WHITESPACES.sub(b'', digits)
+        if _NOT_HEX.search(digits) is not None:
+            raise self.tokens.error('hexadecimal string', start)
+        # PDF Reference 3.2.3, Hexadecimal Strings: if there is an odd number of digits, the final digit is assumed to be 0
+        if len(digits) % 2 != 0:
+            digits += b'0'
+        return bytes.fromhex(digits.decode('ascii'))
+
+    def parse_indirect_object(self) -> PdfIndirectObject:
+        '''Parse obj_no gen_no obj ... endobj'''
+        tokens = self.tokens
+        first = tokens.next()
+        if first[0] == NUMBER and type(first[1]) is int and first[1] >= 0:
+            second = tokens.next()
+            if second[0] == NUMBER and type(second[1]) is int and second[1] >= 0:
+                third = tokens.next()
+                if third[0] == KEYWORD and third[1] == b'obj':
+                    return self._indirect_object_body(first[1], second[1], first[2])
+        raise tokens.error('indirect object', first[2])
+
+    def parse_reference(self) -> PdfReferenceObject:
+        '''Parse obj_no gen_no R'''
+        tokens = self.tokens
+        first = tokens.next()
+        if first[0] == NUMBER and type(first[1]) is int and first[1] >= 0:
+            second = tokens.next()
+            if second[0] == NUMBER and type(second[1]) is int and second[1] >= 0:
+                third = tokens.next()
+                if third[0] == KEYWORD and third[1] == b'R':
+                    return PdfReferenceObject(self.doc, first[1], second[1])
+        raise tokens.error('reference', first[2])
+
+    def parse_stream(self) -> PdfStreamObject:
+        '''Parse a stream dictionary, followed by the stream data up to the endstream keyword'''
+        tokens = self.tokens
+        org_pos = tokens.tell()
+        stream_dict = self.parse_object(allow_indirect=False)
+        token = tokens.next()
+        if not isinstance(stream_dict, PdfDictionaryObject) or token[0] != KEYWORD or token[1] != b'stream':
+            raise tokens.error('stream object', org_pos)
+        return self._stream_body(stream_dict, token, org_pos)
+
+def parse_object(f, doc=None, cls=PdfObject, what: str = 'object', *, lazy_streams: bool = True) -> PdfObject:
+    '''Parse an object of type cls from the current position of f, and leave f right after it.
+
+    On error, f is moved back to where it was, and an Exception is raised with the offset of the error.
+    See Parser for lazy_streams'''
+    org_pos = f.tell()
+    parser = Parser(f, doc, lazy_streams)
+    try:
+        if cls is PdfIndirectObject:
+            obj = parser.parse_indirect_object()
+        elif cls is PdfReferenceObject:
+            obj = parser.parse_reference()
+        elif cls is PdfStreamObject:
+            obj = parser.parse_stream()
+        elif cls is PdfArrayObject or cls is PdfDictionaryObject:
+            obj = parser.parse_object(allow_indirect=False)
+            if not isinstance(obj, cls):
+                raise Exception(f'Parse Error: Not a valid {what} at offset {org_pos}.')
+        elif cls is not PdfObject:
+            obj = parser.parse_simple_object()
+            if not isinstance(obj, cls):
+                raise Exception(f'Parse Error: Not a valid {what} at offset {org_pos}.')
+        else:
+            obj = parser.parse_object()
+    except Exception:
+        f.seek(org_pos, io.SEEK_SET)
+        raise
+    parser.tokens.sync()
+    return obj
@@ -0,0 +1,108 @@
+import time
+
+class ParseCancelled(Exception):
+    '''Raised while parsing once the cancel event of its Progress is set'''
+
+class ProgressEvent():
+    '''Progress of a phase of parsing, passed to the callback of a Progress.
+
+    phase: 'xref' (done counts cross-reference sections read, total is None as it is not known beforehand),
+        'objects' (in-use objects parsed by load_all), 'objstm' (compressed objects parsed by load_all) or
+        'linear' (bytes read by parse_linear)
+    done, total: units of the phase processed so far, and in all'''
+    __slots__ = ['phase', 'done', 'total']
+    def __init__(self, phase: str, done: int, total=None):
+        self.phase = phase
+        self.done = done
+        self.total = total
+
+    @property
+    def fraction(self):
+        '''done / total, or None if total is unknown'''
+        if not self.total:
+            return None if self.total is None else 1.0
+        return self.done / self.total
+
+    def __str__(self):
+        fraction = self.fraction
+        if fraction is None:
+            return f'{self.phase}: {self.done} processed'
+        return f'{self.phase}: {fraction * 100:5.2f}% processed'
+
+    def __repr__(self):
+        return f'ProgressEvent({self.phase!r}, {self.done!r}, {self.total!r})'
+
+class Progress():
+    '''Reports the progress of parsing to callback(event), where event is a ProgressEvent.
+
+    The first and last event of each phase are always reported. In between, an event is reported only
+    if at least interval seconds have passed since the previous one and, if step is given, the phase
+    has advanced by at least step percent of its total. Either limit can be disabled with None.
+
+    cancel, if given, is a threading.Event. Once it is set, parsing stops at the next update by raising
+    ParseCancelled, whether or not there is a callback.'''
+    def __init__(self, callback=None, *, interval=0.1, step=None, cancel=None):
+        self.callback = callback
+        self.interval = interval
+        self.step = step
+        self.cancel = cancel
+        self.phase = None
+        self.done = 0
+        self.total = None
+        self._next_time = 0.0
+        self._next_done = 0
+        self._reported = None # done of the last event of the current phase
+
+    def start(self, phase: str, total=None):
+        '''Begin the phase, with total units if known'''
+        self.check_cancelled()
+        self.phase = phase
+        self.total = total
+        self.done = 0
+        self._reported = None
+        self._report()
+
+    def update(self, done: int):
+        '''Set the units of the current phase processed so far, reporting them if due'''
+        if self.cancel is not None and self.cancel.is_set():
+            raise ParseCancelled(f'Parsing cancelled during {self.phase}')
+        self.done = done
+        if self.callback is None or done < self._next_done:
+            return
+        now = time.monotonic()
+        if now >= self._next_time:
+            self._report(now)
+
+    def finish(self):
+        '''End the current phase, reporting it as complete'''
+        if self.total is not None:
+            self.done = self.total
+        if self.done != self._reported:
+            self._report()
+
+    def check_cancelled(self):
+        if self.cancel is not None and self.cancel.is_set():
+            raise ParseCancelled(f'Parsing cancelled during {self.phase}' if self.phase is not None else 'Parsing cancelled')
+
+    def _report(self, now=None):
+        if self.callback is None:
+            return
+        if now is None:
+            now = time.monotonic()
+        self._next_time = now + self.interval if self.interval is not None else 0.0
+        self._next_done = self.done + self.step * self.total / 100 if self.step is not None and self.total else 0
+        self._reported = self.done
+        self.callback(ProgressEvent(self.phase, self.done, self.total))
+
+def make_progress(progress_cb=None, cancel=None) -> Progress:
+    '''progress_cb if it is already a Progress, otherwise a Progress with the callback progress_cb and default limits'''
+    if isinstance(progress_cb, Progress):
+        if cancel is not None:
+            progress_cb.cancel = cancel
+        return progress_cb
+    return Progress(progress_cb, cancel=cancel)
+
+def print_progress(event: ProgressEvent):
+    '''A callback printing each event over the previous one on a line of stdout, e.g. Progress(print_progress)'''
+    end = '\n' if event.fraction == 1.0 else ''
+    print(f'\r{str(event):<40}', end=end, flush=True)
@@ -0,0 +1,133 @@
+import re
+import syntax
+from decimal import Decimal
+from typing import Iterable, Tuple, Optional
+
+# Byte classes, as defined in PDF Reference 3.1.1, Character Set
+REGULAR = 0
+WHITESPACE = 1
+DELIMITER = 2
+
+def _build_class_table() -> bytes:
+    table = bytearray(REGULAR for _ in range(256))
+    for ch in syntax.WHITESPACES:
+        table[ch[0]] = WHITESPACE
+    for ch in syntax.DELIMS:
+        table[ch[0]] = DELIMITER
+    return bytes(table)
+
+# CLASS_TABLE[b] is the class of byte b, one of REGULAR, WHITESPACE or DELIMITER
+CLASS_TABLE = _build_class_table()
+
+def _byte_set(*classes) -> bytes:
+    '''Regex character set (without the brackets) matching every byte whose class is in classes'''
+    return b''.join(re.escape(bytes([b])) for b in range(256) if CLASS_TABLE[b] in classes)
+
+_WS = _byte_set(WHITESPACE)
+_EOL = b'\\r\\n'
+# a run of whitespaces and comments, where a comment must be terminated by an EOL marker
+_SKIP_PARTIAL = re.compile(b'(?:[' + _WS + b']+|%[^' + _EOL + b']*(?=[' + _EOL + b']))*')
+# a run of whitespaces and comments, where the last comment may run to the end of the data
+_SKIP_FINAL = re.compile(b'(?:[' + _WS + b']+|%[^' + _EOL + b']*)*')
+_SKIP_WS_ONLY = re.compile(b'[' + _WS + b']*')
+_REGULARS = re.compile(b'[' + _byte_set(REGULAR) + b']*')
+_LINE = re.compile(b'[^' + _EOL + b']*')
+
+def is_whitespace(b: int) -> bool:
+    return CLASS_TABLE[b] == WHITESPACE
+
+def is_delimiter(b: int) -> bool:
+    return CLASS_TABLE[b] == DELIMITER
+
+def is_regular(b: int) -> bool:
+    return CLASS_TABLE[b] == REGULAR
+
+def skip_whitespace(buf, pos: int = 0, endpos: Optional[int] = None, *, ignore_comment: bool = True, final: bool = True) -> int:
+    '''Return the position of the first byte at or after pos which is neither a whitespace nor, if ignore_comment, part of a comment.
+
+    buf can be any object supporting the buffer protocol, e.g. bytes, memoryview or mmap.
+    If final is False, buf[pos:endpos] is taken to be a window of a larger data, and a comment
+    not terminated by an EOL marker within the window is not skipped, i.e. the returned position
+    is that of its '%'.'''
+    if endpos is None: endpos = len(buf)
+    if not ignore_comment:
+        return _SKIP_WS_ONLY.match(buf, pos, endpos).end()
+    return (_SKIP_FINAL if final else _SKIP_PARTIAL).match(buf, pos, endpos).end()
+
+def token_end(buf, pos: int = 0, endpos: Optional[int] = None) -> int:
+    '''Return the position of the first whitespace or delimiter at or after pos, or endpos if there is none'''
+    if endpos is None: endpos = len(buf)
+    return _REGULARS.match(buf, pos, endpos).end()
+
+def read_token(buf, pos: int = 0, endpos: Optional[int] = None) -> Tuple[bytes, int]:
+    '''Read a run of regular characters starting at pos. Return the token and the position right after it'''
+    end = token_end(buf, pos, endpos)
+    return bytes(buf[pos:end]), end
+
+def line_end(buf, pos: int = 0, endpos: Optional[int] = None) -> int:
+    '''Return the position of the first EOL byte at or after pos, or endpos if there is none'''
+    if endpos is None: endpos = len(buf)
+    return _LINE.match(buf, pos, endpos).end()
+
+def exact_real(value: Decimal):
+    '''value as a float if the float is exactly value, once written as the shortest decimal which reads back as it, otherwise value'''
+    f = float(value)
+    return f if Decimal(repr(f)) == value else value
+
+def parse_number(token: bytes):
+    '''Value of a numeric token: an int for an integer, a float for a real, or None if token is not a number.
+
+    A real which a float cannot keep, e.g. with more significant digits than a float holds, is a Decimal instead.
+    Accepts an optional sign, followed by digits with at most one period, e.g. 34.5, -3.62, +123.6, 4., -.002 and 0.0'''
+    if token.isdigit():
+        return int(token)
+    body = token[1:] if token[:1] == b'+' or token[:1] == b'-' else token
+    if body.isdigit():
+        return int(token)
+    integer, period, fraction = body.partition(b'.')
+    if period and (integer or fraction) and (not integer or integer.isdigit()) and (not fraction or fraction.isdigit()):
+        # any decimal of up to 15 significant digits reads back from a float as is
+        if len(integer) + len(fraction) <= 15:
+            return float(token)
+        return exact_real(Decimal(token.decode('ascii')))
+    return None
+
+class PatternMatcher():
+    '''Finds the earliest, and if tie, the longest, occurrence of any of the patterns in a single pass'''
+    __slots__ = ['patterns', 'max_len', '_search', '_match']
+
+    def __init__(self, patterns: Tuple[bytes, ...]):
+        if len(patterns) == 0 or any(len(p) == 0 for p in patterns):
+            raise ValueError('patterns must be non-empty bytes')
+        self.patterns = patterns
+        self.max_len = max(len(p) for p in patterns)
+        if self.max_len == 1:
+            regex = b'[' + b''.join(re.escape(p) for p in set(patterns)) + b']'
+        else:
+            # alternation is tried in order, so longer patterns must come first to win a tie
+            regex = b'|'.join(re.escape(p) for p in sorted(set(patterns), key=len, reverse=True))
+        regex = re.compile(regex)
+        self._search = regex.search
+        self._match = regex.match
+
+    def search(self, buf, pos: int = 0, endpos: Optional[int] = None) -> Tuple[int, Optional[bytes]]:
+        '''Return the position and the matched pattern, or (-1, None) if not found'''
+        m = self._search(buf, pos, len(buf) if endpos is None else endpos)
+        if m is None:
+            return -1, None
+        return m.start(), m.group()
+
+    def match(self, buf, pos: int = 0, endpos: Optional[int] = None) -> Optional[bytes]:
+        '''Return the longest pattern found exactly at pos, or None'''
+        m = self._match(buf, pos, len(buf) if endpos is None else endpos)
+        return None if m is None else m.group()
+
+_matchers = {}
+
+def compile_patterns(patterns: Iterable[bytes]) -> PatternMatcher:
+    '''Get a (cached) PatternMatcher for patterns'''
+    key = patterns if isinstance(patterns, tuple) else tuple(patterns)
+    matcher = _matchers.get(key)
+    if matcher is None:
+        matcher = _matchers[key] = PatternMatcher(key)
+    return matcher
@@ -0,0 +1,118 @@
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+class ParseStats():
+    '''Counters collected by a PdfDocument opened with stats enabled.
+
+    phases: [phase name]: [number of times run, total wall time in seconds], for 'xref' (each call to
+        get_xref_trailer_at_offset), 'objects' (the per-object loop of load_all), 'objstm' (decoding object
+        streams and parsing their headers) and 'linear' (parse_linear)
+    reads, bytes_read, seeks, peeks: I/O calls on the file readers of the document. Not counted with the
+        'mmap' backend, where the mapping is scanned in place
+    objects: [type name]: number of objects parsed, by type of the value of each indirect object
+    cache_hits, cache_misses: [cache name]: lookups in the caches 'offset_obj' and 'compressed_obj'
+    decoded_bytes: [filter name]: bytes produced by each filter
+
+    profiler, if set, is called with the name of each phase, and must return a context manager, which is
+    entered around that phase, e.g. to run a cProfile.Profile only during object stream decoding.'''
+    def __init__(self, profiler=None):
+        self.profiler = profiler
+        self.phases = {}
+        self.reads = 0
+        self.bytes_read = 0
+        self.seeks = 0
+        self.peeks = 0
+        self.objects = Counter()
+        self.cache_hits = Counter()
+        self.cache_misses = Counter()
+        self.decoded_bytes = Counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        '''Time the body as a run of the phase name, within the profiler if any'''
+        start = time.perf_counter()
+        try:
+            with (self.profiler(name) if self.profiler is not None else nullcontext()):
+                yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                runs = self.phases.setdefault(name, [0, 0.0])
+                runs[0] += 1
+                runs[1] += elapsed
+
+    def count_object(self, obj):
+        '''Count a parsed indirect object, by the type of its value'''
+        with self._lock:
+            self.objects[type(obj.value).__name__] += 1
+
+    def count_lookup(self, cache: str, hit: bool):
+        with self._lock:
+            if hit:
+                self.cache_hits[cache] += 1
+            else:
+                self.cache_misses[cache] += 1
+
+    def count_decoded(self, name: str, chunks):
+        '''Pass the chunks produced by the filter name through, counting their bytes'''
+        for chunk in chunks:
+            with self._lock:
+                self.decoded_bytes[name] += len(chunk)
+            yield chunk
+
+    def as_dict(self) -> dict:
+        '''All counters as plain dicts and numbers, e.g. for JSON'''
+        with self._lock:
+            return {
+                'phases': {name: {'runs': runs, 'seconds': seconds} for name, (runs, seconds) in self.phases.items()},
+                'reads': self.reads,
+                'bytes_read': self.bytes_read,
+                'seeks': self.seeks,
+                'peeks': self.peeks,
+                'objects': dict(self.objects),
+                'cache_hits': dict(self.cache_hits),
+                'cache_misses': dict(self.cache_misses),
+                'decoded_bytes': dict(self.decoded_bytes),
+            }
+
+    def __str__(self):
+        lines = [f'{name:<12}{runs:>8} runs {seconds:>10.4f} s' for name, (runs, seconds) in self.phases.items()]
+        lines.append(f'I/O: {self.reads} reads of {self.bytes_read} bytes, {self.seeks} seeks, {self.peeks} peeks')
+        lines.append('objects: ' + ', '.join(f'{name} {count}' for name, count in self.objects.most_common()))
+        for cache in sorted(set(self.cache_hits) | set(self.cache_misses)):
+            lines.append(f'{cache}: {self.cache_hits[cache]} hits, {self.cache_misses[cache]} misses')
+        lines.append('decoded: ' + ', '.join(f'{name} {count} bytes' for name, count in self.decoded_bytes.most_common()))
+        return '\n'.join(lines)
+
+class CountingReader():
+    '''Wraps a file-like object, counting its reads, seeks and peeks in a ParseStats'''
+    def __init__(self, f, stats: ParseStats):
+        self.f = f
+        self.stats = stats
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.f.read(size)
+        stats = self.stats
+        with stats._lock:
+            stats.reads += 1
+            stats.bytes_read += len(data)
+        return data
+
+    def peek(self, size: int = 0):
+        with self.stats._lock:
+            self.stats.peeks += 1
+        return self.f.peek(size)
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        with self.stats._lock:
+            self.stats.seeks += 1
+        return self.f.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self.f.tell()
+
+    def __getattr__(self, name):
+        return getattr(self.f, name)
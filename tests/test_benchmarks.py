@@ -0,0 +1,51 @@
+import json
+import pytest
+from benchmarks import corpus, suite
+from doc import PdfDocument
+from xref import PdfObjectIndex
+
+def test_corpus_is_deterministic():
+    options = dict(pages=5, objects=20, xref='stream', objstm_ratio=0.5, increments=2, image_size=600, predictor=12)
+    assert corpus.make_pdf(**options) == corpus.make_pdf(**options)
+    assert corpus.make_pdf(**options) != corpus.make_pdf(**options, seed=1)
+
+@pytest.mark.parametrize('options', [dict(pages=7), dict(pages=30, fanout=3), dict(pages=5, increments=3),
+                                     dict(pages=5, objects=40, xref='stream', objstm_ratio=0.8),
+                                     dict(pages=3, image_size=3000, predictor=2), dict(pages=3, image_size=3000, predictor=12, compress=False)])
+def test_corpus_files_parse(tmp_path, options):
+    path = tmp_path / 'corpus.pdf'
+    path.write_bytes(corpus.make_pdf(**options))
+    doc = PdfDocument(str(path))
+    assert doc.get_page_count() == options['pages']
+    assert len(doc.increments) == options.get('increments', 0) + 1
+    compressed = doc.obj_index.get_obj_nums(PdfObjectIndex.COMPRESSED)
+    assert (len(compressed) > 0) == (options.get('objstm_ratio', 0) > 0)
+    for page in doc.get_all_page_dicts():
+        assert len(page['Contents'].deref().decode()) > 0
+        if options.get('image_size'):
+            image = page['Resources']['XObject']['Im0'].deref()
+            # the predictor is undone back to the 3 samples of each pixel
+            assert len(image.decode()) == image.dict['Width'].value * image.dict['Height'].value * 3
+    doc.close()
+
+@pytest.mark.parametrize('options', [dict(xref='other'), dict(objstm_ratio=0.5), dict(fanout=1)])
+def test_corpus_rejects_invalid_options(options):
+    with pytest.raises(ValueError):
+        corpus.make_pdf(pages=2, **options)
+
+def test_suite_runs_and_flags_regressions(tmp_path, capsys):
+    output = tmp_path / 'results.json'
+    suite.main(['--scale', '0.01', '--repeat', '1', '--output', str(output)])
+    results = json.loads(output.read_text())
+    assert set(results['results']) == set(suite.BENCHMARKS)
+    assert all(result['best'] > 0 for result in results['results'].values())
+    # the same results pass, and fail against a baseline twice as fast
+    suite.main(['--results', str(output), '--compare', str(output)])
+    baseline = tmp_path / 'baseline.json'
+    for result in results['results'].values():
+        result['best'] /= 2
+    baseline.write_text(json.dumps(results))
+    with pytest.raises(SystemExit) as exit_info:
+        suite.main(['--results', str(output), '--compare', str(baseline)])
+    assert exit_info.value.code == 1
+    assert 'REGRESSION' in capsys.readouterr().out
@@ -0,0 +1,162 @@
+import random
+import zlib
+import pytest
+import decode
+from objects import PdfDictionaryObject, PdfNameObject, PdfArrayObject, PdfStreamObject, shared_number
+
+def test_known_filters_decode():
+    data = b'stream data ' * 100
+    assert b''.join(decode.iter_decode('FlateDecode', [zlib.compress(data)], None)) == data
+    assert b''.join(decode.iter_decode('ASCIIHexDecode', [data.hex().encode('ascii') + b'>'], None)) == data
+
+@pytest.mark.parametrize('name', ['iter_limit', 'zlib', 'iter_decode', 'Crypt', 'NoSuchDecode'])
+def test_unknown_filter_raises(name):
+    with pytest.raises(Exception, match='Unrecognized decoder'):
+        list(decode.iter_decode(name, [b'data'], None))
+
+def make_params(**entries) -> PdfDictionaryObject:
+    return PdfDictionaryObject({PdfNameObject(name): shared_number(value) for name, value in entries.items()})
+
+def paeth(a, b, c):
+    p = a + b - c
+    pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+    return a if pa <= pb and pa <= pc else (b if pb <= pc else c)
+
+def png_predict(data: bytes, rowlength: int, bpp: int, filter_types) -> bytes:
+    '''Reference PNG filtering of rows of rowlength bytes, each by its filter type'''
+    output = bytearray()
+    prev = bytes(rowlength)
+    for r, filter_type in enumerate(filter_types):
+        row = data[r * rowlength:(r + 1) * rowlength]
+        output.append(filter_type)
+        for i in range(rowlength):
+            a = row[i - bpp] if i >= bpp else 0
+            b = prev[i]
+            c = prev[i - bpp] if i >= bpp else 0
+            output.append((row[i] - [0, a, b, (a + b) // 2, paeth(a, b, c)][filter_type]) % 256)
+        prev = row
+    return bytes(output)
+
+def tiff_predict(data: bytes, columns: int, colors: int, bits: int) -> bytes:
+    '''Reference TIFF predictor 2, differencing each sample from the same component of the previous pixel'''
+    rowlength = (columns * colors * bits + 7) // 8
+    output = bytearray()
+    for r in range(len(data) // rowlength):
+        row = data[r * rowlength:(r + 1) * rowlength]
+        bits_of_row = ''.join(format(byte, '08b') for byte in row)
+        samples = [int(bits_of_row[i:i + bits], 2) for i in range(0, columns * colors * bits, bits)]
+        diffs = [(samples[i] - (samples[i - colors] if i >= colors else 0)) % (1 << bits) for i in range(len(samples))]
+        bits_of_row = ''.join(format(diff, f'0{bits}b') for diff in diffs).ljust(rowlength * 8, '0')
+        output += int(bits_of_row, 2).to_bytes(rowlength, 'big')
+    return bytes(output)
+
+def random_image(rng, rowlength, rows, columns, colors, bits):
+    '''Random samples, with the padding bits at the end of each row zero'''
+    data = bytearray(rng.randbytes(rowlength * rows))
+    for r in range(rows):
+        for bit in range(columns * colors * bits, rowlength * 8):
+            data[r * rowlength + bit // 8] &= ~(0x80 >> (bit % 8)) & 0xff
+    return bytes(data)
+
+@pytest.fixture(params=['numpy', 'pure python'])
+def with_or_without_numpy(request, monkeypatch):
+    if request.param == 'numpy':
+        if decode.numpy is None:
+            pytest.skip('NumPy is not installed')
+    else:
+        monkeypatch.setattr(decode, 'numpy', None)
+
+def test_predictors_match_reference(with_or_without_numpy):
+    rng = random.Random(3)
+    for _ in range(300):
+        colors, bits, columns, rows = rng.choice([1, 2, 3, 4]), rng.choice([1, 2, 4, 8, 16]), rng.randint(1, 20), rng.randint(1, 6)
+        rowlength = (columns * colors * bits + 7) // 8
+        bpp = (colors * bits + 7) // 8
+        image = random_image(rng, rowlength, rows, columns, colors, bits)
+        filter_types = [rng.randint(0, 4) for _ in range(rows)]
+        png = make_params(Predictor=rng.randint(10, 15), Colors=colors, BitsPerComponent=bits, Columns=columns)
+        predicted = png_predict(image, rowlength, bpp, filter_types)
+        assert decode.FlateDecode(zlib.compress(predicted), png) == image
+        # rows split across chunks, the previous row being carried over
+        chunks = [predicted[i:i + 7] for i in range(0, len(predicted), 7)]
+        assert b''.join(decode.iter_unpredict(chunks, png)) == image
+        tiff = make_params(Predictor=2, Colors=colors, BitsPerComponent=bits, Columns=columns)
+        predicted = tiff_predict(image, columns, colors, bits)
+        assert decode.FlateDecode(zlib.compress(predicted), tiff) == image
+        assert b''.join(decode.iter_unpredict([predicted[:5], predicted[5:]], tiff)) == image
+
+def test_predicted_data_must_end_at_a_row(with_or_without_numpy):
+    params = make_params(Predictor=12, Columns=4)
+    with pytest.raises(ValueError):
+        list(decode.iter_unpredict([bytes(7)], params))
+    with pytest.raises(ValueError):
+        decode.unpredict(bytes(7), make_params(Predictor=2, Columns=4))
+
+def test_iter_limit_enforces_its_limit():
+    assert b''.join(decode.iter_limit([b'ab', b'cd'], 4)) == b'abcd'
+    chunks = decode.iter_limit(iter([b'ab', b'cd', b'e', b'never read']), 4)
+    assert next(chunks) == b'ab' and next(chunks) == b'cd'
+    with pytest.raises(ValueError, match='limit of 4 bytes'):
+        next(chunks)
+
+def test_decompression_bomb_stops_at_the_limit():
+    # 64 MB of zeros compress to about 64 KB, and must not be inflated past the limit
+    bomb = zlib.compress(bytes(64 * 1024 * 1024), 9)
+    produced = []
+    def record(chunks):
+        for chunk in chunks:
+            produced.append(len(chunk))
+            yield chunk
+    with pytest.raises(ValueError):
+        for _ in decode.iter_limit(record(decode.iter_decode('FlateDecode', [bomb], None)), 1024 * 1024):
+            pass
+    assert max(produced) <= decode.CHUNK_SIZE
+    assert sum(produced) <= 1024 * 1024 + decode.CHUNK_SIZE
+
+def stream(data: bytes, filters) -> PdfStreamObject:
+    return PdfStreamObject(PdfDictionaryObject({PdfNameObject('Filter'): PdfArrayObject([PdfNameObject(name) for name in filters])}), data)
+
+def test_streaming_pipeline_matches_whole_decoding():
+    data = random.Random(0).randbytes(50000) + b'text ' * 20000
+    # decoding applies /Filter in order, so that encoding applies it in reverse
+    encoded = zlib.compress(data).hex().encode('ascii') + b'>'
+    obj = stream(encoded, ['ASCIIHexDecode', 'FlateDecode'])
+    for chunk_size in [1, 1000, 64 * 1024, 10 ** 7]:
+        chunks = list(obj.iter_decoded(chunk_size=chunk_size))
+        assert b''.join(chunks) == data
+        assert max(len(chunk) for chunk in chunks) <= max(decode.CHUNK_SIZE, chunk_size)
+    assert obj.open_decoded().read() == data
+    assert obj.decode(use_cache=False) == data
+    with pytest.raises(ValueError):
+        b''.join(obj.iter_decoded(max_output_size=len(data) - 1))
+
+def test_decoded_cache_respects_its_budget(monkeypatch):
+    cache = PdfStreamObject.make_cache(3000)
+    monkeypatch.setattr(PdfStreamObject, 'decoded_cache', cache)
+    streams = [stream(zlib.compress(bytes([i]) * 1000), ['FlateDecode']) for i in range(5)]
+    for i, obj in enumerate(streams):
+        assert obj.decode() == bytes([i]) * 1000
+        assert cache.size <= 3000
+    # only the most recent ones are kept
+    assert len(cache) == 3 and cache.evictions == 2
+    assert (streams[0], streams[0]._filters_key()) not in cache
+    assert cache.get((streams[4], streams[4]._filters_key())) == bytes([4]) * 1000
+    # decoded data larger than the whole budget is not cached, but still returned
+    large = stream(zlib.compress(bytes(4000)), ['FlateDecode'])
+    assert large.decode() == bytes(4000)
+    assert len(cache) == 3
+
+def test_decoded_cache_misses_after_a_filter_change(monkeypatch):
+    monkeypatch.setattr(PdfStreamObject, 'decoded_cache', PdfStreamObject.make_cache(1 << 20))
+    data = b'stream data ' * 10
+    hex_data = data.hex().encode('ascii') + b'>'
+    obj = stream(zlib.compress(hex_data), ['FlateDecode'])
+    assert obj.decode() == hex_data
+    # the same raw data, decoded by one more filter
+    obj.dict[PdfNameObject('Filter')] = PdfArrayObject([PdfNameObject('FlateDecode'), PdfNameObject('ASCIIHexDecode')])
+    assert obj.decode() == data
+    obj.dict[PdfNameObject('Filter')] = PdfNameObject('FlateDecode')
+    assert obj.decode() == hex_data
+    # new raw data replaces the decoded data of the current filters
+    obj.raw_stream = zlib.compress(b'other')
+    assert obj.decode() == b'other'
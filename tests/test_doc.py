@@ -0,0 +1,172 @@
+import pytest
+from benchmarks.corpus import make_pdf
+from doc import PdfDocument
+from objects import PdfStreamObject, PdfReferenceObject
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / 'doc.pdf'
+    path.write_bytes(make_pdf(pages=4, image_size=1024))
+    return path
+
+@pytest.mark.parametrize('backend', ['file', 'mmap'])
+def test_reading_after_close_raises(pdf_path, backend):
+    doc = PdfDocument(str(pdf_path), backend=backend, lazy=True)
+    doc.close()
+    assert doc.closed
+    with pytest.raises(ValueError, match='document is closed'):
+        doc.read_bytes(0, 8)
+    with pytest.raises(ValueError, match='document is closed'):
+        doc.get_obj(1, 0)
+    doc.close()
+
+def test_close_unmaps_or_warns(pdf_path):
+    doc = PdfDocument(str(pdf_path), backend='mmap')
+    image = doc.get_all_page_dicts()[0]['Resources']['XObject']['Im0'].deref()
+    assert len(image.decode()) > 0
+    view = image.raw_stream
+    with pytest.warns(ResourceWarning):
+        doc.close()
+    view.release()
+
+@pytest.mark.parametrize('backend', ['file', 'mmap'])
+def test_failed_open_closes_cleanly(tmp_path, backend, recwarn):
+    path = tmp_path / 'truncated.pdf'
+    path.write_bytes(make_pdf(pages=4)[:-300])
+    with pytest.raises(Exception) as excinfo:
+        PdfDocument(str(path), backend=backend)
+    assert not isinstance(excinfo.value, BufferError)
+    assert not [w for w in recwarn if issubclass(w.category, ResourceWarning)]
+
+def snapshot(doc):
+    '''[obj_no]: text of each object of the document, or of the dictionary and decoded data of a stream'''
+    objs = {}
+    for obj_no in range(1, len(doc.obj_index)):
+        obj = doc.get_obj(obj_no, 0)
+        if obj is None:
+            objs[obj_no] = None
+        elif isinstance(obj.value, PdfStreamObject):
+            objs[obj_no] = (str(obj.value.dict), bytes(obj.value.decode()))
+        else:
+            objs[obj_no] = str(obj)
+    return objs
+
+@pytest.mark.parametrize('options', [dict(), dict(xref='stream'), dict(xref='stream', objstm_ratio=0.8), dict(increments=3)])
+def test_lazy_mode_builds_the_same_objects(tmp_path, options):
+    path = tmp_path / 'doc.pdf'
+    path.write_bytes(make_pdf(pages=10, objects=50, image_size=1024, **options))
+    eager = PdfDocument(str(path))
+    lazy = PdfDocument(str(path), lazy=True)
+    # only the cross-reference sections are read when lazy
+    assert len(lazy.offset_obj) == 0 < len(eager.offset_obj)
+    assert [inc['startxref'] for inc in lazy.increments] == [inc['startxref'] for inc in eager.increments]
+    assert snapshot(lazy) == snapshot(eager)
+    for increment in range(len(eager.increments)):
+        assert [str(page) for page in lazy.get_all_page_dicts(increment)] == [str(page) for page in eager.get_all_page_dicts(increment)]
+    # objects parsed on demand are kept as by eager parsing
+    lazy.load_all()
+    assert lazy.offset_obj.keys() == eager.offset_obj.keys()
+    eager.close()
+    lazy.close()
+
+def build_pdf(objs) -> bytes:
+    '''A PDF of the given object bodies, numbered from 1, with object 1 as the catalog'''
+    out = b'%PDF-1.4\n'
+    offsets = []
+    for obj_no, body in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n%s\nendobj\n' % (obj_no, body)
+    startxref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f\r\n' % (len(objs) + 1) + b''.join(b'%010d 00000 n\r\n' % offset for offset in offsets)
+    return out + b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objs) + 1, startxref)
+
+@pytest.mark.parametrize('backend', ['file', 'mmap'])
+def test_stream_data_is_read_on_demand(tmp_path, backend):
+    data = b'BT (on demand) Tj ET endstream inside'
+    path = tmp_path / 'doc.pdf'
+    # the /Length of object 3 is given by object 4, after it
+    path.write_bytes(build_pdf([b'<< /Type /Catalog /Pages 2 0 R >>', b'<< /Type /Pages /Kids [] /Count 0 >>',
+                                b'<< /Length 4 0 R >>\nstream\n' + data + b'\nendstream', b'%d' % len(data)]))
+    doc = PdfDocument(str(path), backend=backend)
+    stream = doc.get_obj(3, 0).value
+    assert stream.offset == path.read_bytes().index(data) and stream.length == len(data)
+    if backend == 'file':
+        assert not stream.loaded
+    assert bytes(stream.raw_stream) == data
+    if backend == 'file':
+        assert stream.loaded
+    else:
+        assert isinstance(stream.raw_stream, memoryview)
+    assert bytes(stream.decode()) == data
+    stream.raw_stream = b'replaced'
+    assert stream.raw_stream == b'replaced' and stream.length == 8 and stream.decode() == b'replaced'
+    doc.close()
+
+def test_stream_data_is_not_kept_on_the_object(pdf_path):
+    doc = PdfDocument(str(pdf_path), decoded_cache_size=0)
+    image = doc.get_all_page_dicts()[0]['Resources']['XObject']['Im0'].deref()
+    assert image._raw_stream is None and not image.loaded
+    # with no room in the cache, the data is read again each time, and still correct
+    assert image.raw_stream == image.raw_stream and len(image.decode()) > 0
+    assert not image.loaded and len(doc.decoded_cache) == 0
+    doc.close()
+
+def test_document_decoded_cache_respects_its_budget(tmp_path):
+    path = tmp_path / 'doc.pdf'
+    path.write_bytes(make_pdf(pages=30, stream_size=4096))
+    budget = 3 * 4096
+    doc = PdfDocument(str(path), decoded_cache_size=budget)
+    contents = [page['Contents'].deref() for page in doc.get_all_page_dicts()]
+    decoded = [contents_stream.decode() for contents_stream in contents]
+    assert doc.decoded_cache.size <= budget and doc.decoded_cache.evictions > 0
+    # evicted data is decoded again, the same
+    assert [contents_stream.decode() for contents_stream in contents] == decoded
+    assert PdfStreamObject.decoded_cache is not doc.decoded_cache
+    doc.close()
+
+def test_linear_parse_reads_every_increment(tmp_path):
+    path = tmp_path / 'doc.pdf'
+    path.write_bytes(make_pdf(pages=10, objects=30, increments=3))
+    normal = PdfDocument(str(path))
+    linear = PdfDocument(str(path), linear=True)
+    assert len(linear.increments) == len(normal.increments) == 4
+    assert all(inc['eof'] for inc in linear.increments)
+    assert linear.offset_obj.keys() == normal.offset_obj.keys()
+    assert snapshot(linear) == snapshot(normal)
+    normal.close()
+    linear.close()
+
+def test_references_are_resolved_once_per_epoch(tmp_path):
+    path = tmp_path / 'doc.pdf'
+    path.write_bytes(build_pdf([b'<< /Type /Catalog /Pages 2 0 R >>', b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+                                b'<< /Type /Page /Parent 2 0 R /Rotate 90 >>', b'<< /Type /Page /Parent 2 0 R /Rotate 180 >>']))
+    doc = PdfDocument(str(path), lazy=True)
+    ref = doc.get_trailer_dict()['Root'].deref()['Pages'].deref()['Kids'].value[0]
+    assert not ref.resolved
+    page = ref.value
+    assert ref.resolved and ref.value is page and ref.deref()['Rotate'].value == 90
+    # object 3 is changed to what object 4 is, which is not seen until mark_edited() is called
+    doc.obj_index.field2[3] = doc.obj_index.field2[4]
+    assert ref.value is page
+    epoch = doc.epoch
+    doc.mark_edited()
+    assert doc.epoch > epoch and not ref.resolved
+    assert ref.deref()['Rotate'].value == 180 and ref.resolved
+    # rebuilding the index, as after adding an increment, also advances the epoch
+    doc.build_obj_index()
+    assert not ref.resolved and ref.deref()['Rotate'].value == 90
+    doc.close()
+
+def test_get_objs_resolves_references_together(pdf_path):
+    doc = PdfDocument(str(pdf_path), lazy=True)
+    refs = [page['Contents'] for page in doc.get_all_page_dicts()]
+    assert not any(ref.resolved for ref in refs)
+    parsed = len(doc.offset_obj)
+    objs = doc.get_objs(refs)
+    assert [obj.obj_no for obj in objs] == [ref.obj_no for ref in refs]
+    assert len(doc.offset_obj) == parsed + len(refs)
+    assert all(ref.resolved for ref in refs)
+    assert doc.deref_all(refs) == [obj.value for obj in objs]
+    with pytest.raises(Exception, match='Object not found'):
+        doc.get_objs(refs + [PdfReferenceObject(doc, 999, 0)])
+    doc.close()
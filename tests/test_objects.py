@@ -0,0 +1,82 @@
+import copy
+import pickle
+import pytest
+from decimal import Decimal
+import utils
+import parse
+from objects import PdfBooleanObject, PdfNumericObject, PdfNameObject, shared_number
+
+def test_shared_number_is_immutable():
+    count = shared_number(3)
+    assert shared_number(3) is count
+    with pytest.raises(AttributeError):
+        count.value = 4
+    with pytest.raises(AttributeError):
+        del count.value
+    assert shared_number(3).value == 3
+
+def test_unshared_number_is_mutable():
+    number = PdfNumericObject(3)
+    assert number is not shared_number(3)
+    number.value = 4
+    assert number.value == 4
+    large = shared_number(5000)
+    large.value = 1
+    assert large.value == 1
+
+def test_boolean_is_immutable():
+    true = PdfBooleanObject(True)
+    assert PdfBooleanObject(1) is true
+    with pytest.raises(AttributeError):
+        true.value = False
+    assert PdfBooleanObject(True).value is True
+
+def test_shared_instances_survive_copy_and_pickle():
+    for obj in [shared_number(7), PdfBooleanObject(False)]:
+        assert copy.copy(obj) is obj
+        assert pickle.loads(pickle.dumps(obj)) is obj
+    number = pickle.loads(pickle.dumps(PdfNumericObject(2.5)))
+    assert number.value == 2.5
+
+def test_unshared_small_number_stays_mutable_through_copy_and_pickle():
+    number = PdfNumericObject(3)
+    for clone in [copy.copy(number), copy.deepcopy(number), pickle.loads(pickle.dumps(number))]:
+        assert clone is not shared_number(3) and clone is not number
+        assert clone.value == 3
+        clone.value = 4
+        assert clone.value == 4
+    assert number.value == 3 and shared_number(3).value == 3
+
+def test_name_intern_table_is_bounded(monkeypatch):
+    monkeypatch.setattr(PdfNameObject, 'INTERN_LIMIT', len(PdfNameObject._interned) + 10)
+    names = [PdfNameObject(b'Hostile%d' % i) for i in range(100)]
+    assert len(PdfNameObject._interned) <= PdfNameObject.INTERN_LIMIT
+    assert PdfNameObject('Type') is PdfNameObject(b'Type')
+    # names handed out before the tables were emptied still compare and hash as before
+    assert names[0] == PdfNameObject(b'Hostile0') and hash(names[0]) == hash(PdfNameObject(b'Hostile0'))
+    assert {names[0]: 1}['Hostile0'] == 1
+
+def parse_number(token: bytes) -> PdfNumericObject:
+    return parse.parse_object(utils.BufferReader(token + b' '), None)
+
+def test_reals_keep_the_value_as_written():
+    for token in [b'0.5', b'-.002', b'4.', b'0.30000000000000004', b'0.1000000000000000000001', b'123456789.123456789',
+                  b'1' * 400 + b'.5', b'-0.' + b'0' * 400 + b'1']:
+        number = parse_number(token)
+        assert number.decimal == Decimal(token.decode('ascii'))
+        assert Decimal(str(number)) == Decimal(token.decode('ascii'))
+    assert isinstance(parse_number(b'0.30000000000000004').value, float)
+    assert isinstance(parse_number(b'0.1000000000000000000001').value, Decimal)
+    assert parse_number(b'1.000000000000000000000').as_int() == 1
+    with pytest.raises(ValueError):
+        parse_number(b'1.0000000000000000000001').as_int()
+
+def test_integral_reals_stay_reals():
+    for value, written in [(Decimal('1.0'), '1.0'), (Decimal('-3.00'), '-3.0'), (1e20, '100000000000000000000.0'),
+                           (Decimal('1' + '0' * 400 + '.0'), '1' + '0' * 400 + '.0')]:
+        number = PdfNumericObject(value)
+        assert not isinstance(number.value, int)
+        assert str(number) == written
+    assert str(parse_number(b'1.0')) == '1.0'
+    assert str(parse_number(b'4.')) == '4.0'
+    assert PdfNumericObject(Decimal(12)).value == 12 and str(PdfNumericObject(Decimal('12'))) == '12'
@@ -0,0 +1,69 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import pytest
+from benchmarks.corpus import make_pdf
+from doc import PdfDocument
+from objects import PdfStreamObject
+from xref import PdfObjectIndex
+
+@pytest.fixture(scope='module')
+def objstm_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp('objstm') / 'objstm.pdf'
+    path.write_bytes(make_pdf(pages=20, objects=200, objstm_ratio=0.8, xref='stream'))
+    return path
+
+def snapshot(doc):
+    '''[obj_no]: text of the object, or of the dictionary and decoded data of a stream'''
+    objs = {}
+    for obj_no in range(1, len(doc.obj_index)):
+        value = doc.get_obj(obj_no, 0).value
+        objs[obj_no] = (str(value.dict), bytes(value.decode())) if isinstance(value, PdfStreamObject) else str(value)
+    return objs
+
+@pytest.mark.parametrize('executor_class', [ThreadPoolExecutor, ProcessPoolExecutor])
+def test_executor_gives_the_same_objects(objstm_path, executor_class):
+    serial = PdfDocument(str(objstm_path), lazy=True)
+    expected = snapshot(serial)
+    serial.close()
+    assert len(expected) > 200
+    with executor_class(max_workers=2) as executor:
+        doc = PdfDocument(str(objstm_path), objstm_executor=executor)
+        # compressed objects are parsed while opening
+        compressed = doc.obj_index.get_obj_nums(PdfObjectIndex.COMPRESSED)
+        assert len(doc.compressed_obj) == len(compressed) > 0
+        assert snapshot(doc) == expected
+        doc.close()
+
+def test_executor_skips_cached_objstms(objstm_path):
+    class CountingExecutor(ThreadPoolExecutor):
+        inflated = []
+        def map(self, fn, obj_nos, *iterables):
+            obj_nos = list(obj_nos)
+            self.inflated += obj_nos
+            return super().map(fn, obj_nos, *iterables)
+    with CountingExecutor(max_workers=2) as executor:
+        doc = PdfDocument(str(objstm_path), lazy=True, objstm_executor=executor)
+        stream_obj_no = doc.obj_index.get_obj_offset(doc.obj_index.get_obj_nums(PdfObjectIndex.COMPRESSED)[0])[0]
+        doc.get_objstm(stream_obj_no)
+        doc.load_all()
+        assert stream_obj_no not in executor.inflated
+        assert len(executor.inflated) > 0
+        doc.close()
+
+def test_objstm_cache_stays_within_its_budget(objstm_path):
+    reference = PdfDocument(str(objstm_path), lazy=True)
+    expected = snapshot(reference)
+    objstm_sizes = [reference.get_objstm(obj_no).nbytes for obj_no in list(reference.objstm_cache._data)]
+    reference.close()
+    assert len(objstm_sizes) >= 2
+    # room for a single decoded object stream
+    budget = max(objstm_sizes)
+    doc = PdfDocument(str(objstm_path), lazy=True, objstm_cache_size=budget)
+    compressed = doc.obj_index.get_obj_nums(PdfObjectIndex.COMPRESSED)
+    for obj_no in compressed:
+        assert str(doc.get_obj(obj_no, 0).value) == expected[obj_no]
+        assert doc.objstm_cache.size <= budget
+    assert doc.objstm_cache.evictions > 0
+    assert len(doc.objstm_cache) < len(objstm_sizes)
+    # parsed compressed objects are kept, so that evicted streams are only decoded again for objects not parsed yet
+    assert len(doc.compressed_obj) == len(compressed)
+    doc.close()
@@ -0,0 +1,89 @@
+import pytest
+from benchmarks.corpus import make_pdf
+from doc import PdfDocument
+from objects import PdfDictionaryObject, PdfArrayObject, PdfNameObject, PdfReferenceObject, shared_number
+from pages import PageIndex
+
+def node(kind: str, **entries) -> PdfDictionaryObject:
+    return PdfDictionaryObject({PdfNameObject('Type'): PdfNameObject(kind), **{PdfNameObject(name): value for name, value in entries.items()}})
+
+class Objects():
+    '''Indirect objects by object number, resolving PdfReferenceObject for PageIndex'''
+    def __init__(self):
+        self.objs = {}
+
+    def add(self, obj_no: int, obj) -> PdfReferenceObject:
+        self.objs[obj_no] = obj
+        return self.ref(obj_no)
+
+    def ref(self, obj_no: int) -> PdfReferenceObject:
+        return PdfReferenceObject(None, obj_no, 0)
+
+    def resolve(self, ref):
+        return self.objs[ref.obj_no]
+
+def test_pages_inherit_from_the_nearest_ancestor():
+    objs = Objects()
+    rotate = shared_number(90)
+    page1 = objs.add(3, node('Page'))
+    page2 = objs.add(4, node('Page', Rotate=shared_number(0), MediaBox=PdfArrayObject([shared_number(1)])))
+    inner = objs.add(2, node('Pages', Kids=PdfArrayObject([page1, page2]), Rotate=rotate))
+    # a direct page, after the inner node
+    direct = node('Page')
+    root = node('Pages', Kids=PdfArrayObject([inner, direct]), Resources=node('Resources'), MediaBox=PdfArrayObject([shared_number(0)]))
+    index = PageIndex(root, objs.resolve)
+    assert len(index) == 3
+    assert [index[i] for i in range(3)] == [objs.objs[3], objs.objs[4], direct]
+    assert index.refs == [(3, 0), (4, 0), None]
+    assert index.get_attribute(0, 'Rotate') is rotate
+    assert index.get_attribute(1, 'Rotate').value == 0
+    assert index.get_attribute(2, 'Rotate') is None and index.get_attribute(2, 'Rotate', 0) == 0
+    assert index.get_attribute(0, 'MediaBox').value[0].value == 0
+    assert index.get_attribute(1, 'MediaBox').value[0].value == 1
+    # Type is not inheritable
+    assert index.get_attribute(0, 'Kids') is None
+    assert set(index.get_attributes(0)) == {'Rotate', 'Resources', 'MediaBox'}
+    assert index.get_attributes(2)['Resources'] is root['Resources']
+    # siblings share the dict of their parent
+    assert index.inherited[0] is index.inherited[1]
+
+@pytest.mark.parametrize('shape', ['cycle', 'shared kid', 'self'])
+def test_nodes_reached_twice_raise(shape):
+    objs = Objects()
+    page = objs.add(3, node('Page'))
+    if shape == 'cycle':
+        objs.add(2, node('Pages', Kids=PdfArrayObject([page, objs.ref(1)])))
+        objs.add(1, node('Pages', Kids=PdfArrayObject([objs.ref(2)])))
+    elif shape == 'shared kid':
+        objs.add(1, node('Pages', Kids=PdfArrayObject([page, page])))
+    else:
+        objs.add(1, node('Pages', Kids=PdfArrayObject([objs.ref(1)])))
+    with pytest.raises(Exception, match='more than once'):
+        PageIndex(objs.ref(1), objs.resolve)
+
+def test_invalid_nodes_raise():
+    with pytest.raises(Exception, match='without Kids'):
+        PageIndex(node('Pages'), None)
+    with pytest.raises(Exception, match='invalid Pages'):
+        PageIndex(node('Catalog'), None)
+    with pytest.raises(Exception, match='invalid Pages'):
+        PageIndex(shared_number(1), None)
+
+def test_document_page_index(tmp_path):
+    path = tmp_path / 'tree.pdf'
+    path.write_bytes(make_pdf(pages=40, fanout=3, increments=2))
+    doc = PdfDocument(str(path))
+    index = doc.get_page_index()
+    assert doc.get_page_index() is index and doc.get_page_index(-1) is index
+    assert doc.get_page_count() == len(index) == 40
+    assert doc.get_page_dict(0) is index[0] and doc.get_page_dict(40) is None and doc.get_page_dict(-1) is None
+    assert doc.get_page_attributes(5)['MediaBox'] is index[5]['MediaBox']
+    # each increment has its own index, built from its own objects
+    assert doc.get_page_index(0) is not index and len(doc.get_page_index(0)) == 40
+    # pages are in document order, as numbered by the generator in their /Matrix, and each is a kid of its parent
+    assert [page['Matrix'].value[4].value for page in index.pages] == [page_no + 0.5 for page_no in range(40)]
+    for page, ref in zip(index.pages, index.refs):
+        assert ref[0] in [kid.obj_no for kid in page['Parent'].deref()['Kids'].value]
+    doc.invalidate_page_index()
+    assert doc.get_page_index() is not index
+    doc.close()
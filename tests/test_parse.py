@@ -0,0 +1,107 @@
+import io
+import random
+import pytest
+import parse
+import utils
+from objects import PdfReferenceObject, PdfArrayObject, PdfLiteralStringObject
+
+def random_tokens(rng: random.Random, count: int) -> bytes:
+    choices = [lambda: b'%d' % rng.randint(-5, 99999), lambda: b'%d.%d' % (rng.randint(0, 99), rng.randint(0, 99)),
+               lambda: b'/Name%d' % rng.randint(0, 9), lambda: b'(str\\(\\)\\101 %s)' % (b'x' * rng.randint(0, 300)),
+               lambda: b'<%s>' % (b'ab' * rng.randint(0, 200)), lambda: b'%d 0 R' % rng.randint(1, 9), lambda: b'true',
+               lambda: b'[', lambda: b']', lambda: b'<<', lambda: b'>>', lambda: b'% comment\n']
+    return b' '.join(rng.choice(choices)() for _ in range(count))
+
+def all_tokens(tokens: parse.Tokenizer):
+    result = []
+    while True:
+        token = tokens.next()
+        result.append(token)
+        if token[0] == parse.EOF:
+            return result
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    # tiny blocks and trimming, so that tokens often cross block boundaries and the buffer is often trimmed
+    monkeypatch.setattr(parse.Tokenizer, 'INITIAL_BLOCK_SIZE', 3)
+    monkeypatch.setattr(parse.Tokenizer, 'MAX_BLOCK_SIZE', 16)
+    monkeypatch.setattr(parse.Tokenizer, 'TRIM_SIZE', 32)
+
+def test_file_tokens_match_buffer_tokens(small_blocks):
+    rng = random.Random(0)
+    for _ in range(200):
+        data = random_tokens(rng, rng.randint(1, 60))
+        expected = all_tokens(parse.Tokenizer(utils.BufferReader(data)))
+        tokens = parse.Tokenizer(io.BufferedReader(io.BytesIO(data)))
+        assert all_tokens(tokens) == expected
+        assert len(tokens.buf) <= parse.Tokenizer.TRIM_SIZE + 2 * parse.Tokenizer.MAX_BLOCK_SIZE + 600
+
+def test_push_back_across_block_boundaries(small_blocks):
+    data = b' '.join(b'/Key%d 1234567 0 R' % i for i in range(50))
+    tokens = parse.Tokenizer(io.BufferedReader(io.BytesIO(data)))
+    expected = all_tokens(parse.Tokenizer(utils.BufferReader(data)))
+    seen = []
+    while len(seen) < len(expected) - 1:
+        ahead = [tokens.next() for _ in range(min(3, len(expected) - 1 - len(seen)))]
+        # give back all but the first token looked ahead, as the parser does when a number is not a reference
+        if len(ahead) > 1:
+            tokens.push_back(*ahead[1:])
+            assert tokens.tell() == ahead[1][2]
+        seen.append(ahead[0])
+    assert seen == expected[:-1]
+    tokens.sync()
+    assert tokens.f.tell() == len(data)
+
+def test_references_across_block_boundaries(small_blocks):
+    rng = random.Random(1)
+    for _ in range(50):
+        refs = [(rng.randint(0, 10 ** rng.randint(1, 6)), rng.randint(0, 3)) for _ in range(rng.randint(1, 40))]
+        data = b'[' + b' '.join(b'%d %d R %d' % (obj_no, gen_no, obj_no) for obj_no, gen_no in refs) + b']'
+        array = parse.parse_object(io.BufferedReader(io.BytesIO(data)), None)
+        assert isinstance(array, PdfArrayObject)
+        assert [(obj.obj_no, obj.gen_no) for obj in array.value[0::2]] == refs
+        assert all(isinstance(obj, PdfReferenceObject) for obj in array.value[0::2])
+        assert [obj.value for obj in array.value[1::2]] == [obj_no for obj_no, _ in refs]
+
+def test_deep_nesting_does_not_recurse():
+    data = b'[' * 100000 + b']' * 100000
+    obj = parse.parse_object(utils.BufferReader(data), None)
+    for _ in range(1000):
+        obj = obj.value[0]
+
+@pytest.mark.parametrize('data, offset', [(b'<< /A 1 /B >>', 0), (b'[1 2', 0), (b'<< /A 1 ]', 0), (b'  >', 2), (b'1.2.3', 0)])
+def test_errors_report_their_offset(data, offset):
+    with pytest.raises(Exception, match=f'at {offset}|at offset {offset}'):
+        parse.parse_object(io.BufferedReader(io.BytesIO(data)), None)
+
+def parse_string(data: bytes) -> str:
+    return parse.parse_object(utils.BufferReader(data), None).value
+
+def write_string(value: str) -> bytes:
+    f = io.BytesIO()
+    PdfLiteralStringObject(value).write_to_file(f)
+    return f.getvalue()
+
+def test_literal_strings_round_trip():
+    rng = random.Random(2)
+    for _ in range(500):
+        value = ''.join(chr(rng.choice([rng.randrange(256), ord('('), ord(')'), ord('\\'), ord('\r'), ord('\n')])) for _ in range(rng.randint(0, 50)))
+        written = write_string(value)
+        # EOL markers in a literal string are read as \n, so that a bare \r must be written escaped
+        assert b'\r' not in written and b'\n' not in written
+        assert parse_string(written) == value
+        # also read from a file, a byte at a time
+        f = io.BufferedReader(io.BytesIO(written), buffer_size=1)
+        assert parse.parse_object(f, None).value == value
+
+@pytest.mark.parametrize('data, value', [(b'(a (nested) b)', 'a (nested) b'), (b'(\\(\\)\\\\)', '()\\'),
+                                         (b'(\\101\\1011\\0\\7777)', 'AA1\x00\xff7'), (b'(\\n\\r\\t\\b\\f\\q)', '\n\r\t\b\fq'),
+                                         (b'(a\\\nb\\\r\nc\\\rd)', 'abcd'), (b'(a\rb\r\nc\nd)', 'a\nb\nc\nd')])
+def test_literal_string_escapes(data, value):
+    assert parse_string(data) == value
+
+def test_unterminated_literal_string_raises():
+    with pytest.raises(Exception, match='string at offset 2'):
+        parse_string(b'  (a (b) c')
+    with pytest.raises(ValueError):
+        write_string('€')
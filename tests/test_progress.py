@@ -0,0 +1,42 @@
+import threading
+import pytest
+from benchmarks.corpus import make_pdf
+from doc import PdfDocument
+from progress import Progress, ParseCancelled
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / 'doc.pdf'
+    path.write_bytes(make_pdf(pages=50, objects=500))
+    return path
+
+@pytest.mark.parametrize('linear', [False, True])
+def test_cancel_stops_parsing_partway(pdf_path, linear):
+    cancel = threading.Event()
+    events = []
+    def callback(event):
+        events.append(event)
+        # cancel once parsing is well under way
+        if event.phase in ('objects', 'linear') and event.done > 0:
+            cancel.set()
+    with pytest.raises(ParseCancelled):
+        PdfDocument(str(pdf_path), Progress(callback, interval=None), linear=linear, cancel=cancel)
+    last = events[-1]
+    assert last.phase in ('objects', 'linear') and 0 < last.done < last.total
+
+def test_cancel_stops_load_all(pdf_path):
+    doc = PdfDocument(str(pdf_path), lazy=True)
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(ParseCancelled):
+        doc.load_all(Progress(cancel=cancel))
+    assert len(doc.offset_obj) == 0
+    doc.close()
+
+def test_events_are_throttled(pdf_path):
+    events = []
+    PdfDocument(str(pdf_path), Progress(events.append, interval=None, step=25)).close()
+    objects = [event for event in events if event.phase == 'objects']
+    assert objects[0].done == 0 and objects[-1].fraction == 1.0
+    assert len(objects) <= 6
+    assert [event.done for event in objects] == sorted(event.done for event in objects)
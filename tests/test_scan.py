@@ -0,0 +1,106 @@
+import io
+import random
+import pytest
+import scan
+import syntax
+import utils
+
+ALPHABET = b'ab \r\n\t%()<>/x1'
+PATTERNS = [syntax.EOL, syntax.DELIMS + syntax.WHITESPACES, syntax.WHITESPACES, [b'(', b')', b'\\(', b'\\)'], [b'>'], [b'endobj', b'end', b'o']]
+
+def find(data: bytes, pos: int, patterns):
+    '''Reference search: position of the earliest, and if tie, the longest pattern, as in the original read_until'''
+    for i in range(pos, len(data)):
+        found = [p for p in patterns if data.startswith(p, i)]
+        if found:
+            return i, max(found, key=len)
+    return len(data), None
+
+def line_end(data: bytes, pos: int) -> int:
+    return min([i for i in (data.find(b'\r', pos), data.find(b'\n', pos)) if i >= 0], default=len(data))
+
+def skip_whitespace(data: bytes, pos: int, ignore_comment: bool) -> int:
+    while pos < len(data):
+        if data[pos] in b'\x00\t\n\x0c\r ':
+            pos += 1
+        elif ignore_comment and data[pos] == ord('%'):
+            pos = line_end(data, pos)
+        else:
+            break
+    return pos
+
+def reader(data: bytes, pos: int, rng: random.Random):
+    '''A buffered file with a small buffer, so that scanning crosses buffer boundaries, or a BufferReader'''
+    f = utils.BufferReader(data) if rng.random() < 0.25 else io.BufferedReader(io.BytesIO(data), buffer_size=rng.choice([8, 16, 8192]))
+    f.seek(pos)
+    return f
+
+def random_data(rng: random.Random, size: int) -> bytes:
+    return bytes(rng.choice(ALPHABET) for _ in range(rng.randint(1, size)))
+
+def test_byte_classes():
+    assert all(scan.is_whitespace(ws[0]) for ws in syntax.WHITESPACES)
+    assert all(scan.is_delimiter(d[0]) for d in syntax.DELIMS)
+    assert scan.is_regular(ord('a')) and not scan.is_regular(ord('('))
+
+def test_pattern_matcher_prefers_earliest_then_longest():
+    matcher = scan.compile_patterns([b'end', b'endobj', b'o'])
+    assert matcher.search(b'x endobj') == (2, b'endobj')
+    assert matcher.search(b'xo endobj') == (1, b'o')
+    assert matcher.search(b'xyz') == (-1, None)
+    assert matcher.match(b'endstream') == b'end'
+    assert scan.compile_patterns((b'end', b'endobj', b'o')) is matcher
+    with pytest.raises(ValueError):
+        scan.PatternMatcher((b'',))
+
+def test_read_until_matches_reference():
+    rng = random.Random(1)
+    for _ in range(3000):
+        data = random_data(rng, 40)
+        patterns = rng.choice(PATTERNS)
+        pos = rng.randrange(len(data))
+        f = reader(data, pos, rng)
+        end, found = find(data, pos, patterns)
+        assert utils.read_until(f, patterns) == (data[pos:end], found)
+        assert f.tell() == end
+
+def test_read_until_stops_at_maxsize():
+    f = io.BufferedReader(io.BytesIO(b'abcdefgh\n'), buffer_size=8)
+    assert utils.read_until(f, syntax.EOL, maxsize=3) == (b'abc', b'')
+    assert f.tell() == 3
+    assert utils.read_until(f, syntax.EOL, maxsize=10) == (b'defgh', b'\n')
+
+def test_seek_until_and_skip_whitespace_match_reference():
+    rng = random.Random(2)
+    for _ in range(3000):
+        data = random_data(rng, 300)
+        pos = rng.randrange(len(data))
+        ignore_comment = rng.random() < 0.5
+        patterns = rng.choice([syntax.EOL, [b'('], [b'endobj', b'o']])
+        expected = pos
+        while True:
+            expected, found = find(data, expected, patterns + ([b'%'] if ignore_comment and b'%' not in patterns else []))
+            if found != b'%' or b'%' in patterns:
+                break
+            expected = line_end(data, expected)
+        assert utils.seek_until(reader(data, pos, rng), patterns, ignore_comment=ignore_comment) == expected
+        f = reader(data, pos, rng)
+        assert utils.skip_whitespace(f, ignore_comment=ignore_comment) == skip_whitespace(data, pos, ignore_comment)
+        assert scan.skip_whitespace(data, pos, ignore_comment=ignore_comment) == skip_whitespace(data, pos, ignore_comment)
+
+def test_read_token_matches_reference():
+    rng = random.Random(3)
+    for _ in range(2000):
+        data = random_data(rng, 100)
+        pos = rng.randrange(len(data))
+        end, _ = find(data, pos, syntax.DELIMS + syntax.WHITESPACES)
+        f = reader(data, pos, rng)
+        assert utils.read_token(f) == data[pos:end] and f.tell() == end
+        assert scan.read_token(data, pos) == (data[pos:end], end)
+        assert scan.line_end(data, pos) == line_end(data, pos)
+
+def test_partial_comment_is_not_skipped():
+    # a comment cut by the end of a window of a larger data must be kept for the next window
+    assert scan.skip_whitespace(b'  % comment', final=False) == 2
+    assert scan.skip_whitespace(b'  % comment') == len(b'  % comment')
+    assert scan.skip_whitespace(b'  % comment\nx', final=False) == len(b'  % comment\n')
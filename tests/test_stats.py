@@ -0,0 +1,74 @@
+import json
+from collections import Counter
+from contextlib import contextmanager
+import pytest
+from benchmarks.corpus import make_pdf
+from doc import PdfDocument
+from stats import ParseStats
+from xref import PdfObjectIndex
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / 'doc.pdf'
+    path.write_bytes(make_pdf(pages=10, objects=50, increments=2))
+    return path
+
+def test_stats_are_disabled_by_default(pdf_path):
+    doc = PdfDocument(str(pdf_path))
+    assert doc.stats is None
+    doc.close()
+
+def test_counts_of_a_normal_parse(pdf_path):
+    doc = PdfDocument(str(pdf_path), stats=True)
+    stats = doc.stats
+    inuse = sum(sub.count(sub.INUSE) for inc in doc.increments for sub in inc['xref_section'].subsections)
+    # every in-use entry of every increment is parsed once, except the entries sharing an object of an earlier one
+    assert sum(stats.objects.values()) == len(doc.offset_obj) <= inuse
+    assert stats.objects == Counter(type(obj.value).__name__ for obj in doc.offset_obj.values())
+    assert stats.cache_misses['offset_obj'] == len(doc.offset_obj)
+    assert stats.cache_hits['offset_obj'] == inuse - len(doc.offset_obj)
+    assert stats.phases['xref'][0] == len(doc.increments) and stats.phases['objects'][0] == 1
+    assert all(seconds >= 0 for _, seconds in stats.phases.values())
+    # the file is read a few times over at most
+    size = pdf_path.stat().st_size
+    assert size <= stats.bytes_read < 4 * size
+    assert stats.reads > 0 and stats.seeks > 0
+    # objects already parsed are found in the cache
+    hits = stats.cache_hits['offset_obj']
+    doc.get_obj(1, 0)
+    assert stats.cache_hits['offset_obj'] == hits + 1
+    json.dumps(stats.as_dict())
+    assert 'offset_obj:' in str(stats)
+    doc.close()
+
+def test_counts_of_compressed_objects_and_decoding(tmp_path):
+    path = tmp_path / 'objstm.pdf'
+    path.write_bytes(make_pdf(pages=5, objects=50, xref='stream', objstm_ratio=0.8))
+    phases = []
+    @contextmanager
+    def profiler(name):
+        phases.append(name)
+        yield
+    stats = ParseStats(profiler)
+    doc = PdfDocument(str(path), lazy=True, stats=stats)
+    assert doc.stats is stats and sum(stats.objects.values()) == 0
+    compressed = doc.obj_index.get_obj_nums(PdfObjectIndex.COMPRESSED)
+    for obj_no in compressed + compressed:
+        doc.get_obj(obj_no, 0)
+    assert stats.cache_misses['compressed_obj'] == len(compressed) == stats.cache_hits['compressed_obj']
+    objstms = {doc.obj_index.get_obj_offset(obj_no)[0] for obj_no in compressed}
+    assert stats.phases['objstm'][0] == len(objstms)
+    assert phases.count('objstm') == len(objstms) and 'xref' in phases
+    # FlateDecode output of the object streams, and then of a content stream
+    decoded = stats.decoded_bytes['FlateDecode']
+    assert decoded >= sum(len(doc.get_objstm(obj_no).data) for obj_no in objstms)
+    contents = doc.get_all_page_dicts()[0]['Contents'].deref()
+    data = contents.decode()
+    assert stats.decoded_bytes['FlateDecode'] - decoded == len(data)
+    doc.close()
+
+def test_mmap_reads_are_not_counted(pdf_path):
+    doc = PdfDocument(str(pdf_path), backend='mmap', stats=True)
+    assert doc.stats.reads == doc.stats.bytes_read == 0
+    assert sum(doc.stats.objects.values()) == len(doc.offset_obj) > 0
+    doc.close()
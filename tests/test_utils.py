@@ -0,0 +1,86 @@
+import io
+import random
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import utils
+from benchmarks.corpus import make_pdf
+from doc import PdfDocument
+
+@pytest.fixture
+def data_file(tmp_path):
+    data = random.Random(0).randbytes(100000)
+    path = tmp_path / 'data.bin'
+    path.write_bytes(data)
+    with open(path, 'rb') as f:
+        yield f, data
+
+def read_ranges(reader_factory, data, seed):
+    '''Read random ranges through a new reader from reader_factory, checking peek, read and seek'''
+    rng = random.Random(seed)
+    with reader_factory() as f:
+        for _ in range(200):
+            pos = rng.randrange(len(data))
+            size = rng.choice([1, 10, 5000, 20000])
+            f.seek(pos)
+            assert bytes(f.peek(1)[:1]) == data[pos:pos + 1]
+            assert f.read(size) == data[pos:pos + size]
+            assert f.tell() == min(pos + size, len(data))
+            f.seek(-1, io.SEEK_END)
+            assert f.read() == data[-1:]
+    return True
+
+def test_positional_readers_share_a_descriptor(data_file):
+    f, data = data_file
+    def factory():
+        return closing(utils.PositionalReader(f.fileno(), f.name))
+    with ThreadPoolExecutor(8) as executor:
+        assert all(executor.map(lambda seed: read_ranges(factory, data, seed), range(16)))
+    # the position of the shared descriptor is not used
+    assert f.tell() == 0
+
+@pytest.mark.parametrize('positional', [True, False])
+def test_reader_pool_from_several_threads(data_file, positional):
+    f, data = data_file
+    pool = utils.ReaderPool(f, max_idle=2)
+    if not positional:
+        # as on platforms without os.pread, handles are reopened by name and reused
+        pool.fd = None
+    with ThreadPoolExecutor(8) as executor:
+        assert all(executor.map(lambda seed: read_ranges(pool.reader, data, seed), range(16)))
+    assert len(pool._idle) == 0 if positional else len(pool._idle) <= 2
+    pool.close()
+    assert len(pool._idle) == 0
+
+@pytest.mark.parametrize('backend', ['file', 'mmap'])
+def test_get_obj_from_several_threads(tmp_path, backend):
+    path = tmp_path / 'doc.pdf'
+    path.write_bytes(make_pdf(pages=20, objects=200))
+    doc = PdfDocument(str(path), lazy=True, backend=backend)
+    obj_nos = list(range(1, len(doc.obj_index))) * 4
+    random.Random(0).shuffle(obj_nos)
+    with ThreadPoolExecutor(8) as executor:
+        objs = list(executor.map(lambda obj_no: doc.get_obj(obj_no, 0), obj_nos))
+    # every thread gets the same instance of an object, parsed correctly
+    for obj_no, obj in zip(obj_nos, objs):
+        assert obj.obj_no == obj_no
+        assert obj is doc.get_obj(obj_no, 0)
+    doc.close()
+
+def test_lru_cache_evicts_least_recently_used_within_budget():
+    cache = utils.LRUCache(10)
+    cache.put('a', b'xxxx')
+    cache.put('b', b'xxxx')
+    assert cache.get('a') == b'xxxx' # a is now more recent than b
+    cache.put('c', b'xxxx')
+    assert 'b' not in cache and 'a' in cache and 'c' in cache
+    assert cache.size == 8 and cache.evictions == 1
+    # a value larger than the budget is not cached, and replaces nothing
+    cache.put('d', b'x' * 11)
+    assert 'd' not in cache and len(cache) == 2
+    # replacing a value accounts for its new size
+    cache.put('a', b'x')
+    assert cache.size == 5
+    assert cache.pop('a') == b'x' and cache.size == 4
+    assert (cache.hits, cache.misses) == (1, 0)
+    assert cache.get('a') is None and cache.misses == 1
@@ -0,0 +1,138 @@
+import io
+import random
+import pytest
+import xref
+from array import array
+from objects import PdfStreamObject, PdfDictionaryObject, PdfIndirectObject, PdfNameObject, PdfArrayObject, shared_number
+from xref import PdfXRefSection, PdfXRefSubSection, PdfObjectIndex
+
+def xref_stream(rows, w, size):
+    stream_dict = PdfDictionaryObject({
+        PdfNameObject('Type'): PdfNameObject('XRef'),
+        PdfNameObject('W'): PdfArrayObject([shared_number(width) for width in w]),
+        PdfNameObject('Size'): shared_number(size),
+    })
+    return PdfIndirectObject(PdfStreamObject(stream_dict, b''.join(rows)), size, 0)
+
+def test_unknown_entry_type_is_null_object():
+    table = PdfXRefSection(io.BufferedReader(io.BytesIO(
+        b'xref\n0 3\n0000000000 65535 f\r\n0000000015 00000 n\r\n0000000064 00000 n\r\ntrailer\n')))
+    # object 2 is updated by an entry of type 3, which is reserved and must be read as a reference to null
+    stream = PdfXRefSection.from_xrefstm(xref_stream([b'\x00\x00\x00\xff', b'\x01\x00\x0f\x00', b'\x03\x00\x07\x00'], [1, 2, 1], 3))
+    assert stream.get_obj_offset(2, 0) == 0
+    index = PdfObjectIndex([table, stream])
+    assert index.get_obj_offset(1) == 15
+    assert index.get_obj_offset(2) == 0
+    assert index.kinds[2] == PdfObjectIndex.FREE
+    assert index.get_increment(2) == 1
+
+def test_index_is_bounded_by_size():
+    # a single entry claiming a huge object number must not size the arrays
+    table = PdfXRefSection(io.BufferedReader(io.BytesIO(
+        b'xref\n0 2\n0000000000 65535 f\r\n0000000015 00000 n\r\n2000000000 1\r\n0000000064 00000 n\r\ntrailer\n')))
+    index = PdfObjectIndex([table], 2)
+    assert len(index) == 2
+    assert index.get_obj_offset(1) == 15
+    assert index.get_obj_offset(2000000000) == 64
+    assert index.get_increment(2000000000) == 0
+    assert index.get_obj_offset(1999999999) is None
+    assert index.get_obj_nums(PdfObjectIndex.INUSE) == [1, 2000000000]
+    # without a trailer size, by the number of entries
+    assert len(PdfObjectIndex([table])) <= 6
+
+def decode_rows(data: bytes, w, rows):
+    '''Reference decoding of cross-reference stream rows, one field at a time'''
+    columns = ([], [], [])
+    pos = 0
+    for _ in range(rows):
+        for column, default, size in zip(columns, (1, 0, 0), w):
+            column.append(int.from_bytes(data[pos:pos + size], 'big') if size > 0 else default)
+            pos += size
+    return columns
+
+def test_xref_stream_rows_match_reference():
+    rng = random.Random(0)
+    for _ in range(500):
+        w = [rng.randint(0, 1), rng.randint(0, 8), rng.randint(0, 4)]
+        rows = rng.randint(0, 50)
+        data = bytearray(rng.randbytes(rows * sum(w)))
+        # keep field 2 within 63 bits
+        for r in range(rows):
+            if w[1] == 8:
+                data[r * sum(w) + w[0]] &= 0x7f
+        types, field2, field3 = xref._decode_xref_rows(bytes(data) + b'trailing', w, rows)
+        assert (types.typecode, field2.typecode, field3.typecode) == ('B', 'q', 'I')
+        assert (list(types), list(field2), list(field3)) == decode_rows(bytes(data), w, rows)
+
+@pytest.mark.parametrize('w, row', [([1, 9, 1], b'\x01\x01' + bytes(9)), ([1, 8, 1], b'\x01\x80' + bytes(8)), ([1, 2, 5], b'\x01\x00\x00\x01' + bytes(4))])
+def test_xref_stream_fields_too_wide_raise(w, row):
+    with pytest.raises(Exception, match='wider than'):
+        xref._decode_xref_rows(row, w, 1)
+
+def test_xref_stream_too_short_raises():
+    with pytest.raises(Exception, match='too short'):
+        xref._decode_xref_rows(b'\x01\x00', [1, 2, 1], 1)
+
+def test_xref_stream_index_splits_subsections():
+    rows = [b'\x01\x00\x0f\x00', b'\x02\x00\x05\x03', b'\x01\x01\x00\x00']
+    stream_obj = xref_stream(rows, [1, 2, 1], 20)
+    stream_obj.value.dict[PdfNameObject('Index')] = PdfArrayObject([shared_number(n) for n in (3, 2, 10, 1)])
+    section = PdfXRefSection.from_xrefstm(stream_obj)
+    assert [(sub.first_objno, len(sub)) for sub in section.subsections] == [(3, 2), (10, 1)]
+    assert section.get_obj_offset(3, 0) == 15
+    assert section.get_obj_offset(4, 0) == (5, 3)
+    assert section.get_obj_offset(10, 0) == 256
+    assert section.get_obj_offset(5, 0) is None
+
+def test_subsection_columns_and_entry_views():
+    sub = PdfXRefSubSection.from_columns(5, array('B', [0, 1, 2]), array('q', [0, 1234, 9]), array('I', [7, 2, 4]))
+    assert not hasattr(sub, '__dict__')
+    assert len(sub) == 3 and 5 in sub and 8 not in sub and 4 not in sub
+    assert sub.get_entry(8) is None
+    free, inuse, compressed = list(sub)
+    assert (free.obj_no, free.used, free.next_free_obj_no, free.gen_no, free.offset) == (5, False, 0, 7, None)
+    assert (inuse.obj_no, inuse.used, inuse.compressed, inuse.offset, inuse.gen_no) == (6, True, False, 1234, 2)
+    assert (compressed.used, compressed.compressed, compressed.stream_obj_no, compressed.index, compressed.gen_no, compressed.offset) == (True, True, 9, 4, 0, None)
+    assert [entry.obj_no for entry in sub.iter_entries(PdfXRefSubSection.INUSE)] == [6]
+    assert sub.count(PdfXRefSubSection.COMPRESSED) == 1
+    section = PdfXRefSection.__new__(PdfXRefSection)
+    section.subsections = [sub]
+    assert section.get_entry(6).offset == 1234 and section.get_entry(4) is None
+    assert [section.get_obj_offset(obj_no, 0) for obj_no in range(4, 9)] == [None, 0, 1234, (9, 4), None]
+    # parsed tables use the same compact columns, e.g. 1 byte per entry type
+    table = PdfXRefSection(io.BufferedReader(io.BytesIO(b'xref\n0 1\n0000000000 65535 f\r\ntrailer\n')))
+    assert [column.typecode for column in (table.subsections[0].types, table.subsections[0].field2, table.subsections[0].field3)] == ['B', 'q', 'I']
+
+def random_entries(rng: random.Random, count: int):
+    '''Columns of count random entries from object number 0, with a valid linked list of free objects'''
+    types = [0] + [rng.choice([0, 1, 1, 1]) for _ in range(count - 1)]
+    free = [i for i, t in enumerate(types) if t == 0]
+    next_free = dict(zip(free, free[1:] + [0]))
+    field2 = [next_free[i] if t == 0 else rng.randrange(10 ** 10) for i, t in enumerate(types)]
+    field3 = [65535] + [rng.randrange(65536) for _ in range(count - 1)]
+    return types, field2, field3
+
+def classic_table(rng: random.Random, types, field2, field3) -> bytes:
+    eols = [b' \r', b' \n', b'\r\n']
+    return b'xref\n0 %d\n' % len(types) + b''.join(b'%010d %05d %s' % (offset, gen_no, b'fn'[t:t + 1]) + rng.choice(eols)
+                                                for t, offset, gen_no in zip(types, field2, field3)) + b'trailer\n'
+
+def test_classic_and_stream_tables_parse_to_the_same_columns():
+    rng = random.Random(4)
+    for count in [1, 2, 7, 100, 1000]:
+        types, field2, field3 = random_entries(rng, count)
+        table = PdfXRefSection(io.BufferedReader(io.BytesIO(classic_table(rng, types, field2, field3)), buffer_size=64))
+        rows = [bytes([t]) + offset.to_bytes(5, 'big') + gen_no.to_bytes(2, 'big') for t, offset, gen_no in zip(types, field2, field3)]
+        stream = PdfXRefSection.from_xrefstm(xref_stream(rows, [1, 5, 2], count))
+        for sub in (table.subsections[0], stream.subsections[0]):
+            assert (sub.first_objno, list(sub.types), list(sub.field2), list(sub.field3)) == (0, types, field2, field3)
+        assert [table.get_obj_offset(i, 0) for i in range(count)] == [stream.get_obj_offset(i, 0) for i in range(count)]
+
+@pytest.mark.parametrize('entry, offset', [(b'0000000015 00000 n\r\r', 29), (b'000000001x 00000 n\r\n', 29), (b'0000000015 00000 x\r\n', 29),
+                                           (b'0000000015 0000 n\r\n\n', 29),
+                                           # object 1 is free, so that object 0, the head of the list of free objects, must link to it
+                                           (b'0000000000 00000 f\r\n', 9)])
+def test_invalid_classic_entry_raises_with_its_offset(entry, offset):
+    data = b'xref\n0 3\n0000000000 65535 f\r\n' + entry + b'0000000064 00000 n\r\ntrailer\n'
+    with pytest.raises(Exception, match=f'invalid entry at offset {offset}'):
+        PdfXRefSection(io.BufferedReader(io.BytesIO(data)))
@@ -1,10 +1,14 @@
 import io
+import os
 import re
 import syntax
-import math
+import scan
+import threading
 from typing import Union, Tuple, Iterable
 from functools import wraps
+from contextlib import contextmanager
 from itertools import tee, islice
+from collections import OrderedDict
 
 def pairwise(iterable):
     '''s -> (s0,s1), (s1,s2), (s2, s3), ...'''
@@ -45,6 +49,236 @@ def memoize(obj):
         return cache[key]
     return memoizer
 
+class BufferReader():
+    """A read-only, seekable file-like object over a buffer, e.g. an mmap of a PDF file.
+
+    peek() returns a memoryview of all remaining bytes without copying, so that the scanning
+    functions in this module work directly on the buffer. read_view() is the zero-copy
+    counterpart of read()."""
+    def __init__(self, buffer, name: str = None):
+        self.buffer = memoryview(buffer)
+        self.name = name
+        self.pos = 0
+        self.closed = False
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self) -> int:
+        return self.pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self.pos + offset
+        elif whence == io.SEEK_END:
+            pos = len(self.buffer) + offset
+        else:
+            raise ValueError(f'invalid whence ({whence})')
+        if pos < 0:
+            raise ValueError(f'negative seek position {pos}')
+        self.pos = pos
+        return pos
+
+    def read(self, size: int = -1) -> bytes:
+        return bytes(self.read_view(size))
+
+    def read_view(self, size: int = -1) -> memoryview:
+        end = len(self.buffer) if size is None or size < 0 else self.pos + size
+        view = self.buffer[self.pos:end]
+        self.pos += len(view)
+        return view
+
+    def peek(self, size: int = 0) -> memoryview:
+        return self.buffer[self.pos:]
+
+    def size(self) -> int:
+        return len(self.buffer)
+
+    def close(self):
+        '''Release the view of the buffer, so that e.g. an mmap can be closed once no other view of it is left'''
+        self.closed = True
+        self.buffer.release()
+        self.buffer = memoryview(b'')
+
+class PositionalReader():
+    """A read-only file-like object with its own position over a shared file descriptor.
+
+    Reads are done with os.pread, which does not use nor change the seek state of the descriptor,
+    so that any number of PositionalReader can be used concurrently on the same file."""
+    BLOCK_SIZE = 8192
+
+    def __init__(self, fd: int, name: str = None):
+        self.fd = fd
+        self.name = name
+        self.pos = 0
+        self._window = b''
+        self._window_pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self) -> int:
+        return self.pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self.pos + offset
+        elif whence == io.SEEK_END:
+            pos = self.size() + offset
+        else:
+            raise ValueError(f'invalid whence ({whence})')
+        if pos < 0:
+            raise ValueError(f'negative seek position {pos}')
+        self.pos = pos
+        return pos
+
+    def peek(self, size: int = 0) -> memoryview:
+        start = self.pos - self._window_pos
+        if start < 0 or start >= len(self._window) or len(self._window) - start < size:
+            self._window = os.pread(self.fd, max(self.BLOCK_SIZE, size), self.pos)
+            self._window_pos = self.pos
+            start = 0
+        return memoryview(self._window)[start:]
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = max(0, self.size() - self.pos)
+        start = self.pos - self._window_pos
+        if start >= 0 and start + size <= len(self._window):
+            data = self._window[start:start + size]
+        else:
+            data = os.pread(self.fd, size, self.pos)
+        self.pos += len(data)
+        return data
+
+    def size(self) -> int:
+        return os.fstat(self.fd).st_size
+
+    def close(self):
+        self._window = b''
+
+class ReaderPool():
+    """Hands out independent readers of one file, for parsing from several threads at once.
+
+    If os.pread is available, readers are PositionalReader on the descriptor of f and no handle is opened.
+    Otherwise, the file is reopened by name, and at most max_idle of these handles are kept for reuse."""
+    def __init__(self, f, max_idle: int = 4):
+        self.name = getattr(f, 'name', None)
+        self.fd = None
+        if hasattr(os, 'pread'):
+            try:
+                self.fd = f.fileno()
+            except (AttributeError, OSError, io.UnsupportedOperation):
+                pass
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def reader(self):
+        if self.fd is not None:
+            yield PositionalReader(self.fd, self.name)
+            return
+        with self._lock:
+            handle = self._idle.pop() if len(self._idle) > 0 else None
+        if handle is None:
+            # never wait for a handle, as reading the data of a stream while parsing from another reader needs one more
+            handle = open(self.name, 'rb')
+        try:
+            yield handle
+        finally:
+            with self._lock:
+                if len(self._idle) < self.max_idle:
+                    self._idle.append(handle)
+                    handle = None
+            if handle is not None:
+                handle.close()
+
+    def close(self):
+        with self._lock:
+            for handle in self._idle:
+                handle.close()
+            self._idle = []
+
+class LRUCache():
+    """A thread-safe least-recently-used cache, bounded by the total size of its values as measured by sizeof.
+
+    Values larger than max_size are not cached at all."""
+    def __init__(self, max_size: int, sizeof=len):
+        self.max_size = max_size
+        self.sizeof = sizeof
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict() # [key]: (value, size)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            if size > self.max_size:
+                return
+            self._data[key] = (value, size)
+            self.size += size
+            while self.size > self.max_size:
+                _, (_, evicted_size) = self._data.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+            if item is None:
+                return default
+            self.size -= item[1]
+            return item[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+def file_size(f) -> int:
+    if isinstance(f, BufferReader):
+        return f.size()
+    try:
+        return os.fstat(f.fileno()).st_size
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        org_pos = f.tell()
+        size = f.seek(0, io.SEEK_END)
+        f.seek(org_pos, io.SEEK_SET)
+        return size
+
 def peek_at_least(f: io.BufferedReader, size: int):
     peeked = f.peek(size)
     if len(peeked) > 0 and len(peeked) < size: # peek may return less bytes than specified even if actually available
@@ -56,66 +290,118 @@ def peek_at_least(f: io.BufferedReader, size: int):
 def read_until(f: io.BufferedReader, patterns: Iterable, *, maxsize: int = 0):
     """until earliest, if tie, longest, one in patterns. Note: f must support seek().
 
-    If f produces bytes, patterns should also be bytes literals (string literals with b prefix)"""
+    If f produces bytes, patterns should also be bytes literals (string literals with b prefix)
+
+    Return the bytes read and the pattern found, which is not consumed. The pattern is None
+    if EOF is reached before any pattern is found, or b'' if maxsize is reached first."""
     maxsize = 0 if maxsize < 0 else maxsize
-    max_len = max(len(p) for p in patterns)
-    result: bytes = bytes()
+    matcher = scan.compile_patterns(patterns)
+    max_len = matcher.max_len
+    parts = []
+    size = 0
     violation = b''
-    def append_result(s): # necessary as read data may be bytes or str
-        if len(s) == 0: return
-        nonlocal result
-        if len(result) == 0:
-            result = s
-        else:
-            result += s
-            result = bytes(result)
     while True:
         peeked = peek_at_least(f, max_len)
-        temp = [(p, peeked.find(p)) for p in patterns if peeked.find(p) >= 0]
-        if len(temp) == 0:
-            next_violate = len(peeked)
-            violation = None if len(peeked) < max_len else violation  # None to inidcate EOF
-        else:
-            violation, next_violate = min(temp, key=lambda x: x[1] + 1 / (1 + len(x[0])))
-        if maxsize != 0 and len(result) + len(peeked[:next_violate]) > maxsize:
-            d = maxsize - len(result)
-            append_result(peeked[:d])
+        if len(peeked) == 0:
+            violation = None # None to indicate EOF
+            break
+        eof = len(peeked) < max_len # peek_at_least only returns less than asked at EOF
+        next_violate, found = matcher.search(peeked)
+        if next_violate < 0:
+            # keep a possibly partial pattern at the end of peeked for the next round
+            next_violate = len(peeked) if eof or max_len == 1 else len(peeked) - max_len + 1
+        elif next_violate + max_len > len(peeked) and not eof:
+            # a longer pattern may be cut by the end of peeked
+            f.seek(next_violate, io.SEEK_CUR)
+            found = matcher.match(peek_at_least(f, max_len))
+            f.seek(-next_violate, io.SEEK_CUR)
+        if maxsize != 0 and size + next_violate > maxsize:
+            d = maxsize - size
+            parts.append(peeked[:d])
             f.seek(d, io.SEEK_CUR)
             violation = b'' # inidcate max size reached
             break
-        elif maxsize != 0 and len(result) + len(peeked[:next_violate]) == maxsize:
-            append_result(peeked[:next_violate])
-            f.seek(next_violate, io.SEEK_CUR)
+        parts.append(peeked[:next_violate])
+        size += next_violate
+        f.seek(next_violate, io.SEEK_CUR)
+        if found is not None:
+            violation = found
             break
-        else:
-            append_result(peeked[:next_violate])
-            f.seek(next_violate, io.SEEK_CUR)
-            if next_violate != len(peeked): break
-    return result, violation
+        if maxsize != 0 and size == maxsize:
+            violation = None if eof else b''
+            break
+    result = parts[0] if len(parts) == 1 else b''.join(parts)
+    return bytes(result), violation
 
 def seek_until(f: io.BufferedReader, patterns: Iterable, *, ignore_comment: bool = False) -> int:
     """until earliest, if tie, longest, one in patterns, though it does not matter as this function does not return violation"""
-    max_len = max(len(p) for p in patterns)
-    violation = b''
+    if ignore_comment and b'%' not in patterns:
+        patterns = list(patterns) + [b'%']
+    matcher = scan.compile_patterns(patterns)
+    max_len = matcher.max_len
     while True:
         peeked = peek_at_least(f, max(128, max_len))
-        violation, next_violate = min(((p, float('inf') if peeked.find(p) <= -1 else peeked.find(p)) for p in list(patterns) + ([b'%'] if ignore_comment and b'%' not in patterns else [])), key=lambda x: x[1] + 1 / (1 + len(x[0])))
-        if math.isinf(next_violate) and next_violate > 0:
-            next_violate = len(peeked)
+        if len(peeked) == 0:
+            break
+        next_violate, violation = matcher.search(peeked)
+        if next_violate < 0:
+            eof = len(peeked) < max(128, max_len)
+            f.seek(len(peeked) if eof or max_len == 1 else len(peeked) - max_len + 1, io.SEEK_CUR)
+            continue
         f.seek(next_violate, io.SEEK_CUR)
-        if next_violate != len(peeked): break
-        if max(128, max_len) > len(peeked): break
-    if ignore_comment and violation == b'%':
-        _, eol_maker = read_until(f, syntax.EOL)
-        #f.seek(len(eol_maker), io.SEEK_CUR)
-        # PDF ignores comments, up to but not including the end of the line, treating them as if they were single white-space character
-        # _\r => \x00\r, \x20\r, \t\r, \f\r
-        # _\n => \x00\n, \x20\n, \t\n, \f\n
-        # _\r\n => \x00\r\n, \x20\r\n, \t\r\n, \f\r\n
-        #
-        return seek_until(f, patterns, ignore_comment=ignore_comment)
-    else:
-        return f.tell()
+        if ignore_comment and violation == b'%':
+            # PDF ignores comments, up to but not including the end of the line, treating them as if they were single white-space character
+            skip_line(f)
+            continue
+        break
+    return f.tell()
+
+def skip_whitespace(f: io.BufferedReader, *, ignore_comment: bool = True) -> int:
+    """Skip whitespaces, and comments if ignore_comment. Return the new position of f."""
+    if isinstance(f, BufferReader):
+        f.pos = scan.skip_whitespace(f.buffer, f.pos, ignore_comment=ignore_comment)
+        return f.pos
+    while True:
+        peeked = f.peek(1)
+        if len(peeked) == 0:
+            break
+        pos = scan.skip_whitespace(peeked, ignore_comment=ignore_comment, final=False)
+        f.seek(pos, io.SEEK_CUR)
+        if pos == len(peeked):
+            continue
+        if ignore_comment and peeked[pos] == 0x25: # a comment going beyond peeked
+            skip_line(f)
+            continue
+        break
+    return f.tell()
+
+def skip_line(f: io.BufferedReader) -> int:
+    """Seek to the next EOL marker, without consuming it. Return the new position of f."""
+    while True:
+        peeked = f.peek(1)
+        if len(peeked) == 0:
+            break
+        pos = scan.line_end(peeked)
+        f.seek(pos, io.SEEK_CUR)
+        if pos < len(peeked):
+            break
+    return f.tell()
+
+def read_token(f: io.BufferedReader) -> bytes:
+    """Read regular characters until a whitespace, a delimiter or EOF, which is not consumed."""
+    if isinstance(f, BufferReader):
+        token, f.pos = scan.read_token(f.buffer, f.pos)
+        return token
+    parts = []
+    while True:
+        peeked = f.peek(1)
+        if len(peeked) == 0:
+            break
+        pos = scan.token_end(peeked)
+        parts.append(f.read(pos))
+        if pos < len(peeked):
+            break
+    return parts[0] if len(parts) == 1 else b''.join(parts)
 
 def tail(f, lines):
     BLOCK_SIZE = 1024
@@ -184,3 +470,29 @@ def rlines(f, BLOCK_SIZE = 1024, *, MAX_OFFSET = None):
 @memoize
 def b_(sth) -> bytes:
     return bytes(str(sth), 'iso-8859-1') # latin-1, full 8-bit
+
+class IterReader(io.RawIOBase):
+    '''Read-only raw binary stream over an iterable of bytes-like chunks'''
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._pending = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while len(self._pending) == 0:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._pending = memoryview(chunk).cast('B')
+        size = min(len(b), len(self._pending))
+        b[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def close(self):
+        if hasattr(self._chunks, 'close'):
+            self._chunks.close()
+        self._pending = memoryview(b'')
+        super().close()
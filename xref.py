@@ -1,10 +1,73 @@
 import utils
 import io
 import re
+import sys
 import syntax
-from itertools import accumulate
+from array import array
+
+def _decode_xref_rows(data, w, rows):
+    '''Decode rows of big-endian fields of widths w, as in cross-reference streams,
+    into 3 arrays: type, field 2 and field 3. A field of width 0 takes its default value'''
+    rowsize = sum(w)
+    if len(data) < rows * rowsize:
+        raise Exception(f'cross-reference stream has {len(data)} bytes, too short for {rows} entries of {rowsize} bytes')
+    data = bytes(memoryview(data)[:rows * rowsize])
+    columns = []
+    start = 0
+    for typecode, default, size in zip('BqI', (1, 0, 0), w):
+        column = array(typecode)
+        if size == 0:
+            # type 1 is the default of field 1, 0 for the others
+            column = array(typecode, [default]) * rows
+        else:
+            # data[k::rowsize] is the k-th byte of every row. Place the bytes of each field into
+            # the big-endian layout of the column's items, then convert all items at once
+            itemsize = column.itemsize
+            for k in range(start, start + size - itemsize):
+                if data[k::rowsize].count(0) != rows:
+                    raise Exception(f'cross-reference stream has a field value wider than {itemsize} bytes')
+            layout = bytearray(rows * itemsize)
+            for k in range(max(0, size - itemsize), size):
+                layout[itemsize - size + k::itemsize] = data[start + k::rowsize]
+            column.frombytes(layout)
+            if itemsize > 1 and sys.byteorder == 'little':
+                column.byteswap()
+            if size >= itemsize and typecode == 'q' and rows > 0 and min(column) < 0:
+                raise Exception('cross-reference stream has a field value wider than 63 bits')
+        columns.append(column)
+        start += size
+    return tuple(columns)
+
+# a run of valid cross-reference table entries: nnnnnnnnnn ggggg n/f EOL
+_XREF_ENTRIES = re.compile(rb'(?:\d{10}\s\d{5}\s[nf](?: \r| \n|\r\n))*')
+# PdfXRefSubSection type by the keyword of a cross-reference table entry
+_XREF_ENTRY_TYPES = bytes.maketrans(b'fn', bytes([0, 1]))
+_DIGITS = b'0123456789'
+# same as \s in _XREF_ENTRIES and bytes.split()
+_SPACES = b' \t\n\r\x0b\x0c'
+
+def _find_invalid_xref_entry(data, count):
+    '''Return the index of the first invalid entry in data, which should be count entries of a cross-reference table, or None if all are valid'''
+    if len(data) == count * 20:
+        # data[k::20] is the k-th byte of every entry, so each column can be checked at once
+        digits = b''.join(data[k::20] for k in (*range(0, 10), *range(11, 16)))
+        eol1, eol2 = data[18::20], data[19::20]
+        if (len(digits.translate(None, _DIGITS)) == 0 and len(data[10::20].translate(None, _SPACES)) == 0
+                and len(data[16::20].translate(None, _SPACES)) == 0 and len(data[17::20].translate(None, b'nf')) == 0
+                and len(eol1.translate(None, b' \r')) == 0 and len(eol2.translate(None, b'\r\n')) == 0):
+            # the EOL marker is one of SP CR, SP LF or CR LF, i.e. CR CR is the only invalid combination left.
+            # Interleave both bytes of the markers with the first CR marked, so that the search cannot match across 2 entries
+            eols = bytearray(2 * count)
+            eols[0::2] = eol1.translate(bytes.maketrans(b'\r', b'X'))
+            eols[1::2] = eol2
+            if eols.find(b'X\r') < 0:
+                return None
+    # locate the invalid entry
+    return _XREF_ENTRIES.match(data).end() // 20
 
 class PdfXRefSection():
+    __slots__ = ['subsections']
+
     def __init__(self, f):
         '''Initialize a PdfXRefSection from a opened PDF file f.
 
@@ -30,68 +93,140 @@ class PdfXRefSection():
 
     def get_obj_offset(self, obj_num, gen_num):
         for sub in self.subsections:
-            sub_length = len(sub.entries)
-            if obj_num > sub.first_objno + sub_length - 1:
-                continue
-            elif sub.first_objno > obj_num:
+            if obj_num not in sub:
                 continue
+            i = obj_num - sub.first_objno
+            kind = sub.types[i]
+            if kind == PdfXRefSubSection.INUSE:
+                return sub.field2[i]
+            elif kind == PdfXRefSubSection.COMPRESSED:
+                return (sub.field2[i], sub.field3[i])
             else:
-                entry = sub.entries[obj_num - sub.first_objno]
-                if entry['used']:
-                    if entry.get('compressed'):
-                        return (entry['stream_obj_no'], entry['index'])
-                    return entry['offset']
-                else:
-                    return 0
+                return 0
+        return None
+
+    def get_entry(self, obj_num):
+        '''View of the entry of obj_num, or None if not found'''
+        for sub in self.subsections:
+            if obj_num in sub:
+                return sub.get_entry(obj_num)
         return None
 
     @classmethod
     def from_xrefstm(cls, indirectStreamObj):
         streamObj = indirectStreamObj.value
-        xref = streamObj.decode()
-        w = [int(v.value) for v in streamObj.dict['W'].value]
+        xref = streamObj.decode(use_cache=False)
+        w = [v.as_int() for v in streamObj.dict['W'].value]
+        if len(w) != 3 or any(size < 0 for size in w):
+            raise Exception(f'Invalid W in cross-reference stream {indirectStreamObj.obj_no}')
 
         if streamObj.dict.get('Index') is None:
-            index = [0, int(streamObj.dict.get('Size').value)]
+            index = [0, streamObj.dict.get('Size').as_int()]
         else:
-            index = (int(i.value) for i in streamObj.dict['Index'].value)
+            index = (i.as_int() for i in streamObj.dict['Index'].value)
         index = list(utils.chunks(index, 2))
-        objnums = (e for subsection in (list(range(i[0], i[0] + i[1])) for i in index) for e in subsection)
-        ii = iter(i for i in range(0, len(xref), sum(w)))
 
+        types, field2, field3 = _decode_xref_rows(xref, w, sum(i[1] for i in index))
         ss = []
-        for subsection in ((range(i[0], i[0] + i[1])) for i in index):
-            free_entry = []
-            inuse_entry = []
-            entries = []
-            for objnum in subsection:
-                i = next(ii)
-                fields = [int.from_bytes(xref[i+offset:i+offset+size], byteorder='big') for size, offset in zip(w, [0]+list(accumulate(w))[:-1])]
-                if fields[0] == 0: # free
-                    free_entry += [{'obj_no': objnum, 'gen_no': fields[2], 'used': False, 'compressed': False, 'next_free_obj_no': fields[1]}]
-                    entries += [free_entry[-1]]
-                elif fields[0] == 1: # used
-                    inuse_entry += [{'obj_no': objnum, 'gen_no': fields[2], 'used': True, 'compressed': False, 'offset': fields[1]}]
-                    entries += [inuse_entry[-1]]
-                elif fields[0] == 2: # compressed
-                    inuse_entry += [{'obj_no': objnum, 'gen_no': 0, 'used': True, 'compressed': True, 'stream_obj_no': fields[1], 'index': fields[2]}]
-                    entries += [inuse_entry[-1]]
-            ss += [PdfXRefSubSection.from_entries(inuse_entry, free_entry, entries)]
+        start = 0
+        for first_objno, count in index:
+            end = start + count
+            ss += [PdfXRefSubSection.from_columns(first_objno, types[start:end], field2[start:end], field3[start:end])]
+            start = end
 
         self = cls.__new__(cls)
         self.subsections = ss
         return self
 
+class PdfXRefEntry():
+    '''Lightweight, read-only view of an entry of a PdfXRefSubSection'''
+    __slots__ = ['obj_no', 'type', 'field2', 'field3']
+
+    def __init__(self, obj_no, entry_type, field2, field3):
+        self.obj_no = obj_no
+        self.type = entry_type
+        self.field2 = field2
+        self.field3 = field3
+
+    def __repr__(self):
+        return f'PdfXRefEntry({self.obj_no}, {self.type}, {self.field2}, {self.field3})'
+
+    @property
+    def used(self):
+        return self.type == PdfXRefSubSection.INUSE or self.type == PdfXRefSubSection.COMPRESSED
+
+    @property
+    def compressed(self):
+        return self.type == PdfXRefSubSection.COMPRESSED
+
+    @property
+    def offset(self):
+        '''Byte offset of an in-use entry'''
+        return self.field2 if self.type == PdfXRefSubSection.INUSE else None
+
+    @property
+    def gen_no(self):
+        '''Generation number, which is implicitly 0 for compressed objects'''
+        return 0 if self.type == PdfXRefSubSection.COMPRESSED else self.field3
+
+    @property
+    def next_free_obj_no(self):
+        return self.field2 if self.type == PdfXRefSubSection.FREE else None
+
+    @property
+    def stream_obj_no(self):
+        return self.field2 if self.type == PdfXRefSubSection.COMPRESSED else None
+
+    @property
+    def index(self):
+        '''Index of a compressed object in its object stream'''
+        return self.field3 if self.type == PdfXRefSubSection.COMPRESSED else None
+
 class PdfXRefSubSection():
+    '''Entries of consecutive object numbers starting from first_objno, as columns.
+
+    types holds the entry types as in cross-reference streams (FREE, INUSE or COMPRESSED; others
+    are references to the null object), field2 the byte offset, object stream number or next
+    free object number, and field3 the generation number or index in object stream'''
+    FREE = 0
+    INUSE = 1
+    COMPRESSED = 2
+    __slots__ = ['first_objno', 'types', 'field2', 'field3']
+
     @classmethod
-    def from_entries(cls, inuse_entry, free_entry, entries):
+    def from_columns(cls, first_objno, types, field2, field3):
         self = cls.__new__(cls)
-        self.inuse_entry = inuse_entry
-        self.free_entry = free_entry
-        self.entries = entries
-        self.first_objno = min(x['obj_no'] for x in entries)
+        self.first_objno = first_objno
+        self.types = types
+        self.field2 = field2
+        self.field3 = field3
         return self
 
+    def __len__(self):
+        return len(self.types)
+
+    def __contains__(self, obj_num):
+        return self.first_objno <= obj_num < self.first_objno + len(self.types)
+
+    def __iter__(self):
+        return map(self.get_entry, range(self.first_objno, self.first_objno + len(self.types)))
+
+    def get_entry(self, obj_num):
+        '''View of the entry of obj_num, or None if obj_num is not in this subsection'''
+        if obj_num not in self:
+            return None
+        i = obj_num - self.first_objno
+        return PdfXRefEntry(obj_num, self.types[i], self.field2[i], self.field3[i])
+
+    def iter_entries(self, entry_type):
+        '''Views of the entries of type entry_type, in order of object number'''
+        for i, t in enumerate(self.types):
+            if t == entry_type:
+                yield PdfXRefEntry(self.first_objno + i, t, self.field2[i], self.field3[i])
+
+    def count(self, entry_type):
+        '''Number of entries of type entry_type'''
+        return self.types.count(entry_type)
 
     def __init__(self, f):
         '''Initialize a PdfXRefSubSection from a opened PDF file f.
@@ -99,9 +234,6 @@ class PdfXRefSubSection():
         The file object’s current position should be at the line with two
         numbers, object number of the first object in this subsection and the
         umber of entries, separated by a space'''
-        self.inuse_entry = []
-        self.free_entry = []
-        self.entries = []
         org_pos = f.tell()
         s, eol_marker = utils.read_until(f, syntax.EOL)
         matches = re.match(rb'^\s*(\d+)\s+(\d+)\s*$', s)
@@ -115,41 +247,122 @@ class PdfXRefSubSection():
             raise Exception(f"cross-reference subsection at offset {org_pos} has invalid object number or object count")
 
         f.seek(len(eol_marker), io.SEEK_CUR)
-        # Each entry is exactly 20 bytes long, including EOL marker.
-        for i in range(count):
-            entry = f.read(20)
-            current_obj_no = self.first_objno + i
-            # nnnnnnnnnn ggggg n/f
-            matches = re.match(rb'^(\d{10})\s(\d{5})\s([nf])(?: \r| \n|\r\n)', entry)
-            if matches is None:
-                f.seek(org_pos, io.SEEK_SET)
-                raise Exception(f"cross-reference subsection contains an invalid entry at offset {f.tell() - 20}")
-            # obj no 0 is always free and has a generation number of 65535
-            if current_obj_no == 0 and int(matches.group(2)) != 65535:
-                f.seek(org_pos, io.SEEK_SET)
-                raise Exception(f"cross-reference subsection contains an invalid entry at offset {f.tell() - 20}")
-            # in-use entry: 1st 10-digit number is byte offset, free entry: 1st 10-digit number is an obj no of the next free object
-            if matches.group(3) == b'n':
-                self.inuse_entry += [{'obj_no': current_obj_no, 'gen_no': int(matches.group(2)), 'used': True, 'offset': int(matches.group(1))}]
-                self.entries += [self.inuse_entry[-1]]
-            elif matches.group(3) == b'f':
-                if (len(self.free_entry) > 0 and self.free_entry[-1]['next_free_obj_no'] != current_obj_no):
-                    f.seek(org_pos, io.SEEK_SET)
-                    raise Exception(f"cross-reference subsection contains an invalid entry at offset {f.tell() - 20}")
-                self.free_entry += [{'obj_no': current_obj_no, 'gen_no': int(matches.group(2)), 'used': False, 'next_free_obj_no': int(matches.group(1))}]
-                self.entries += [self.free_entry[-1]]
-            else:
-                f.seek(org_pos, io.SEEK_SET)
-                raise Exception(f"cross-reference subsection contains an invalid entry at offset {f.tell() - 20}")
-            # last free entry (the tail of the linked list) links back to obj no 0
-            if len(self.free_entry) > 0 and self.free_entry[-1]['next_free_obj_no'] != 0:
-                f.seek(org_pos, io.SEEK_SET)
-                raise Exception(f"cross-reference subsection contains an invalid entry at offset {f.tell() - 20}")
+        # Each entry is exactly 20 bytes long, including EOL marker, so the whole table is read at once
+        entries_pos = f.tell()
+        data = f.read(count * 20)
+        invalid = _find_invalid_xref_entry(data, count)
+        if invalid is not None:
+            f.seek(org_pos, io.SEEK_SET)
+            raise Exception(f"cross-reference subsection contains an invalid entry at offset {entries_pos + invalid * 20}")
+        # all separators are validated whitespaces, so splitting gives 3 fields per entry
+        fields = data.split()
+        # in-use entry: 1st 10-digit number is byte offset, free entry: 1st 10-digit number is an obj no of the next free object
+        self.types = array('B', data[17::20].translate(_XREF_ENTRY_TYPES))
+        self.field2 = array('q', map(int, fields[0::3]))
+        self.field3 = array('I', map(int, fields[1::3]))
+        invalid = self._check_free_list()
+        if invalid is not None:
+            f.seek(org_pos, io.SEEK_SET)
+            raise Exception(f"cross-reference subsection contains an invalid entry at offset {entries_pos + invalid * 20}")
+
+    def _check_free_list(self):
+        '''Return the index of the first free entry breaking the linked list of free objects, or None if valid'''
+        # obj no 0 is always free and has a generation number of 65535
+        if self.first_objno == 0 and len(self.types) > 0 and self.field3[0] != 65535:
+            return 0
+        free = [m.start() for m in re.finditer(bytes([self.FREE]), self.types.tobytes())]
+        # each free entry links to the next one, and the last one (the tail of the linked list) links back to obj no 0
+        expected = [self.first_objno + i for i in free[1:]] + [0]
+        for i, next_free_obj_no, expected_obj_no in zip(free, (self.field2[i] for i in free), expected):
+            if next_free_obj_no != expected_obj_no:
+                return i
+        return None
+
 
+class PdfObjectIndex():
+    '''Merged, newest-wins view of the cross-reference sections of all increments, for O(1) lookup by object number.
 
+    Each object number maps to a kind (ABSENT, FREE, INUSE or COMPRESSED), the increment defining it,
+    and two fields: byte offset and generation number for INUSE, object stream number and index for
+    COMPRESSED, next free object number and generation number for FREE.'''
+    ABSENT = 0
+    FREE = 1
+    INUSE = 2
+    COMPRESSED = 3
+    __slots__ = ['kinds', 'increments', 'field2', 'field3', 'overflow']
+    # kind of each entry type of PdfXRefSubSection, unknown types being references to the null object
+    _KINDS_OF_TYPES = bytes([FREE, INUSE, COMPRESSED]) + bytes([FREE]) * 253
 
+    def __init__(self, xref_sections, size=None):
+        '''xref_sections is a list of PdfXRefSection (or None), from the oldest increment to the newest.
 
+        size is the /Size of the trailers, if known. The arrays only cover object numbers below size and below
+        twice the number of entries, so that a forged subsection header cannot make them arbitrarily large.
+        Entries of higher object numbers are kept in overflow, [obj_num]: (kind, increment, field2, field3)'''
+        end = 0
+        count = 0
+        for section in xref_sections:
+            if section is None: continue
+            for sub in section.subsections:
+                end = max(end, sub.first_objno + len(sub))
+                count += len(sub)
+        length = min(end, 2 * count)
+        if size is not None:
+            length = max(0, min(length, size))
+        self.kinds = array('B', bytes(length))
+        self.increments = array('i', [-1]) * length
+        self.field2 = array('q', [0]) * length
+        self.field3 = array('I', [0]) * length
+        self.overflow = {}
+        # later increments overwrite earlier ones
+        for increment, section in enumerate(xref_sections):
+            if section is None: continue
+            for sub in section.subsections:
+                start = sub.first_objno
+                stop = min(start + len(sub), length)
+                if start < stop:
+                    n = stop - start
+                    self.kinds[start:stop] = array('B', sub.types[:n].tobytes().translate(self._KINDS_OF_TYPES))
+                    self.increments[start:stop] = array('i', [increment]) * n
+                    self.field2[start:stop] = sub.field2[:n]
+                    self.field3[start:stop] = sub.field3[:n]
+                for i in range(max(0, length - start), len(sub)):
+                    self.overflow[start + i] = (self._KINDS_OF_TYPES[sub.types[i]], increment, sub.field2[i], sub.field3[i])
 
+    def __len__(self):
+        '''Number of object numbers covered by the arrays, which does not include overflow'''
+        return len(self.kinds)
 
+    def get_obj_nums(self, kind):
+        '''Object numbers of the given kind, in ascending order'''
+        obj_nums = [obj_num for obj_num in range(len(self.kinds)) if self.kinds[obj_num] == kind]
+        obj_nums += sorted(obj_num for obj_num, entry in self.overflow.items() if entry[0] == kind)
+        return obj_nums
 
+    def get_obj_offset(self, obj_num):
+        '''Same as PdfXRefSection.get_obj_offset, but for the merged view: None if not found, 0 if free,
+        a tuple (stream_obj_no, index) if compressed, otherwise the byte offset'''
+        if obj_num < 0:
+            return None
+        if obj_num < len(self.kinds):
+            kind, field2, field3 = self.kinds[obj_num], self.field2[obj_num], self.field3[obj_num]
+        elif obj_num in self.overflow:
+            kind, _, field2, field3 = self.overflow[obj_num]
+        else:
+            return None
+        if kind == self.INUSE:
+            return field2
+        elif kind == self.COMPRESSED:
+            return (field2, field3)
+        elif kind == self.FREE:
+            return 0
+        return None
 
+    def get_increment(self, obj_num):
+        '''Index of the increment whose cross-reference section defines obj_num, or -1 if not found'''
+        if obj_num < 0:
+            return -1
+        if obj_num < len(self.kinds):
+            return self.increments[obj_num]
+        entry = self.overflow.get(obj_num)
+        return entry[1] if entry is not None else -1